@@ -9,18 +9,30 @@ This package is an extension for sphinx to support exercise and solutions.
 
 __version__ = "1.2.1"
 
+import hashlib
 from pathlib import Path
-from typing import Any, Dict, Set, Union, cast
+from typing import Any, Dict, List, Set, cast
 from sphinx.config import Config
 from sphinx.application import Sphinx
 from sphinx.environment import BuildEnvironment
 from sphinx.domains.std import StandardDomain
 from docutils.nodes import Node
 from sphinx.util import logging
-from sphinx.util.fileutil import copy_asset
-from sphinx.locale import get_translation
 
 from ._compat import findall
+from .utils import toctree_order
+from .registry import (
+    SOLUTION_TYPES,
+    NodeOrder,
+    NodeOrderEntry,
+    ShardedRegistry,
+    freeze_registry,
+    migrate_env_data,
+    registry_path,
+    remove_solution,
+    sort_solutions_index,
+    thaw_registry,
+)
 from .directive import (
     ExerciseDirective,
     ExerciseStartDirective,
@@ -42,6 +54,7 @@ from .nodes import (
     depart_solution_node,
     solution_start_node,
     solution_end_node,
+    is_exercise_node,
     is_extension_node,
     exercise_title,
     exercise_subtitle,
@@ -57,16 +70,54 @@ from .transforms import (
     MergeGatedExercises,
 )
 from .post_transforms import (
+    AddSolutionBacklinks,
     ResolveTitlesInExercises,
     ResolveTitlesInSolutions,
     UpdateReferencesToEnumerated,
     ResolveLinkTextToSolutions,
+    clear_reference_cache,
+)
+from .profiling import start_profiling, write_trace
+from .cache import update_title_cache
+from .bank import (
+    ExerciseIncludeDirective,
+    bank_outdated,
+    merge_bank_deps,
+    purge_bank_deps,
+)
+from .collation import (
+    ResolveSolutionsLists,
+    SolutionsListDirective,
+    clear_doctree_cache,
+    merge_solutions_lists,
+    purge_solutions_lists,
+    update_solutions_lists,
+)
+from .domain import ExerciseDomain
+from .inventory import inventories_updated, resolve_remote_reference, write_inventory
+from .manifest import (
+    export_manifest,
+    import_manifests,
+    imported_fignumbers,
+    resolve_imported_reference,
 )
+from .listing import (
+    ExerciseListDirective,
+    ResolveExerciseLists,
+    collect_list_pages,
+    merge_exercise_lists,
+    purge_exercise_lists,
+    update_exercise_lists,
+)
+from .notebooks import write_notebooks
+from .partial import restrict_writing
+from .sheets import ExerciseSheetBuilder
+from .static import CSS_FILENAME, copy_asset_files, note_asset_files
+from .titles import default_titles, reset_default_titles
 
 logger = logging.getLogger(__name__)
 
 MESSAGE_CATALOG_NAME = "exercise"
-translate = get_translation(MESSAGE_CATALOG_NAME)
 
 # Callback Functions
 
@@ -78,14 +129,10 @@ def purge_exercises(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
         return
 
     # Purge env.sphinx_exercise_registry if matching docname
-    remove_labels = [
-        label
-        for (label, node) in env.sphinx_exercise_registry.items()
-        if node["docname"] == docname
-    ]
-    if remove_labels:
-        for label in remove_labels:
-            del env.sphinx_exercise_registry[label]
+    index = getattr(env, "sphinx_exercise_solutions_index", {})
+    for label, record in env.sphinx_exercise_registry.purge(docname):
+        if record["type"] in SOLUTION_TYPES:
+            remove_solution(index, record["node"].get("target_label"), label)
 
     # Purge node order tracking for this document
     if (
@@ -101,14 +148,24 @@ def merge_exercises(
     """Merge sphinx_exercise_registry"""
 
     if not hasattr(env, "sphinx_exercise_registry"):
-        env.sphinx_exercise_registry = {}
+        env.sphinx_exercise_registry = ShardedRegistry.for_env(env)
 
-    # Merge env stored data
+    # Merge env stored data (the other process wrote the shards it read)
     if hasattr(other, "sphinx_exercise_registry"):
-        env.sphinx_exercise_registry = {
-            **env.sphinx_exercise_registry,
-            **other.sphinx_exercise_registry,
-        }
+        env.sphinx_exercise_registry.merge(other.sphinx_exercise_registry, docnames)
+
+    # Merge the reverse index of solutions read by the other process
+    if not hasattr(env, "sphinx_exercise_solutions_index"):
+        env.sphinx_exercise_solutions_index = {}
+    index = env.sphinx_exercise_solutions_index
+    for target_label, labels in getattr(
+        other, "sphinx_exercise_solutions_index", {}
+    ).items():
+        for label in labels:
+            if other.sphinx_exercise_registry.docname(label) in docnames:
+                solutions = index.setdefault(target_label, [])
+                if label not in solutions:
+                    solutions.append(label)
 
     # Merge node order tracking
     if not hasattr(env, "sphinx_exercise_node_order"):
@@ -121,33 +178,226 @@ def merge_exercises(
         }
 
 
+def migrate_exercises(
+    app: Sphinx,
+    env: BuildEnvironment,
+    added: Set[str],
+    changed: Set[str],
+    removed: Set[str],
+) -> List[str]:
+    """Migrate cached sphinx_exercise records to the current schema"""
+
+    docnames = migrate_env_data(env)
+    if docnames:
+        logger.info(
+            "[sphinx-exercise] cached records use an unknown schema, "
+            f"re-reading {len(docnames)} documents"
+        )
+    registry = getattr(env, "sphinx_exercise_registry", None)
+    if registry is not None:
+        registry.path = registry_path(env)
+        registry.maxsize = app.config.exercise_registry_cache
+        missing = registry.discard_missing()
+        if missing:
+            logger.info(
+                "[sphinx-exercise] cached records are missing, "
+                f"re-reading {len(missing)} documents"
+            )
+            docnames |= missing
+            index = getattr(env, "sphinx_exercise_solutions_index", {})
+            for target_label, labels in list(index.items()):
+                for label in [label for label in labels if label not in registry]:
+                    remove_solution(index, target_label, label)
+    return sorted(docnames & env.found_docs - added - changed - removed)
+
+
+def flush_registry(app: Sphinx, env: BuildEnvironment, docnames: List[str]) -> None:
+    """Write changed registry shards before documents are read (in parallel)"""
+
+    registry = getattr(env, "sphinx_exercise_registry", None)
+    if registry is not None:
+        registry.flush()
+
+
 def init_numfig(app: Sphinx, config: Config) -> None:
     """Initialize numfig"""
 
     config["numfig"] = True
-    numfig_format = {"exercise": f"{translate('Exercise')} %s"}
+    numfig_format = {"exercise": default_titles().numfig_format}
     # Merge with current sphinx settings
     numfig_format.update(config.numfig_format)
     config.numfig_format = numfig_format
 
 
-def copy_asset_files(app: Sphinx, exc: Union[bool, Exception]):
-    """Copies required assets for formating in HTML"""
+def build_label_index(env: BuildEnvironment, ranks: Dict[str, int]) -> Dict[str, tuple]:
+    """
+    Build the global index of exercise positions for this build.
 
-    static_path = (
-        Path(__file__).parent.joinpath("assets", "html", "exercise.css").absolute()
-    )
-    asset_files = [str(static_path)]
+    Maps each exercise label to (docname, rank of docname in toctree order,
+    position in the document) so that cross-document ordering checks are a
+    single tuple comparison. ``ranks`` is the toctree order of documents
+    (see utils.toctree_order).
+    """
+    index = {}
+    for docname, nodes in env.sphinx_exercise_node_order.items():
+        rank = ranks.get(docname, len(ranks))
+        for position, info in enumerate(nodes):
+            if info.type == "exercise":
+                index[info.label] = (docname, rank, position)
+    return index
 
-    if exc is None:
-        for path in asset_files:
-            copy_asset(path, str(Path(app.outdir).joinpath("_static").absolute()))
+
+def _order_signature(nodes, rank, index):
+    """
+    Signature of a document's node order used to key cached validation results.
+
+    It includes the toctree rank of the document and the index entry of every
+    solution target not defined in the document, so results are recomputed
+    when the document or a cross-document target moves.
+    """
+    local = set(nodes.labels("exercise"))
+    targets = tuple(
+        (info.target_label, index.get(info.target_label))
+        for info in nodes
+        if info.target_label and info.target_label not in local
+    )
+    return nodes.signature(), rank, targets
+
+
+def _check_document_order(env, docname, nodes, rank, index):
+    """Return (message, location) warnings for the node order of a document"""
+
+    warnings = []
+    path = None
+
+    # Build a map of exercise labels to their positions and info
+    exercise_info = {}
+    for i, node_info in enumerate(nodes):
+        if node_info.type == "exercise":
+            exercise_info[node_info.label] = {
+                "position": i,
+                "line": node_info.line,
+            }
+
+    # Check each solution
+    for i, node_info in enumerate(nodes):
+        if node_info.type != "solution":
+            continue
+
+        target_label = node_info.target_label
+        solution_label = node_info.label
+        solution_line = node_info.line
+
+        if not target_label:
+            continue
+
+        if path is None:
+            path = str(Path(env.doc2path(docname)).with_suffix(""))
+
+        # Check if target exercise exists in this document
+        if target_label not in exercise_info:
+            # Exercise is in a different document or doesn't exist
+            # Build location string with line number if available
+            location = f"{path}:{solution_line}" if solution_line else path
+            target = index.get(target_label)
+            if target is not None and rank < target[1]:
+                other_path = str(Path(env.doc2path(target[0])).with_suffix(""))
+                msg = (
+                    f"[sphinx-exercise] Solution '{solution_label}' does not follow "
+                    f"exercise '{target_label}' which appears later in the toctree "
+                    f"(in {other_path}). When exercise_style='solution_follow_exercise', "
+                    f"solutions should appear after their referenced exercises."
+                )
+                warnings.append((msg, location))
+                continue
+            msg = (
+                f"[sphinx-exercise] Solution '{solution_label}' references exercise '{target_label}' "
+                f"which is not in the same document. When exercise_style='solution_follow_exercise', "
+                f"solutions should appear in the same document as their exercises."
+            )
+            warnings.append((msg, location))
+            continue
+
+        # Check if solution comes after exercise
+        exercise_data = exercise_info[target_label]
+        exercise_pos = exercise_data["position"]
+        exercise_line = exercise_data.get("line")
+
+        if i <= exercise_pos:
+            # Build more informative message with line numbers
+            if solution_line and exercise_line:
+                location = f"{path}:{solution_line}"
+                msg = (
+                    f"[sphinx-exercise] Solution '{solution_label}' (line {solution_line}) does not follow "
+                    f"exercise '{target_label}' (line {exercise_line}). "
+                    f"When exercise_style='solution_follow_exercise', solutions should "
+                    f"appear after their referenced exercises."
+                )
+            elif solution_line:
+                location = f"{path}:{solution_line}"
+                msg = (
+                    f"[sphinx-exercise] Solution '{solution_label}' does not follow exercise '{target_label}'. "
+                    f"When exercise_style='solution_follow_exercise', solutions should "
+                    f"appear after their referenced exercises."
+                )
+            else:
+                location = path
+                msg = (
+                    f"[sphinx-exercise] Solution '{solution_label}' does not follow exercise '{target_label}'. "
+                    f"When exercise_style='solution_follow_exercise', solutions should "
+                    f"appear after their referenced exercises."
+                )
+            warnings.append((msg, location))
+
+    return warnings
+
+
+def order_solutions_index(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """Order the solutions of each exercise in toctree and document order"""
+    index = getattr(env, "sphinx_exercise_solutions_index", {})
+    if index:
+        sort_solutions_index(
+            index,
+            env.sphinx_exercise_registry,
+            getattr(env, "sphinx_exercise_node_order", {}),
+            toctree_order(env),
+        )
+    return []
+
+
+def update_solution_backlinks(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """
+    Return the documents whose exercises gained or lost solutions since
+    they were last written (when exercise_solution_backlinks is set)
+    """
+    if not app.config.exercise_solution_backlinks:
+        return []
+
+    index = getattr(env, "sphinx_exercise_solutions_index", {})
+    previous = getattr(env, "sphinx_exercise_backlinks", {})
+    domain = cast(ExerciseDomain, env.get_domain("exercise"))
+    current = {}
+    for docname, labels in domain.exercises.items():
+        current[docname] = tuple(
+            (label, tuple(index[label])) for label in labels if label in index
+        )
+    env.sphinx_exercise_backlinks = current
+    return sorted(
+        docname
+        for docname, signature in current.items()
+        if docname in previous and previous[docname] != signature
+    )
 
 
 def validate_exercise_solution_order(app: Sphinx, env: BuildEnvironment) -> None:
     """
     Validate that solutions follow their referenced exercises when
     exercise_style='solution_follow_exercise' is set.
+
+    Results are cached per document (env.sphinx_exercise_order_cache) and
+    keyed by the document's node order signature, so only documents that
+    changed (or whose cross-document targets moved) are re-checked. The
+    cached warnings are replayed for all other documents.
     """
     # Only validate if the config option is set
     if app.config.exercise_style != "solution_follow_exercise":
@@ -156,81 +406,33 @@ def validate_exercise_solution_order(app: Sphinx, env: BuildEnvironment) -> None
     if not hasattr(env, "sphinx_exercise_node_order"):
         return
 
-    logger = logging.getLogger(__name__)
+    if not hasattr(env, "sphinx_exercise_order_cache"):
+        env.sphinx_exercise_order_cache = {}
+    cache = env.sphinx_exercise_order_cache
+
+    # Drop results of documents that no longer exist
+    for docname in list(cache):
+        if docname not in env.sphinx_exercise_node_order:
+            del cache[docname]
+
+    # Global index of exercise positions, rebuilt once per build (after
+    # parallel reads have been merged)
+    ranks = toctree_order(env)
+    index = build_label_index(env, ranks)
+    env.sphinx_exercise_label_index = index
 
     # Process each document
     for docname, nodes in env.sphinx_exercise_node_order.items():
-        # Build a map of exercise labels to their positions and info
-        exercise_info = {}
-        for i, node_info in enumerate(nodes):
-            if node_info["type"] == "exercise":
-                exercise_info[node_info["label"]] = {
-                    "position": i,
-                    "line": node_info.get("line"),
-                }
-
-        # Check each solution
-        for i, node_info in enumerate(nodes):
-            if node_info["type"] == "solution":
-                target_label = node_info["target_label"]
-                solution_label = node_info["label"]
-                solution_line = node_info.get("line")
-
-                if not target_label:
-                    continue
-
-                # Check if target exercise exists in this document
-                if target_label not in exercise_info:
-                    # Exercise is in a different document or doesn't exist
-                    docpath = env.doc2path(docname)
-                    path = str(Path(docpath).with_suffix(""))
-
-                    # Build location string with line number if available
-                    location = f"{path}:{solution_line}" if solution_line else path
-
-                    logger.warning(
-                        f"[sphinx-exercise] Solution '{solution_label}' references exercise '{target_label}' "
-                        f"which is not in the same document. When exercise_style='solution_follow_exercise', "
-                        f"solutions should appear in the same document as their exercises.",
-                        location=location,
-                        color="yellow",
-                    )
-                    continue
-
-                # Check if solution comes after exercise
-                exercise_data = exercise_info[target_label]
-                exercise_pos = exercise_data["position"]
-                exercise_line = exercise_data.get("line")
-
-                if i <= exercise_pos:
-                    docpath = env.doc2path(docname)
-                    path = str(Path(docpath).with_suffix(""))
-
-                    # Build more informative message with line numbers
-                    if solution_line and exercise_line:
-                        location = f"{path}:{solution_line}"
-                        msg = (
-                            f"[sphinx-exercise] Solution '{solution_label}' (line {solution_line}) does not follow "
-                            f"exercise '{target_label}' (line {exercise_line}). "
-                            f"When exercise_style='solution_follow_exercise', solutions should "
-                            f"appear after their referenced exercises."
-                        )
-                    elif solution_line:
-                        location = f"{path}:{solution_line}"
-                        msg = (
-                            f"[sphinx-exercise] Solution '{solution_label}' does not follow exercise '{target_label}'. "
-                            f"When exercise_style='solution_follow_exercise', solutions should "
-                            f"appear after their referenced exercises."
-                        )
-                    else:
-                        location = path
-                        msg = (
-                            f"[sphinx-exercise] Solution '{solution_label}' does not follow exercise '{target_label}'. "
-                            f"When exercise_style='solution_follow_exercise', solutions should "
-                            f"appear after their referenced exercises."
-                        )
-
-                    logger.warning(msg, location=location, color="yellow")
+        rank = ranks.get(docname, len(ranks))
+        signature = _order_signature(nodes, rank, index)
+        cached = cache.get(docname)
+        if cached is None or cached[0] != signature:
+            warnings = _check_document_order(env, docname, nodes, rank, index)
+            cached = (signature, warnings)
+            cache[docname] = cached
+
+        for msg, location in cached[1]:
+            logger.warning(msg, location=location, color="yellow")
 
 
 def doctree_read(app: Sphinx, document: Node) -> None:
@@ -239,14 +441,15 @@ def doctree_read(app: Sphinx, document: Node) -> None:
     """
 
     domain = cast(StandardDomain, app.env.get_domain("std"))
+    exercise_domain = cast(ExerciseDomain, app.env.get_domain("exercise"))
 
-    # Initialize node order tracking for this document
+    # Initialize node order tracking
     if not hasattr(app.env, "sphinx_exercise_node_order"):
         app.env.sphinx_exercise_node_order = {}
 
     docname = app.env.docname
-    if docname not in app.env.sphinx_exercise_node_order:
-        app.env.sphinx_exercise_node_order[docname] = []
+    registry = getattr(app.env, "sphinx_exercise_registry", {})
+    entries = []
 
     # Traverse sphinx-exercise nodes
     for node in findall(document):
@@ -262,26 +465,95 @@ def doctree_read(app: Sphinx, document: Node) -> None:
             node_label = node.get("label", "")
             target_label = node.get("target_label", None)  # Only for solution nodes
 
-            app.env.sphinx_exercise_node_order[docname].append(
-                {
-                    "type": node_type,
-                    "label": node_label,
-                    "target_label": target_label,
-                    "line": node.line if hasattr(node, "line") else None,
-                }
+            if is_exercise_node(node):
+                classes = [name for name in node["classes"] if name != "exercise"]
+                exercise_domain.note_exercise(docname, node_label, classes)
+
+            # Hash of the parsed content (used to detect changed solutions)
+            record = registry.get(node_label)
+            if record is not None and record["docname"] == docname:
+                digest = hashlib.sha1(node.astext().encode("utf8")).hexdigest()
+                record["content_hash"] = digest
+                registry[node_label] = record
+
+            entries.append(
+                NodeOrderEntry(
+                    node_type,
+                    node_label,
+                    target_label,
+                    node.line if hasattr(node, "line") else None,
+                )
             )
 
+    # Only documents containing sphinx-exercise nodes are tracked
+    if entries:
+        app.env.sphinx_exercise_node_order[docname] = NodeOrder.from_entries(entries)
+
 
 def setup(app: Sphinx) -> Dict[str, Any]:
     app.add_config_value("hide_solutions", False, "env")
     app.add_config_value("exercise_style", "", "env")
-
+    app.add_config_value("exercise_profile", False, "")
+    app.add_config_value("exercise_precompress_assets", False, "html")
+    app.add_config_value("exercise_bank", None, "env")
+    app.add_config_value("exercise_solutions_doctree_cache", 16, "")
+    app.add_config_value("exercise_registry_cache", 64, "")
+    app.add_config_value("exercise_stable_labels", False, "env")
+    app.add_config_value("exercise_list_page_size", 500, "html")
+    app.add_config_value("exercise_index", False, "")
+    app.add_config_value("exercise_solution_backlinks", False, "html")
+    app.add_config_value("exercise_inventories", {}, "env")
+    app.add_config_value("exercise_manifest_export", "", "")
+    app.add_config_value("exercise_manifest_import", [], "env")
+    app.add_config_value("exercise_only_pages", False, "")
+    app.add_config_value("exercise_sheets_solutions", False, "")
+    app.add_config_value("exercise_notebooks", False, "")
+    app.add_config_value("exercise_notebooks_solutions", False, "")
+
+    app.connect("config-inited", reset_default_titles, priority=400)
     app.connect("config-inited", init_numfig)  # event order - 1
+    app.connect("builder-inited", start_profiling)  # event order - 2
+    app.connect("builder-inited", restrict_writing)  # event order - 2
+    app.connect("env-get-outdated", migrate_exercises)  # event order - 4
+    app.connect("env-get-outdated", bank_outdated)  # event order - 4
+    app.connect("env-get-outdated", import_manifests, priority=600)
     app.connect("env-purge-doc", purge_exercises)  # event order - 5 per file
+    app.connect("env-purge-doc", purge_bank_deps)  # event order - 5 per file
+    app.connect("env-purge-doc", purge_solutions_lists)  # event order - 5 per file
+    app.connect("env-purge-doc", purge_exercise_lists)  # event order - 5 per file
+    app.connect("env-before-read-docs", flush_registry)  # event order - 6
     app.connect("doctree-read", doctree_read)  # event order - 8
     app.connect("env-merge-info", merge_exercises)  # event order - 9
+    app.connect("env-merge-info", merge_bank_deps)  # event order - 9
+    app.connect("env-merge-info", merge_solutions_lists)  # event order - 9
+    app.connect("env-merge-info", merge_exercise_lists)  # event order - 9
     app.connect("env-updated", validate_exercise_solution_order)  # event order - 10
+    app.connect("env-updated", note_asset_files)  # event order - 10
+    # after the toctree collector has assigned numbers
+    app.connect("env-get-updated", imported_fignumbers, priority=800)
+    app.connect("env-get-updated", update_title_cache, priority=900)  # event order - 11
+    app.connect("env-get-updated", update_solutions_lists, priority=900)
+    app.connect("env-get-updated", update_exercise_lists, priority=900)
+    # before the solutions of each exercise are numbered or compared
+    app.connect("env-get-updated", order_solutions_index, priority=450)
+    app.connect("env-get-updated", update_solution_backlinks)
+    app.connect("env-get-updated", inventories_updated)
+    app.connect("env-get-updated", export_manifest, priority=950)
+    # before intersphinx, which has no numbers for numref
+    app.connect("missing-reference", resolve_imported_reference, priority=400)
+    app.connect("missing-reference", resolve_remote_reference, priority=400)
+    if "write-started" in app.events.events:  # Sphinx >= 7.3
+        app.connect("write-started", freeze_registry)  # event order - 13
+    else:
+        app.connect("env-check-consistency", freeze_registry)  # event order - 12
+    app.connect("html-collect-pages", collect_list_pages)  # event order - 15
     app.connect("build-finished", copy_asset_files)  # event order - 16
+    app.connect("build-finished", write_trace)  # event order - 16
+    app.connect("build-finished", clear_doctree_cache)  # event order - 16
+    app.connect("build-finished", clear_reference_cache)  # event order - 16
+    app.connect("build-finished", write_inventory)  # event order - 16
+    app.connect("build-finished", write_notebooks)  # event order - 16
+    app.connect("build-finished", thaw_registry)  # event order - 16
 
     app.add_node(
         exercise_node,
@@ -327,20 +599,28 @@ def setup(app: Sphinx) -> Dict[str, Any]:
     app.add_directive("exercise", ExerciseDirective)
     app.add_directive("exercise-start", ExerciseStartDirective)
     app.add_directive("exercise-end", ExerciseEndDirective)
+    app.add_directive("exercise-include", ExerciseIncludeDirective)
     app.add_directive("solution", SolutionDirective)
     app.add_directive("solution-start", SolutionStartDirective)
     app.add_directive("solution-end", SolutionEndDirective)
+    app.add_directive("solutions-list", SolutionsListDirective)
+    app.add_directive("exercise-list", ExerciseListDirective)
+    app.add_domain(ExerciseDomain)
+    app.add_builder(ExerciseSheetBuilder)
 
     app.add_transform(CheckGatedDirectives)
     app.add_transform(MergeGatedExercises)
     app.add_transform(MergeGatedSolutions)
 
+    app.add_post_transform(ResolveSolutionsLists)
     app.add_post_transform(UpdateReferencesToEnumerated)
+    app.add_post_transform(ResolveExerciseLists)
+    app.add_post_transform(AddSolutionBacklinks)
     app.add_post_transform(ResolveTitlesInExercises)
     app.add_post_transform(ResolveTitlesInSolutions)
     app.add_post_transform(ResolveLinkTextToSolutions)
 
-    app.add_css_file("exercise.css")
+    app.add_css_file(CSS_FILENAME)
 
     # add translations
     package_dir = Path(__file__).parent.resolve()
@@ -348,7 +628,7 @@ def setup(app: Sphinx) -> Dict[str, Any]:
     app.add_message_catalog(MESSAGE_CATALOG_NAME, str(locale_dir))
 
     return {
-        "version": "builtin",
+        "version": __version__,
         "parallel_read_safe": True,
         "parallel_write_safe": True,
     }
@@ -0,0 +1,358 @@
+"""
+sphinx_exercise.bank
+~~~~~~~~~~~~~~~~~~~~
+
+Exercises included from an external exercise bank
+
+The bank is a JSON Lines file with one exercise per line::
+
+    {"id": "limits-1", "title": "Limits", "body": "Compute ...", "class": "hard"}
+
+or a JSON or YAML (``.json``, ``.yaml``, ``.yml``) file holding a list of such
+entries, or a mapping of ids to entries.
+
+An offset index of the bank is kept in the doctree directory so that only the
+entries referenced by ``exercise-include`` directives are read (through a
+memory map) and parsed. JSON and YAML banks cannot be read one entry at a
+time, so they are parsed once whenever they change and their entries are
+written as JSON Lines next to the index, which is then read in the same way.
+Documents record the hash of every entry they include and are only read again
+when one of those entries changes.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from docutils.nodes import Node
+from docutils.statemachine import StringList
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+from .directive import ExerciseDirective
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "bank.index.json"
+INDEX_VERSION = 1
+# entries of JSON and YAML banks, converted to JSON Lines
+ENTRIES_FILENAME = "bank.entries.jsonl"
+CONVERTED_SUFFIXES = (".json", ".yaml", ".yml")
+
+# number of parsed entries kept in memory by each process
+ENTRY_CACHE_SIZE = 1024
+
+
+def _write_text(path: Path, text: str) -> None:
+    """Replace ``path`` with ``text`` (through a temporary file of this process)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_text(text, "utf8")
+    os.replace(temporary, path)
+
+
+class ExerciseBank:
+    """
+    Read access to the entries of an exercise bank
+
+    ``index`` maps each entry id to ``(offset, length, sha1)`` of its line in
+    ``lines_path`` (the bank itself, or its entries converted to JSON Lines)
+    and is stored next to the doctrees. It is rebuilt whenever the size or
+    modification time of the bank changes.
+    """
+
+    def __init__(self, path: Path, index_path: Path):
+        self.path = Path(path)
+        self.index_path = Path(index_path)
+        if self.path.suffix.lower() in CONVERTED_SUFFIXES:
+            self.lines_path = self.index_path.with_name(ENTRIES_FILENAME)
+        else:
+            self.lines_path = self.path
+        self._index: Optional[Dict[str, Tuple[int, int, str]]] = None
+        self._stamp = None
+        self._mmap = None
+        self._pid = None
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    def _current_stamp(self) -> Optional[list]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return [str(self.path.resolve()), stat.st_size, stat.st_mtime_ns]
+
+    @property
+    def index(self) -> Dict[str, Tuple[int, int, str]]:
+        self.refresh()
+        return self._index
+
+    def refresh(self) -> None:
+        """Load the index, or rebuild it if the bank changed"""
+        stamp = self._current_stamp()
+        if self._index is None or stamp != self._stamp:
+            self._load_index(stamp)
+
+    def _load_index(self, stamp) -> None:
+        self.close()
+        self._entries.clear()
+        self._stamp = stamp
+        if stamp is None:
+            self._index = {}
+            return
+        try:
+            data = json.loads(self.index_path.read_text("utf8"))
+            if (
+                data["version"] == INDEX_VERSION
+                and data["stamp"] == stamp
+                and self.lines_path.exists()
+            ):
+                self._index = {
+                    key: tuple(value) for key, value in data["entries"].items()
+                }
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        self._index = self._build_index()
+        _write_text(
+            self.index_path,
+            json.dumps(
+                {"version": INDEX_VERSION, "stamp": stamp, "entries": self._index}
+            ),
+        )
+
+    def _load_entries(self) -> List[dict]:
+        """All entries of a JSON or YAML bank"""
+        text = self.path.read_text("utf8")
+        if self.path.suffix.lower() == ".json":
+            data = json.loads(text)
+        else:
+            try:
+                import yaml
+            except ImportError:
+                logger.warning(
+                    "[sphinx-exercise] PyYAML is required to read the exercise "
+                    f"bank {self.path}",
+                    color="red",
+                )
+                return []
+            try:
+                data = yaml.safe_load(text)
+            except yaml.YAMLError as error:
+                raise ValueError(str(error)) from error
+        if isinstance(data, dict):
+            return [
+                {"id": key, **value} if isinstance(value, dict) else value
+                for key, value in data.items()
+            ]
+        if isinstance(data, list):
+            return data
+        raise ValueError("expected a list or mapping of entries")
+
+    def _convert(self) -> None:
+        """Write the entries of a JSON or YAML bank as JSON Lines"""
+        try:
+            entries = self._load_entries()
+        except (OSError, ValueError) as error:
+            logger.warning(
+                f"[sphinx-exercise] invalid exercise bank: {error}",
+                location=str(self.path),
+                color="red",
+            )
+            entries = []
+        _write_text(
+            self.lines_path,
+            "".join(
+                json.dumps(entry, ensure_ascii=False, sort_keys=True, default=str)
+                + "\n"
+                for entry in entries
+            ),
+        )
+
+    def _build_index(self) -> Dict[str, Tuple[int, int, str]]:
+        if self.lines_path != self.path:
+            self._convert()
+        index = {}
+        offset = 0
+        with self.lines_path.open("rb") as f:
+            for number, line in enumerate(f, 1):
+                length = len(line)
+                if line.strip():
+                    try:
+                        entry_id = str(json.loads(line)["id"])
+                    except (ValueError, KeyError, TypeError):
+                        location = f"{self.path}:{number}"
+                        if self.lines_path != self.path:
+                            location = f"{self.path} (entry {number})"
+                        logger.warning(
+                            "[sphinx-exercise] invalid exercise bank entry",
+                            location=location,
+                            color="red",
+                        )
+                    else:
+                        digest = hashlib.sha1(line).hexdigest()
+                        index[entry_id] = (offset, length, digest)
+                offset += length
+        return index
+
+    def entry_hash(self, entry_id: str) -> Optional[str]:
+        """Hash of the entry with ``entry_id`` (None if it is not in the bank)"""
+        location = self.index.get(entry_id)
+        return None if location is None else location[2]
+
+    def get(self, entry_id: str) -> Optional[dict]:
+        """The parsed entry with ``entry_id``"""
+        location = self.index.get(entry_id)
+        if location is None:
+            return None
+        entry = self._entries.get(entry_id)
+        if entry is not None:
+            self._entries.move_to_end(entry_id)
+            return entry
+        if self._mmap is None or self._pid != os.getpid():
+            with self.lines_path.open("rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._pid = os.getpid()
+        offset, length, _ = location
+        entry = json.loads(self._mmap[offset : offset + length])
+        self._entries[entry_id] = entry
+        if len(self._entries) > ENTRY_CACHE_SIZE:
+            self._entries.popitem(last=False)
+        return entry
+
+    def close(self) -> None:
+        if self._mmap is not None and self._pid == os.getpid():
+            self._mmap.close()
+        self._mmap = None
+
+
+_banks: Dict[Tuple[str, str], ExerciseBank] = {}
+
+
+def get_exercise_bank(env: BuildEnvironment) -> Optional[ExerciseBank]:
+    """The bank configured with ``exercise_bank`` (None if there is none)"""
+    if not env.config.exercise_bank:
+        return None
+    path = Path(env.app.confdir, env.config.exercise_bank)
+    index_path = Path(env.doctreedir).joinpath("sphinx_exercise", INDEX_FILENAME)
+    key = (str(path), str(index_path))
+    if key not in _banks:
+        _banks[key] = ExerciseBank(path, index_path)
+    return _banks[key]
+
+
+class ExerciseIncludeDirective(ExerciseDirective):
+    """
+    An exercise loaded from the exercise bank
+
+    .. exercise-include:: <bank-id>
+       :label:
+       :class:
+       :nonumber:
+       :hidden:
+
+    The subtitle, content and (optionally) label and class of the exercise
+    are taken from the bank entry; the label defaults to the bank id.
+    """
+
+    has_content = False
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = False
+
+    def run(self) -> List[Node]:
+        entry_id = self.arguments[0]
+        bank = get_exercise_bank(self.env)
+        if bank is None:
+            logger.warning(
+                "[sphinx-exercise] exercise-include used without exercise_bank",
+                location=(self.env.docname, self.lineno),
+                color="red",
+            )
+            return []
+
+        # Record the entry (even if it is missing) so that this document is
+        # read again when it changes
+        if not hasattr(self.env, "sphinx_exercise_bank_deps"):
+            self.env.sphinx_exercise_bank_deps = {}
+        deps = self.env.sphinx_exercise_bank_deps.setdefault(self.env.docname, {})
+        deps[entry_id] = bank.entry_hash(entry_id)
+
+        entry = bank.get(entry_id)
+        if entry is None:
+            logger.warning(
+                f"[sphinx-exercise] unknown exercise bank entry: {entry_id}",
+                location=(self.env.docname, self.lineno),
+                color="red",
+            )
+            return []
+
+        self.name = "exercise"
+        self.arguments = [entry["title"]] if entry.get("title") else []
+        self.options.setdefault("label", entry.get("label", entry_id))
+        classes = entry.get("class")
+        if classes and "class" not in self.options:
+            if isinstance(classes, str):
+                classes = classes.split()
+            self.options["class"] = [str(name) for name in classes]
+        source = f"{bank.path}:{entry_id}"
+        lines = entry.get("body", "").splitlines()
+        self.content = StringList(lines, items=[(source, i) for i in range(len(lines))])
+        self.content_offset = 0
+        return super().run()
+
+
+# Callback Functions
+
+
+def bank_outdated(
+    app: Sphinx,
+    env: BuildEnvironment,
+    added: Set[str],
+    changed: Set[str],
+    removed: Set[str],
+) -> List[str]:
+    """
+    Documents that include bank entries which changed
+
+    The index of the bank is (re)built here, in the main process, so that
+    ``-j`` read workers find it up to date instead of each building it.
+    """
+
+    bank = get_exercise_bank(env)
+    if bank is None:
+        return []
+    bank.refresh()
+    deps = getattr(env, "sphinx_exercise_bank_deps", {})
+    if not deps:
+        return []
+    outdated = [
+        docname
+        for docname, entries in deps.items()
+        if any(bank.entry_hash(key) != digest for key, digest in entries.items())
+    ]
+    return sorted(set(outdated) & env.found_docs - added - changed - removed)
+
+
+def purge_bank_deps(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    if hasattr(env, "sphinx_exercise_bank_deps"):
+        env.sphinx_exercise_bank_deps.pop(docname, None)
+
+
+def merge_bank_deps(
+    app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment
+) -> None:
+    if not hasattr(env, "sphinx_exercise_bank_deps"):
+        env.sphinx_exercise_bank_deps = {}
+    for docname in docnames:
+        if docname in getattr(other, "sphinx_exercise_bank_deps", {}):
+            env.sphinx_exercise_bank_deps[docname] = other.sphinx_exercise_bank_deps[
+                docname
+            ]
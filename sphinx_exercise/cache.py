@@ -0,0 +1,240 @@
+"""
+sphinx_exercise.cache
+~~~~~~~~~~~~~~~~~~~~~
+
+Persistent cache of resolved exercise and solution titles and numbers
+
+The cache is a small SQLite database in the doctree directory mapping each
+label to the hash of its directive header, its docname, number and plain
+text title. It is written once per build by the main process (after Sphinx
+has assigned figure numbers) and may be read by any process, so exports
+such as the manifest or LaTeX label tables do not need to load doctrees.
+Titles depend on ``language`` and ``numfig_format``, so the table is cleared
+whenever those change.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+
+from .registry import SOLUTION_TYPES, RecordSummary, registry_summaries
+from .titles import default_titles
+
+CACHE_FILENAME = "titles.sqlite"
+
+
+class TitleEntry(NamedTuple):
+    type: str
+    docname: str
+    hash: Optional[str]
+    number: str
+    title: str
+
+
+class TitleCache:
+    """
+    Label -> TitleEntry table backed by SQLite
+
+    Connections are opened lazily per process so that the cache can be used
+    from ``-j`` workers forked after it was opened.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._connection = None
+        self._pid = None
+        self._entries: Optional[Dict[str, TitleEntry]] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path))
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS titles (label TEXT PRIMARY KEY, "
+                "type TEXT, docname TEXT, hash TEXT, number TEXT, title TEXT)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def entries(self) -> Dict[str, TitleEntry]:
+        """All cached entries (loaded once per process)"""
+        if self._entries is None:
+            rows = self.connection.execute(
+                "SELECT label, type, docname, hash, number, title FROM titles"
+            )
+            self._entries = {row[0]: TitleEntry(*row[1:]) for row in rows}
+        return self._entries
+
+    def reload(self) -> None:
+        """Discard entries loaded in memory (and the connection if the
+        database file was removed)"""
+        self._entries = None
+        if not self.path.exists():
+            self.close()
+
+    def check_context(self, context: str) -> bool:
+        """Clear all entries if they were written with another ``context``
+        and return whether they were cleared"""
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'context'"
+        ).fetchone()
+        if row is not None and row[0] == context:
+            return False
+        with self.connection:
+            self.connection.execute("DELETE FROM titles")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('context', ?)", (context,)
+            )
+        self._entries = None
+        return row is not None
+
+    def get(self, label: str) -> Optional[TitleEntry]:
+        return self.entries().get(label)
+
+    def __contains__(self, label: str) -> bool:
+        return label in self.entries()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries())
+
+    def items(self):
+        return self.entries().items()
+
+    def update(self, changed: Dict[str, TitleEntry], removed: Set[str]) -> None:
+        """Write changed entries and delete removed labels in one transaction"""
+        entries = self.entries()
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM titles WHERE label = ?", [(label,) for label in removed]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO titles VALUES (?, ?, ?, ?, ?, ?)",
+                [(label, *entry) for label, entry in changed.items()],
+            )
+        for label in removed:
+            entries.pop(label, None)
+        entries.update(changed)
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+_caches: Dict[str, TitleCache] = {}
+
+
+def get_title_cache(env: BuildEnvironment) -> TitleCache:
+    """Return the title cache stored in the doctree directory of ``env``"""
+    path = Path(env.doctreedir).joinpath("sphinx_exercise", CACHE_FILENAME)
+    key = str(path)
+    if key not in _caches:
+        _caches[key] = TitleCache(path)
+    return _caches[key]
+
+
+def title_context(app: Sphinx) -> str:
+    """Configuration the cached titles were resolved with"""
+    return repr((app.config.language, app.config.numfig_format.get("exercise")))
+
+
+def exercise_number(env: BuildEnvironment, docname: str, label: str) -> str:
+    """Number assigned by Sphinx to an enumerated exercise (as used by HTML)"""
+    number = env.toc_fignumbers.get(docname, {}).get("exercise", {}).get(label, ())
+    return ".".join(map(str, number))
+
+
+def exercise_title_text(app: Sphinx, summary: RecordSummary, number: str) -> str:
+    """Plain text title of an exercise, e.g. ``Exercise 1.2 (Subtitle)``"""
+    if summary.enumerable:
+        text = app.config.numfig_format["exercise"] % number
+    else:
+        text = summary.title
+    if summary.subtitle is not None:
+        text += f" ({summary.subtitle})"
+    return text
+
+
+def solution_title_text(app: Sphinx, exercise_entry: Optional[TitleEntry]) -> str:
+    """Plain text title of a solution to the exercise with ``exercise_entry``"""
+    titles = default_titles()
+    if app.config.exercise_style == "solution_follow_exercise":
+        return titles.solution
+    if exercise_entry is None:
+        return titles.solution_to
+    return f"{titles.solution_to} {exercise_entry.title}"
+
+
+def update_title_cache(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """
+    Refresh the title cache after Sphinx has assigned numbers and return the
+    documents whose solution titles changed because their exercise changed
+    """
+
+    registry = getattr(env, "sphinx_exercise_registry", {})
+    cache = get_title_cache(env)
+    cache.reload()
+    cache.check_context(title_context(app))
+    old = cache.entries()
+    current: Dict[str, TitleEntry] = {}
+    changed: Dict[str, TitleEntry] = {}
+
+    def store(label: str, entry: TitleEntry) -> None:
+        current[label] = entry
+        if old.get(label) != entry:
+            changed[label] = entry
+
+    solutions: List[RecordSummary] = []
+    for summary in registry_summaries(registry):
+        label = summary.label
+        if summary.type in SOLUTION_TYPES:
+            solutions.append(summary)
+            continue
+        docname = summary.docname
+        number = exercise_number(env, docname, label)
+        previous = old.get(label)
+        header = summary.hash
+        if (
+            previous is not None
+            and header is not None
+            and previous.hash == header
+            and previous.number == number
+            and previous.docname == docname
+        ):
+            current[label] = previous
+            continue
+        title = exercise_title_text(app, summary, number)
+        store(label, TitleEntry("exercise", docname, header, number, title))
+
+    # exercises that no longer exist
+    gone = {
+        label
+        for label, entry in old.items()
+        if entry.type == "exercise" and label not in current
+    }
+    rewrite = set()
+    for summary in solutions:
+        target = summary.target_label
+        exercise_entry = current.get(target)
+        title = solution_title_text(app, exercise_entry)
+        number = exercise_entry.number if exercise_entry else ""
+        entry = TitleEntry("solution", summary.docname, summary.hash, number, title)
+        store(summary.label, entry)
+        if (target in changed or target in gone) and summary.label in old:
+            rewrite.add(summary.docname)
+
+    removed = set(old) - set(current)
+    if changed or removed:
+        cache.update(changed, removed)
+    return sorted(rewrite)
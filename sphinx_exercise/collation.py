@@ -0,0 +1,287 @@
+"""
+sphinx_exercise.collation
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Solution collation (``solutions-list``)
+
+A ``solutions-list`` directive is replaced by copies of the solutions that
+match its filters when the page is written. Solution bodies are taken from
+the pickled doctrees of the documents that define them through a bounded LRU
+cache, and the page is only rewritten when the collected solutions change.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Dict, List, Set, Tuple
+
+from docutils import nodes as docutil_nodes
+from docutils.nodes import Node
+from docutils.parsers.rst import directives
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.util.docutils import SphinxDirective
+
+from ._compat import findall
+from .cache import exercise_number
+from .nodes import solution_node, solutions_list_node
+from .profiling import traced
+from .registry import SOLUTION_TYPES, frozen_registry
+from .utils import toctree_order
+
+
+class SolutionsListDirective(SphinxDirective):
+    """
+    A list of the solutions defined in other documents
+
+    .. solutions-list::
+       :docnames: <patterns> (optional)
+       :class: <classes> (optional)
+
+    Parameters:
+    -----------
+    docnames : str,
+            Space separated glob patterns; only solutions in documents
+            matching one of them are listed (default: all documents)
+    class : str,
+            Only solutions with one of these classes are listed
+    """
+
+    name = "solutions-list"
+    has_content = False
+    required_arguments = 0
+    optional_arguments = 0
+    option_spec = {
+        "docnames": directives.unchanged_required,
+        "class": directives.class_option,
+    }
+
+    def run(self) -> List[Node]:
+        patterns = tuple(self.options.get("docnames", "*").split())
+        classes = tuple(self.options.get("class", ()))
+
+        if not hasattr(self.env, "sphinx_exercise_solutions_lists"):
+            self.env.sphinx_exercise_solutions_lists = {}
+        lists = self.env.sphinx_exercise_solutions_lists.setdefault(
+            self.env.docname, {"filters": [], "signature": None}
+        )
+        lists["filters"].append((patterns, classes))
+
+        node = solutions_list_node()
+        node["docnames"] = patterns
+        node["filter_classes"] = classes
+        return [node]
+
+
+def matching_solutions(
+    env: BuildEnvironment,
+    docname: str,
+    patterns: Tuple[str, ...],
+    classes: Tuple[str, ...],
+    ranks: Dict[str, int],
+) -> List[Tuple[str, str]]:
+    """
+    (docname, label) of the solutions matching the filters of a
+    ``solutions-list`` in ``docname``, in toctree and document order
+    """
+
+    matched = {}
+    for record in frozen_registry(env).records():
+        if record.type not in SOLUTION_TYPES or record.docname == docname:
+            continue
+        if record.hidden or record.imported:
+            continue
+        if not any(fnmatchcase(record.docname, pattern) for pattern in patterns):
+            continue
+        if classes and not set(classes) & set(record.classes):
+            continue
+        matched[record.label] = record.docname
+
+    node_order = getattr(env, "sphinx_exercise_node_order", {})
+    docnames = sorted(
+        set(matched.values()),
+        key=lambda name: (ranks.get(name, len(ranks)), name),
+    )
+    solutions = []
+    for name in docnames:
+        nodes = node_order.get(name)
+        if nodes is None:
+            continue
+        solutions += [
+            (name, label) for label in nodes.labels("solution") if label in matched
+        ]
+    return solutions
+
+
+def _signature(env: BuildEnvironment, solutions: List[Tuple[str, str]]) -> tuple:
+    registry = env.sphinx_exercise_registry
+    signature = []
+    for docname, label in solutions:
+        summary = registry.summary(label)
+        target_label = summary.target_label
+        target = registry.summary(target_label) if target_label else None
+        number, header = "", None
+        if target is not None:
+            number = exercise_number(env, target.docname, target_label)
+            header = target.hash
+        signature.append((docname, label, summary.content_hash, number, header))
+    return tuple(signature)
+
+
+def update_solutions_lists(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """
+    Return the documents with a ``solutions-list`` whose solutions changed
+    since they were last written
+    """
+
+    lists = getattr(env, "sphinx_exercise_solutions_lists", {})
+    if not lists:
+        return []
+    ranks = toctree_order(env)
+    outdated = []
+    for docname, data in lists.items():
+        signature = tuple(
+            _signature(env, matching_solutions(env, docname, patterns, classes, ranks))
+            for patterns, classes in data["filters"]
+        )
+        if signature != data["signature"]:
+            data["signature"] = signature
+            outdated.append(docname)
+    return sorted(outdated)
+
+
+def purge_solutions_lists(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    if hasattr(env, "sphinx_exercise_solutions_lists"):
+        env.sphinx_exercise_solutions_lists.pop(docname, None)
+
+
+def merge_solutions_lists(
+    app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment
+) -> None:
+    if not hasattr(env, "sphinx_exercise_solutions_lists"):
+        env.sphinx_exercise_solutions_lists = {}
+    for docname in docnames:
+        if docname in getattr(other, "sphinx_exercise_solutions_lists", {}):
+            env.sphinx_exercise_solutions_lists[docname] = (
+                other.sphinx_exercise_solutions_lists[docname]
+            )
+
+
+def is_math_node(node) -> bool:
+    return isinstance(node, (docutil_nodes.math, docutil_nodes.math_block))
+
+
+class DoctreeCache:
+    """
+    Bounded LRU of the solutions in the doctrees that lists copy from
+
+    Each entry maps the labels of the solutions of one doctree to their
+    nodes (built once when the doctree is loaded). Entries are keyed by
+    docname and the time the document was read, so a document read again is
+    never served from a stale doctree.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._doctrees: "OrderedDict[tuple, Dict[str, Node]]" = OrderedDict()
+
+    def get(self, env: BuildEnvironment, docname: str) -> Dict[str, Node]:
+        """Solution nodes of ``docname`` by label"""
+        key = (docname, env.all_docs.get(docname))
+        solutions = self._doctrees.get(key)
+        if solutions is not None:
+            self._doctrees.move_to_end(key)
+            return solutions
+        doctree = env.get_doctree(docname)
+        solutions = {}
+        for node in findall(doctree, solution_node):
+            solutions.setdefault(node.get("label"), node)
+        self._doctrees[key] = solutions
+        while len(self._doctrees) > self.maxsize:
+            self._doctrees.popitem(last=False)
+        return solutions
+
+    def clear(self) -> None:
+        self._doctrees.clear()
+
+
+_doctree_cache = DoctreeCache(maxsize=16)
+
+
+def clear_doctree_cache(app: Sphinx, exc) -> None:
+    _doctree_cache.clear()
+
+
+class ResolveSolutionsLists(SphinxPostTransform):
+    """
+    Replace ``solutions-list`` placeholders with copies of the matching
+    solutions (before references and solution titles are resolved)
+    """
+
+    default_priority = 4
+
+    def copy_solution(self, docname: str, label: str) -> Node:
+        node = _doctree_cache.get(self.env, docname).get(label)
+        if node is None:
+            return None
+        copy = node.deepcopy()
+        # the solution keeps its anchor in its own document, and the ids
+        # within it (e.g. of footnotes) are replaced by ids unique to this
+        # document
+        renamed = {}
+        elements = list(findall(copy, docutil_nodes.Element))
+        for element in elements:
+            ids = element["ids"]
+            element["ids"] = []
+            element["names"] = []
+            if ids and element is not copy:
+                new_id = self.document.set_id(element)
+                renamed.update((old_id, new_id) for old_id in ids)
+        for element in elements:
+            if element.get("refid") in renamed:
+                element["refid"] = renamed[element["refid"]]
+            if element.get("backrefs"):
+                element["backrefs"] = [
+                    renamed.get(backref, backref) for backref in element["backrefs"]
+                ]
+        return copy
+
+    @traced("post-transform")
+    def run(self):
+        placeholders = list(findall(self.document, solutions_list_node))
+        if not placeholders:
+            return
+
+        _doctree_cache.maxsize = self.config.exercise_solutions_doctree_cache
+        ranks = toctree_order(self.env)
+        has_math = False
+        for placeholder in placeholders:
+            solutions = matching_solutions(
+                self.env,
+                self.env.docname,
+                placeholder["docnames"],
+                placeholder["filter_classes"],
+                ranks,
+            )
+            content = []
+            current = None
+            for docname, label in solutions:
+                copy = self.copy_solution(docname, label)
+                if copy is None:
+                    continue
+                if docname != current:
+                    current = docname
+                    title = self.env.titles.get(docname)
+                    text = title.astext() if title is not None else docname
+                    content.append(docutil_nodes.rubric(text, text))
+                has_math = has_math or any(findall(copy, is_math_node))
+                content.append(copy)
+            placeholder.replace_self(content)
+
+        if has_math:
+            # Ensure mathjax is loaded for pages that only collect math
+            domain = self.env.get_domain("math")
+            domain.data["has_equations"][self.env.docname] = True
@@ -8,13 +8,13 @@ A custom Sphinx Directive
 :licences: see LICENSE for details
 """
 
+import hashlib
 from pathlib import Path
 from typing import List
 
 from docutils import nodes
 from docutils.nodes import Node
 from docutils.parsers.rst import directives
-from sphinx.locale import get_translation
 from sphinx.util import logging
 from sphinx.util.docutils import SphinxDirective
 
@@ -29,14 +29,60 @@ from .nodes import (
     solution_start_node,
     solution_title,
 )
+from .profiling import traced
+from .registry import ShardedRegistry
+from .titles import default_titles
 
 logger = logging.getLogger(__name__)
 
-MESSAGE_CATALOG_NAME = "exercise"
-translate = get_translation(MESSAGE_CATALOG_NAME)
+
+def stable_label(env, kind: str, source: str) -> str:
+    """
+    ``<docname>-<kind>-<short hash of source>``, with a ``-2``, ``-3``...
+    suffix if the label is already registered
+    """
+
+    digest = hashlib.sha1(source.encode("utf8")).hexdigest()[:8]
+    label = base = f"{env.docname}-{kind}-{digest}"
+    registry = env.sphinx_exercise_registry
+    number = 1
+    while label in registry:
+        number += 1
+        label = f"{base}-{number}"
+    return label
 
 
 class SphinxExerciseBaseDirective(SphinxDirective):
+    def header_hash(self):
+        """Hash of the directive header (name, arguments and options)"""
+
+        header = repr((self.name, self.arguments, sorted(self.options.items())))
+        return hashlib.sha1(header.encode("utf8")).hexdigest()
+
+    def auto_label(self, kind):
+        """
+        Label of a directive without one: ``<docname>-<kind>-<serial number>``,
+        or with ``exercise_stable_labels`` a short hash of the directive name,
+        arguments and content, so the label is kept when other directives
+        are added or removed (identical directives get a ``-2``, ``-3``...
+        suffix in document order). Gated directives have no content of their
+        own: they are labelled again once their body was collected (see
+        ``transforms.relabel_gated``).
+        """
+
+        if not self.config.exercise_stable_labels:
+            return f"{self.env.docname}-{kind}-{self.serial_number}"
+        source = "\n".join([self.name, *self.arguments, *self.content])
+        return stable_label(self.env, kind, source)
+
+    def mark_gated_label(self, result: List[Node]) -> List[Node]:
+        """Keep the header of an unlabelled gated directive on its node, to
+        label it with a hash of its body once it was collected"""
+
+        if result and self.config.exercise_stable_labels and self.options["noindex"]:
+            result[0]["stable_label"] = "\n".join([self.name, *self.arguments])
+        return result
+
     def duplicate_labels(self, label):
         """Check for duplicate labels"""
 
@@ -44,7 +90,7 @@ class SphinxExerciseBaseDirective(SphinxDirective):
             docpath = self.env.doc2path(self.env.docname)
             path = str(Path(docpath).with_suffix(""))
             other_path = self.env.doc2path(
-                self.env.sphinx_exercise_registry[label]["docname"]
+                self.env.sphinx_exercise_registry.docname(label)
             )
             msg = f"duplicate label: {label}; other instance in {other_path}"
             logger.warning(msg, location=path, color="red")
@@ -93,13 +139,15 @@ class ExerciseDirective(SphinxExerciseBaseDirective):
         "hidden": directives.flag,
     }
 
+    @traced("directive")
     def run(self) -> List[Node]:
-        self.defaults = {"title_text": f"{translate('Exercise')}"}
+        self.defaults = {"title_text": default_titles().exercise}
         self.serial_number = self.env.new_serialno()
+        header_hash = self.header_hash()
 
         # Initialise Registry (if needed)
         if not hasattr(self.env, "sphinx_exercise_registry"):
-            self.env.sphinx_exercise_registry = {}
+            self.env.sphinx_exercise_registry = ShardedRegistry.for_env(self.env)
 
         # Construct Title
         title = exercise_title()
@@ -134,7 +182,7 @@ class ExerciseDirective(SphinxExerciseBaseDirective):
             self.options["noindex"] = False
         else:
             self.options["noindex"] = True
-            label = f"{self.env.docname}-exercise-{self.serial_number}"
+            label = self.auto_label("exercise")
 
         # Check for Duplicate Labels
         # TODO: Should we just issue a warning rather than skip content?
@@ -169,6 +217,7 @@ class ExerciseDirective(SphinxExerciseBaseDirective):
             # Prior to Sphinx 6.1.0, the doctree was not cached, and Sphinx loaded a new copy
             # c.f. https://github.com/sphinx-doc/sphinx/commit/463a69664c2b7f51562eb9d15597987e6e6784cd
             "node": node.deepcopy(),
+            "hash": header_hash,
         }
 
         # TODO: Could tag this as Hidden to prevent the cell showing
@@ -221,18 +270,20 @@ class SolutionDirective(SphinxExerciseBaseDirective):
     }
     solution_node = solution_node
 
+    @traced("directive")
     def run(self) -> List[Node]:
         # Set default title based on exercise_style config
         if self.env.app.config.exercise_style == "solution_follow_exercise":
-            self.defaults = {"title_text": f"{translate('Solution')}"}
+            self.defaults = {"title_text": default_titles().solution}
         else:
-            self.defaults = {"title_text": f"{translate('Solution to')}"}
+            self.defaults = {"title_text": default_titles().solution_to}
         target_label = self.arguments[0]
         self.serial_number = self.env.new_serialno()
+        header_hash = self.header_hash()
 
         # Initialise Registry if Required
         if not hasattr(self.env, "sphinx_exercise_registry"):
-            self.env.sphinx_exercise_registry = {}
+            self.env.sphinx_exercise_registry = ShardedRegistry.for_env(self.env)
 
         # Parse :hide-solutions: option
         if self.env.app.config.hide_solutions:
@@ -253,7 +304,7 @@ class SolutionDirective(SphinxExerciseBaseDirective):
             self.options["noindex"] = False
         else:
             self.options["noindex"] = True
-            label = f"{self.env.docname}-solution-{self.serial_number}"
+            label = self.auto_label("solution")
 
         # Check for duplicate labels
         # TODO: Should we just issue a warning rather than skip content?
@@ -287,8 +338,17 @@ class SolutionDirective(SphinxExerciseBaseDirective):
             "type": self.name,
             "docname": self.env.docname,
             "node": node,
+            "hash": header_hash,
         }
 
+        # Reverse index of the solutions of each exercise
+        if not hasattr(self.env, "sphinx_exercise_solutions_index"):
+            self.env.sphinx_exercise_solutions_index = {}
+        solutions = self.env.sphinx_exercise_solutions_index.setdefault(
+            target_label, []
+        )
+        solutions.append(label)
+
         if node.get("hidden", bool):
             return []
 
@@ -334,7 +394,7 @@ class ExerciseStartDirective(ExerciseDirective):
             f"{self.name} at line: {self.lineno}"
         )
         # Run Parent Methods
-        return super().run()
+        return self.mark_gated_label(super().run())
 
 
 class ExerciseEndDirective(SphinxDirective):
@@ -346,6 +406,7 @@ class ExerciseEndDirective(SphinxDirective):
 
     name = "exercise-end"
 
+    @traced("directive")
     def run(self):
         # Initialise Gated Registry
         if not hasattr(self.env, "sphinx_exercise_gated_registry"):
@@ -404,7 +465,7 @@ class SolutionStartDirective(SolutionDirective):
             f"solution-start at line: {self.lineno}"
         )
         # Run Parent Methods
-        return super().run()
+        return self.mark_gated_label(super().run())
 
 
 class SolutionEndDirective(SphinxDirective):
@@ -416,6 +477,7 @@ class SolutionEndDirective(SphinxDirective):
 
     name = "solution-end"
 
+    @traced("directive")
     def run(self):
         # Initialise Gated Registry (if required)
         if not hasattr(self.env, "sphinx_exercise_gated_registry"):
@@ -0,0 +1,155 @@
+"""
+sphinx_exercise.domain
+~~~~~~~~~~~~~~~~~~~~~~
+
+Exercise domain and index
+
+The domain keeps a per-docname and per-class index of the exercises in each
+document (in document order) so that listings do not need to scan the
+registry, and provides an "Exercise Index" page through the domain index API.
+Exercises and solutions are also listed as domain objects, so that they are
+written to ``objects.inv``.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sphinx.domains import Domain, Index, IndexEntry, ObjType
+
+from .cache import get_title_cache
+from .inventory import exported_entries
+from .utils import toctree_order
+
+
+class ExerciseIndex(Index):
+    """Index of all exercises, grouped by document (if ``exercise_index``)"""
+
+    name = "index"
+    localname = "Exercise Index"
+    shortname = "exercises"
+
+    def generate(
+        self, docnames: Optional[Iterable[str]] = None
+    ) -> Tuple[List[Tuple[str, List[IndexEntry]]], bool]:
+        domain: ExerciseDomain = self.domain
+        env = domain.env
+        content = []
+        if not env.config.exercise_index:
+            return content, False
+        cache = get_title_cache(env)
+        for docname in domain.ordered_docnames(domain.exercises):
+            if docnames is not None and docname not in docnames:
+                continue
+            title = env.titles.get(docname)
+            heading = title.astext() if title is not None else docname
+            entries = []
+            for label in domain.exercises[docname]:
+                entry = cache.get(label)
+                name = entry.title if entry is not None else label
+                entries.append(IndexEntry(name, 0, docname, label, "", "", ""))
+            content.append((heading, entries))
+        return content, False
+
+
+class ExerciseDomain(Domain):
+    """
+    Exercise domain
+
+    ``data["exercises"]`` maps each docname to the labels of its exercises
+    and ``data["classes"]`` maps each class to the docnames and labels of
+    the exercises with that class.
+    """
+
+    name = "exercise"
+    label = "Exercise"
+    indices = [ExerciseIndex]
+    object_types = {
+        "exercise": ObjType("exercise", "ref", "numref"),
+        "solution": ObjType("solution", "ref"),
+    }
+    initial_data = {"exercises": {}, "classes": {}}
+    data_version = 1
+
+    @property
+    def exercises(self) -> Dict[str, List[str]]:
+        return self.data["exercises"]
+
+    @property
+    def classes(self) -> Dict[str, Dict[str, List[str]]]:
+        return self.data["classes"]
+
+    def note_exercise(self, docname: str, label: str, classes: Sequence[str]) -> None:
+        """Add an exercise to the index (called in document order)"""
+        self.exercises.setdefault(docname, []).append(label)
+        for name in classes:
+            self.classes.setdefault(name, {}).setdefault(docname, []).append(label)
+
+    def clear_doc(self, docname: str) -> None:
+        self.exercises.pop(docname, None)
+        for name in list(self.classes):
+            self.classes[name].pop(docname, None)
+            if not self.classes[name]:
+                del self.classes[name]
+
+    def merge_domaindata(self, docnames: Set[str], otherdata: Dict) -> None:
+        for docname in docnames:
+            if docname in otherdata["exercises"]:
+                self.exercises[docname] = otherdata["exercises"][docname]
+        for name, labels in otherdata["classes"].items():
+            for docname in docnames:
+                if docname in labels:
+                    self.classes.setdefault(name, {})[docname] = labels[docname]
+
+    def resolve_xref(self, env, fromdocname, builder, typ, target, node, contnode):
+        return None
+
+    def resolve_any_xref(self, env, fromdocname, builder, target, node, contnode):
+        return []
+
+    def get_objects(self) -> Iterator[Tuple[str, str, str, str, str, int]]:
+        # kept out of the search index (priority -1), which already finds
+        # exercises through their content
+        for label, entry in exported_entries(self.env):
+            yield label, entry.title, entry.type, entry.docname, label, -1
+
+    def ordered_docnames(self, docnames: Iterable[str]) -> List[str]:
+        """``docnames`` in toctree order"""
+        ranks = toctree_order(self.env)
+        return sorted(docnames, key=lambda name: (ranks.get(name, len(ranks)), name))
+
+    def find_exercises(
+        self,
+        patterns: Sequence[str] = ("*",),
+        classes: Sequence[str] = (),
+        exclude: Optional[str] = None,
+    ) -> List[Tuple[str, str]]:
+        """
+        (docname, label) of the exercises in documents matching one of
+        ``patterns`` (and with one of ``classes``) in toctree and document
+        order
+        """
+
+        if classes:
+            by_docname: Dict[str, Set[str]] = {}
+            for name in classes:
+                for docname, labels in self.classes.get(name, {}).items():
+                    by_docname.setdefault(docname, set()).update(labels)
+        else:
+            by_docname = None
+
+        candidates = self.exercises if by_docname is None else by_docname
+        docnames = [
+            docname
+            for docname in candidates
+            if docname != exclude
+            and any(fnmatchcase(docname, pattern) for pattern in patterns)
+        ]
+        found = []
+        for docname in self.ordered_docnames(docnames):
+            for label in self.exercises.get(docname, ()):
+                if by_docname is None or label in by_docname[docname]:
+                    found.append((docname, label))
+        return found
@@ -0,0 +1,251 @@
+"""
+sphinx_exercise.inventory
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Inventory of exercise and solution labels for cross-project references
+
+Every (visible) exercise and solution is listed in ``objects.inv`` as an
+``exercise:exercise`` or ``exercise:solution`` object (see
+``ExerciseDomain.get_objects``), but those entries have no field for the
+resolved number that ``numref`` needs. HTML builds therefore also write
+``exercises.inv.json`` next to ``objects.inv``, holding the URI, resolved
+number and title of each of them::
+
+    {"version": 1, "project": "Calculus", "items": {
+        "limits-1": {"type": "exercise", "uri": "limits.html#limits-1",
+                     "number": "1.1", "title": "Exercise 1.1 (Limits)"}}}
+
+Other projects list cached copies of these files in ``exercise_inventories``
+and ``ref``/``numref`` roles that are not resolved locally are resolved to
+the remote exercise, with or without a ``<project>:`` prefix::
+
+    exercise_inventories = {
+        "calculus": ("https://example.org/calculus/", "_inv/calculus.json"),
+    }
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from docutils import nodes as docutil_nodes
+from docutils.nodes import Element, Node
+from sphinx import addnodes
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+from .cache import TitleEntry, get_title_cache
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_FILENAME = "exercises.inv.json"
+INVENTORY_VERSION = 1
+
+# Builders writing one page per document, for which URIs are exported
+INVENTORY_BUILDERS = ("html", "dirhtml")
+
+
+def exported_entries(env: BuildEnvironment) -> Iterator[Tuple[str, TitleEntry]]:
+    """Labels and title cache entries of the exercises and solutions that
+    are exported (not hidden and not imported), sorted by label"""
+
+    registry = getattr(env, "sphinx_exercise_registry", None)
+    if registry is None:
+        return
+    for label, entry in sorted(get_title_cache(env).items()):
+        summary = registry.summary(label)
+        if summary is None or summary.imported or summary.hidden:
+            continue
+        yield label, entry
+
+
+def inventory_items(app: Sphinx) -> Dict[str, Dict[str, str]]:
+    """Inventory entries of the exercises and solutions of this project"""
+
+    items = {}
+    for label, entry in exported_entries(app.env):
+        uri = app.builder.get_target_uri(entry.docname) + "#" + label
+        items[label] = {
+            "type": entry.type,
+            "docname": entry.docname,
+            "uri": uri,
+            "number": entry.number,
+            "title": entry.title,
+        }
+    return items
+
+
+def write_inventory(app: Sphinx, exc) -> None:
+    """Write the inventory to the output directory (if it changed)"""
+
+    if exc is not None or app.builder.name not in INVENTORY_BUILDERS:
+        return
+    data = {
+        "version": INVENTORY_VERSION,
+        "project": app.config.project,
+        "release": app.config.release,
+        "items": inventory_items(app),
+    }
+    content = json.dumps(data, indent=1, sort_keys=True, ensure_ascii=False)
+    path = Path(app.outdir, INVENTORY_FILENAME)
+    try:
+        if path.read_text("utf8") == content:
+            return
+    except OSError:
+        pass
+    path.write_text(content, "utf8")
+
+
+# Consuming projects
+
+
+class RemoteInventory:
+    """A cached inventory of another project"""
+
+    def __init__(self, name: str, base_uri: str, path: Path):
+        self.name = name
+        self.base_uri = base_uri
+        self.path = path
+        self.items: Dict[str, Dict[str, str]] = {}
+        self.stamp = None
+
+    def load(self) -> None:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            stamp = None
+        else:
+            stamp = [stat.st_size, stat.st_mtime_ns]
+        if stamp == self.stamp:
+            return
+        self.stamp = stamp
+        self.items = {}
+        if stamp is None:
+            logger.warning(
+                f"[sphinx-exercise] exercise inventory not found: {self.path}",
+                color="red",
+            )
+            return
+        try:
+            data = json.loads(self.path.read_text("utf8"))
+            if data["version"] != INVENTORY_VERSION:
+                raise ValueError(f"unsupported version {data['version']}")
+            self.items = data["items"]
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning(
+                f"[sphinx-exercise] invalid exercise inventory {self.path}: {error}",
+                color="red",
+            )
+
+    def uri(self, label: str) -> str:
+        base_uri = self.base_uri
+        if base_uri and not base_uri.endswith("/"):
+            base_uri += "/"
+        return base_uri + self.items[label]["uri"]
+
+
+_inventories: Dict[Tuple[str, str, str], RemoteInventory] = {}
+
+
+def get_inventories(app: Sphinx) -> List[RemoteInventory]:
+    """The inventories configured with ``exercise_inventories`` (in order)"""
+
+    inventories = []
+    for name, (base_uri, path) in app.config.exercise_inventories.items():
+        path = Path(app.confdir, path)
+        key = (name, base_uri, str(path))
+        if key not in _inventories:
+            _inventories[key] = RemoteInventory(name, base_uri, path)
+        inventory = _inventories[key]
+        inventory.load()
+        inventories.append(inventory)
+    return inventories
+
+
+def find_remote(app: Sphinx, target: str) -> Optional[Tuple[RemoteInventory, str]]:
+    """The inventory and label for ``target`` (``label`` or ``project:label``)"""
+
+    inventories = get_inventories(app)
+    name, _, label = target.partition(":")
+    if label:
+        for inventory in inventories:
+            if inventory.name == name and label in inventory.items:
+                return inventory, label
+    for inventory in inventories:
+        if target in inventory.items:
+            return inventory, target
+    return None
+
+
+def numref_text(
+    app: Sphinx, node: Element, contnode: Node, number: str, name: str
+) -> str:
+    """Text of a ``numref`` to an exercise with ``number`` and title ``name``"""
+    if node.get("refexplicit"):
+        title = contnode.astext()
+    else:
+        title = app.config.numfig_format.get("exercise", "")
+    if "{number}" in title or "{name}" in title:
+        return title.format(number=number, name=name)
+    if "%s" in title:
+        return title % number
+    return title
+
+
+def resolve_remote_reference(
+    app: Sphinx, env: BuildEnvironment, node: Element, contnode: Node
+) -> Optional[Node]:
+    """Resolve ``ref``/``numref`` to exercises and solutions of other projects"""
+
+    if node.get("refdomain") != "std" or node.get("reftype") not in ("ref", "numref"):
+        return None
+    if not app.config.exercise_inventories:
+        return None
+    found = find_remote(app, node["reftarget"])
+    if found is None:
+        return None
+    inventory, label = found
+    entry = inventory.items[label]
+
+    if node["reftype"] == "numref":
+        if entry["type"] != "exercise" or not entry["number"]:
+            return None
+        text = numref_text(app, node, contnode, entry["number"], entry["title"])
+    elif node.get("refexplicit"):
+        text = contnode.astext()
+    else:
+        text = entry["title"]
+
+    rolename = node["reftype"]
+    node_class = (
+        addnodes.number_reference if rolename == "numref" else docutil_nodes.reference
+    )
+    reference = node_class(
+        "",
+        "",
+        internal=False,
+        refuri=inventory.uri(label),
+        reftitle=f"({inventory.name}) {entry['title']}",
+    )
+    reference += docutil_nodes.inline(text, text, classes=["std", f"std-{rolename}"])
+    return reference
+
+
+def inventories_updated(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """
+    Return all documents when a cached inventory changed since the last
+    build, so that references to it are resolved again
+    """
+
+    if not app.config.exercise_inventories:
+        return []
+    stamps = {inventory.name: inventory.stamp for inventory in get_inventories(app)}
+    previous = getattr(env, "sphinx_exercise_inventory_stamps", None)
+    env.sphinx_exercise_inventory_stamps = stamps
+    if previous is None or previous == stamps:
+        return []
+    return sorted(env.found_docs)
@@ -0,0 +1,277 @@
+"""
+sphinx_exercise.listing
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Exercise listings (``exercise-list``)
+
+An ``exercise-list`` directive lists exercises with their numbers, titles and
+links, using the per-docname and per-class index of the exercise domain and
+the titles of the title cache. With the HTML builders, long lists are split
+into pages of ``exercise_list_page_size`` entries: the first page is shown in
+place of the directive and the others are written as additional pages, which
+are only regenerated when their entries change.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import hashlib
+import json
+from html import escape
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Tuple
+
+from docutils import nodes as docutil_nodes
+from docutils.nodes import Node
+from docutils.parsers.rst import directives
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.util.docutils import SphinxDirective
+from sphinx.util.osutil import relative_uri
+
+from ._compat import findall
+from .cache import get_title_cache
+from .nodes import exercise_list_node
+from .profiling import traced
+
+# Builders writing one page per document, for which lists are paginated
+PAGINATED_BUILDERS = ("html", "dirhtml")
+PAGES_FILENAME = "list-pages.json"
+
+
+class ExerciseListDirective(SphinxDirective):
+    """
+    A list of exercises with numbers, titles and links
+
+    .. exercise-list::
+       :docnames: <patterns> (optional)
+       :class: <classes> (optional)
+
+    Parameters:
+    -----------
+    docnames : str,
+            Space separated glob patterns; only exercises in documents
+            matching one of them are listed (default: all documents)
+    class : str,
+            Only exercises with one of these classes are listed
+    """
+
+    name = "exercise-list"
+    has_content = False
+    required_arguments = 0
+    optional_arguments = 0
+    option_spec = {
+        "docnames": directives.unchanged_required,
+        "class": directives.class_option,
+    }
+
+    def run(self) -> List[Node]:
+        patterns = tuple(self.options.get("docnames", "*").split())
+        classes = tuple(self.options.get("class", ()))
+
+        if not hasattr(self.env, "sphinx_exercise_exercise_lists"):
+            self.env.sphinx_exercise_exercise_lists = {}
+        lists = self.env.sphinx_exercise_exercise_lists.setdefault(
+            self.env.docname, {"filters": [], "signature": None}
+        )
+        node = exercise_list_node()
+        node["docnames"] = patterns
+        node["filter_classes"] = classes
+        node["index"] = len(lists["filters"])
+        lists["filters"].append((patterns, classes))
+        return [node]
+
+
+def list_entries(
+    env: BuildEnvironment, docname: str, patterns, classes
+) -> List[Tuple[str, str, str]]:
+    """(docname, label, title) of the exercises listed by an exercise-list"""
+    domain = env.get_domain("exercise")
+    cache = get_title_cache(env)
+    entries = []
+    for name, label in domain.find_exercises(patterns, classes, exclude=docname):
+        entry = cache.get(label)
+        entries.append((name, label, entry.title if entry is not None else label))
+    return entries
+
+
+def page_size(app: Sphinx) -> int:
+    """Entries per page (0 when the current builder does not paginate)"""
+    if app.builder.name not in PAGINATED_BUILDERS:
+        return 0
+    return max(app.config.exercise_list_page_size, 0)
+
+
+def paginate(entries: list, size: int) -> List[list]:
+    if not size or len(entries) <= size:
+        return [entries]
+    return [entries[start : start + size] for start in range(0, len(entries), size)]
+
+
+def page_name(docname: str, index: int, page: int) -> str:
+    """Name of an additional page (``page`` counts from 1)"""
+    return f"{docname}-exercise-list-{index}-{page}"
+
+
+def update_exercise_lists(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """
+    Return the documents with an ``exercise-list`` whose first page changed
+    since they were last written
+    """
+
+    lists = getattr(env, "sphinx_exercise_exercise_lists", {})
+    if not lists:
+        return []
+    size = page_size(app)
+    outdated = []
+    for docname, data in lists.items():
+        signature = []
+        for patterns, classes in data["filters"]:
+            pages = paginate(list_entries(env, docname, patterns, classes), size)
+            signature.append((tuple(pages[0]), len(pages)))
+        signature = tuple(signature)
+        if signature != data["signature"]:
+            data["signature"] = signature
+            outdated.append(docname)
+    return sorted(outdated)
+
+
+def purge_exercise_lists(app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    if hasattr(env, "sphinx_exercise_exercise_lists"):
+        env.sphinx_exercise_exercise_lists.pop(docname, None)
+
+
+def merge_exercise_lists(
+    app: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment
+) -> None:
+    if not hasattr(env, "sphinx_exercise_exercise_lists"):
+        env.sphinx_exercise_exercise_lists = {}
+    for docname in docnames:
+        if docname in getattr(other, "sphinx_exercise_exercise_lists", {}):
+            env.sphinx_exercise_exercise_lists[docname] = (
+                other.sphinx_exercise_exercise_lists[docname]
+            )
+
+
+class ResolveExerciseLists(SphinxPostTransform):
+    """Replace ``exercise-list`` placeholders with the (first page of) the list"""
+
+    default_priority = 6
+
+    def relative_uri(self, target: str) -> str:
+        return self.app.builder.get_relative_uri(self.env.docname, target)
+
+    @traced("post-transform")
+    def run(self):
+        size = page_size(self.app)
+        for node in findall(self.document, exercise_list_node):
+            entries = list_entries(
+                self.env, self.env.docname, node["docnames"], node["filter_classes"]
+            )
+            pages = paginate(entries, size)
+            items = docutil_nodes.bullet_list(classes=["exercise-list"])
+            for docname, label, title in pages[0]:
+                refuri = self.relative_uri(docname) + "#" + label
+                reference = docutil_nodes.reference(
+                    "", title, internal=True, refuri=refuri
+                )
+                items += docutil_nodes.list_item(
+                    "", docutil_nodes.paragraph("", "", reference)
+                )
+            content = [items]
+            if len(pages) > 1:
+                navigation = docutil_nodes.paragraph(classes=["exercise-list-pages"])
+                for page in range(2, len(pages) + 1):
+                    pagename = page_name(self.env.docname, node["index"], page)
+                    refuri = self.relative_uri(pagename)
+                    navigation += docutil_nodes.reference(
+                        "", str(page), internal=True, refuri=refuri
+                    )
+                    navigation += docutil_nodes.Text(" ")
+                content.append(navigation)
+            node.replace_self(content)
+
+
+# Additional pages
+
+
+def _render_page(builder, pagename, title, entries, pages, page) -> str:
+    def uri(target):
+        return relative_uri(
+            builder.get_target_uri(pagename), builder.get_target_uri(target)
+        )
+
+    lines = [f"<section><h1>{escape(title)}</h1>", '<ul class="exercise-list">']
+    for docname, label, text in entries:
+        href = escape(f"{uri(docname)}#{label}")
+        lines.append(
+            f'<li><p><a class="reference internal" href="{href}">{escape(text)}</a>'
+            "</p></li>"
+        )
+    lines.append('</ul><p class="exercise-list-pages">')
+    for number, target in enumerate(pages, 1):
+        if number == page:
+            lines.append(f"<strong>{number}</strong> ")
+        else:
+            lines.append(f'<a href="{escape(uri(target))}">{number}</a> ')
+    lines.append("</p></section>")
+    return "\n".join(lines)
+
+
+def _pages_path(app: Sphinx) -> Path:
+    return Path(app.doctreedir).joinpath("sphinx_exercise", PAGES_FILENAME)
+
+
+def collect_list_pages(app: Sphinx) -> Iterator[Tuple[str, Dict, str]]:
+    """
+    Yield the additional pages of paginated exercise lists whose entries
+    changed (or that are missing) since they were last written
+    """
+
+    size = page_size(app)
+    lists = getattr(app.env, "sphinx_exercise_exercise_lists", {})
+    builder = app.builder
+    path = _pages_path(app)
+    try:
+        written = json.loads(path.read_text("utf8")).get(builder.name, {})
+    except (OSError, ValueError):
+        written = {}
+    config_hash = getattr(getattr(builder, "build_info", None), "config_hash", "")
+
+    current = {}
+    for docname, data in sorted(lists.items()):
+        title = app.env.titles.get(docname)
+        title = title.astext() if title is not None else docname
+        for index, (patterns, classes) in enumerate(data["filters"]):
+            entries = list_entries(app.env, docname, patterns, classes)
+            pages = paginate(entries, size) if size else [entries]
+            names = [docname] + [
+                page_name(docname, index, page) for page in range(2, len(pages) + 1)
+            ]
+            for page in range(2, len(pages) + 1):
+                pagename = names[page - 1]
+                body = _render_page(
+                    builder, pagename, title, pages[page - 1], names, page
+                )
+                digest = hashlib.sha1((config_hash + body).encode("utf8")).hexdigest()
+                current[pagename] = digest
+                output = Path(builder.get_outfilename(pagename))
+                if written.get(pagename) == digest and output.exists():
+                    continue
+                context = {"title": f"{title} ({page})", "body": body}
+                yield pagename, context, "page.html"
+
+    # remove pages of lists that became shorter or were removed
+    for pagename in set(written) - set(current):
+        output = Path(builder.get_outfilename(pagename))
+        if output.exists():
+            output.unlink()
+
+    try:
+        data = json.loads(path.read_text("utf8"))
+    except (OSError, ValueError):
+        data = {}
+    data[builder.name] = current
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data), "utf8")
@@ -0,0 +1,263 @@
+"""
+sphinx_exercise.manifest
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Registry manifests for books built in shards
+
+A shard built with ``exercise_manifest_export`` writes a manifest of its
+exercises and solutions (docname, number, title and subtitle of each label)
+once numbers have been assigned and before any page is written, so that a
+read-only build (``-b dummy``) is enough to produce it. Shards listing other
+manifests in ``exercise_manifest_import`` seed ``env.sphinx_exercise_registry``
+with read-only records for the labels of documents they do not build, so
+solutions and references to exercises of other shards resolve without
+reading their sources.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from docutils import nodes as docutil_nodes
+from docutils.nodes import Element, Node
+from sphinx import addnodes
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+from .cache import get_title_cache
+from .inventory import numref_text
+from .nodes import (
+    exercise_enumerable_node,
+    exercise_node,
+    exercise_subtitle,
+    exercise_title,
+    solution_node,
+    solution_title,
+)
+from .registry import SOLUTION_TYPES, ShardedRegistry, registry_summaries
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def manifest_items(app: Sphinx) -> Dict[str, dict]:
+    """Manifest entries of the exercises and solutions read by this build"""
+
+    env = app.env
+    registry = getattr(env, "sphinx_exercise_registry", {})
+    cache = get_title_cache(env)
+    items = {}
+    for summary in sorted(registry_summaries(registry)):
+        if summary.imported:
+            continue
+        label = summary.label
+        entry = cache.get(label)
+        item = {
+            "type": summary.type,
+            "docname": summary.docname,
+            "number": entry.number if entry is not None else "",
+            "title": entry.title if entry is not None else label,
+            "hidden": summary.hidden,
+            "classes": list(summary.classes),
+        }
+        if summary.type in SOLUTION_TYPES:
+            item["target_label"] = summary.target_label
+        else:
+            item["enumerated"] = summary.enumerable
+            item["default_title"] = summary.default_title
+            if summary.subtitle is not None:
+                item["subtitle"] = summary.subtitle
+        items[label] = item
+    return items
+
+
+def export_manifest(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """Write the manifest (if it changed) once numbers have been assigned"""
+
+    if not app.config.exercise_manifest_export:
+        return []
+    data = {
+        "version": MANIFEST_VERSION,
+        "project": app.config.project,
+        "items": manifest_items(app),
+    }
+    content = json.dumps(data, indent=1, sort_keys=True, ensure_ascii=False)
+    path = Path(app.outdir, app.config.exercise_manifest_export)
+    try:
+        if path.read_text("utf8") == content:
+            return []
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, "utf8")
+    return []
+
+
+# Importing shards
+
+
+def _manifest_paths(app: Sphinx) -> List[Path]:
+    return [Path(app.confdir, path) for path in app.config.exercise_manifest_import]
+
+
+def _stamp(path: Path) -> Optional[list]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_manifest(path: Path) -> Dict[str, dict]:
+    """The items of the manifest at ``path`` (empty if it cannot be read)"""
+    try:
+        data = json.loads(path.read_text("utf8"))
+        if data["version"] != MANIFEST_VERSION:
+            raise ValueError(f"unsupported version {data['version']}")
+        return data["items"]
+    except (OSError, ValueError, KeyError) as error:
+        logger.warning(
+            f"[sphinx-exercise] cannot read exercise manifest {path}: {error}",
+            color="red",
+        )
+        return {}
+
+
+def imported_node(label: str, item: dict) -> Element:
+    """A stand-in for the node of an exercise or solution of another shard"""
+
+    if item["type"] in SOLUTION_TYPES:
+        node = solution_node()
+        node += solution_title(item["title"], item["title"])
+        node["target_label"] = item.get("target_label")
+        node["title"] = item["title"]
+    else:
+        if item.get("enumerated"):
+            node = exercise_enumerable_node()
+        else:
+            node = exercise_node()
+        title = exercise_title()
+        title += docutil_nodes.Text(item.get("default_title", ""))
+        if item.get("subtitle"):
+            subtitle = exercise_subtitle()
+            subtitle += docutil_nodes.Text(item["subtitle"])
+            title += subtitle
+        node += title
+        node["title"] = item.get("default_title", "")
+    node["ids"].append(label)
+    node["classes"].extend(item.get("classes", ()))
+    node["label"] = label
+    node["docname"] = item["docname"]
+    node["type"] = item["type"]
+    node["hidden"] = item.get("hidden", False)
+    return node
+
+
+def import_manifests(
+    app: Sphinx,
+    env: BuildEnvironment,
+    added: Set[str],
+    changed: Set[str],
+    removed: Set[str],
+) -> List[str]:
+    """
+    Seed the registry with the labels of the imported manifests whose
+    documents are not part of this build (replacing previously imported
+    records, whose labels are kept in ``env.sphinx_exercise_imported_labels``)
+    """
+
+    imported = getattr(env, "sphinx_exercise_imported_labels", set())
+    if not app.config.exercise_manifest_import and not imported:
+        env.sphinx_exercise_manifest_stamps = []
+        return []
+
+    if not hasattr(env, "sphinx_exercise_registry"):
+        env.sphinx_exercise_registry = ShardedRegistry.for_env(env)
+    registry = env.sphinx_exercise_registry
+    for label in imported:
+        if label in registry and registry[label].get("imported"):
+            del registry[label]
+    imported = set()
+
+    stamps = []
+    for path in _manifest_paths(app):
+        stamps.append(_stamp(path))
+        for label, item in read_manifest(path).items():
+            if item["docname"] in env.found_docs or label in registry:
+                continue
+            registry[label] = {
+                "type": item["type"],
+                "docname": item["docname"],
+                "node": imported_node(label, item),
+                "hash": None,
+                "imported": True,
+                "number": item["number"],
+            }
+            imported.add(label)
+    env.sphinx_exercise_imported_labels = imported
+    env.sphinx_exercise_manifest_stamps = stamps
+    return []
+
+
+def imported_fignumbers(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """
+    Add the numbers of imported exercises to ``env.toc_fignumbers`` (after
+    Sphinx assigned the numbers of this build) and return all documents if
+    the imported manifests changed since the last build
+    """
+
+    registry = getattr(env, "sphinx_exercise_registry", {})
+    for label in sorted(getattr(env, "sphinx_exercise_imported_labels", ())):
+        record = registry.get(label)
+        if record is None or record["type"] in SOLUTION_TYPES:
+            continue
+        if record["number"]:
+            number = tuple(int(part) for part in record["number"].split("."))
+            fignumbers = env.toc_fignumbers.setdefault(record["docname"], {})
+            fignumbers.setdefault("exercise", {})[label] = number
+
+    stamps = getattr(env, "sphinx_exercise_manifest_stamps", [])
+    previous = getattr(env, "sphinx_exercise_written_manifest_stamps", None)
+    env.sphinx_exercise_written_manifest_stamps = stamps
+    if previous is None or previous == stamps:
+        return []
+    return sorted(env.found_docs)
+
+
+def resolve_imported_reference(
+    app: Sphinx, env: BuildEnvironment, node: Element, contnode: Node
+) -> Optional[Node]:
+    """Resolve ``ref``/``numref`` to exercises and solutions of other shards"""
+
+    if node.get("refdomain") != "std" or node.get("reftype") not in ("ref", "numref"):
+        return None
+    label = node["reftarget"]
+    record = getattr(env, "sphinx_exercise_registry", {}).get(label)
+    if record is None or not record.get("imported"):
+        return None
+    entry = get_title_cache(env).get(label)
+    if entry is None:
+        return None
+
+    rolename = node["reftype"]
+    if rolename == "numref":
+        if entry.type != "exercise" or not entry.number:
+            return None
+        text = numref_text(app, node, contnode, entry.number, entry.title)
+    elif node.get("refexplicit"):
+        text = contnode.astext()
+    else:
+        text = entry.title
+
+    refuri = app.builder.get_relative_uri(node["refdoc"], record["docname"])
+    node_class = (
+        addnodes.number_reference if rolename == "numref" else docutil_nodes.reference
+    )
+    reference = node_class("", "", internal=True, refuri=refuri + "#" + label)
+    reference += docutil_nodes.inline(text, text, classes=["std", f"std-{rolename}"])
+    return reference
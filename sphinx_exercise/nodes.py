@@ -13,15 +13,14 @@ from docutils.nodes import Node
 from docutils import nodes as docutil_nodes
 from sphinx import addnodes as sphinx_nodes
 from sphinx.writers.latex import LaTeXTranslator
-from sphinx.locale import get_translation
 
 from .latex import LaTeXMarkup
+from .registry import frozen_registry
+from .titles import default_titles
 
 logger = logging.getLogger(__name__)
 LaTeX = LaTeXMarkup()
 
-MESSAGE_CATALOG_NAME = "exercise"
-translate = get_translation(MESSAGE_CATALOG_NAME)
 
 # Nodes
 
@@ -54,10 +53,8 @@ class solution_end_node(docutil_nodes.Admonition, docutil_nodes.Element):
 class exercise_title(docutil_nodes.title):
     def default_title(self):
         title_text = self.children[0].astext()
-        if (
-            title_text == f"{translate('Exercise')}"
-            or title_text == f"{translate('Exercise')} %s"
-        ):
+        titles = default_titles()
+        if title_text == titles.exercise or title_text == titles.numfig_format:
             return True
         else:
             return False
@@ -70,7 +67,7 @@ class exercise_subtitle(docutil_nodes.subtitle):
 class solution_title(docutil_nodes.title):
     def default_title(self):
         title_text = self.children[0].astext()
-        if title_text == f"{translate('Solution to')}":
+        if title_text == default_titles().solution_to:
             return True
         else:
             return False
@@ -80,6 +77,14 @@ class solution_subtitle(docutil_nodes.subtitle):
     pass
 
 
+class solutions_list_node(docutil_nodes.General, docutil_nodes.Element):
+    """Placeholder replaced by the solutions it lists in post transforms"""
+
+
+class exercise_list_node(docutil_nodes.General, docutil_nodes.Element):
+    """Placeholder replaced by the exercises it lists in post transforms"""
+
+
 class exercise_latex_number_reference(sphinx_nodes.number_reference):
     pass
 
@@ -159,8 +164,7 @@ def visit_solution_node(self, node: Node) -> None:
     """
     if isinstance(self, LaTeXTranslator):
         target_label = node.attributes["label"]
-        target_node = self.builder.env.sphinx_exercise_registry[target_label]
-        docname = target_node.get("docname")
+        docname = frozen_registry(self.builder.env)[target_label].docname
         label = (
             "\\phantomsection \\label{"
             + f"{docname}:{node.attributes['label']}"
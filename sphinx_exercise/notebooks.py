@@ -0,0 +1,257 @@
+"""
+sphinx_exercise.notebooks
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Jupyter notebooks of exercises (``exercise_notebooks``)
+
+At the end of an HTML build one notebook per chapter (the root document and
+each document in its toctree) is written to ``<outdir>/_exercises``. It holds
+the exercises of the chapter as Markdown cells, titled with the numbers and
+titles of the title cache, and the code cells of gated exercises as code
+cells; ``exercise_notebooks_solutions`` adds the solutions at the end.
+Each chapter is converted and written by a worker of a thread pool, which
+loads its doctrees one document at a time (overlapping the reading and
+writing of files), and notebooks are only written when their content changed.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from docutils import nodes as docutil_nodes
+from docutils.nodes import Node
+from sphinx.application import Sphinx
+
+from ._compat import findall
+from .cache import get_title_cache
+from .nodes import exercise_subtitle, is_exercise_node, solution_node
+from .titles import default_titles
+from .utils import toctree_chapters
+
+NOTEBOOKS_DIRNAME = "_exercises"
+NOTEBOOK_BUILDERS = ("html", "dirhtml", "singlehtml")
+
+
+# Markdown conversion
+
+
+def inline_markdown(node: Node) -> str:
+    """Markdown for inline content"""
+    if isinstance(node, docutil_nodes.Text):
+        return node.astext()
+    if isinstance(node, docutil_nodes.math):
+        return f"${node.astext()}$"
+    if isinstance(node, docutil_nodes.literal):
+        return f"`{node.astext()}`"
+    text = "".join(inline_markdown(child) for child in node.children)
+    if isinstance(node, docutil_nodes.emphasis):
+        return f"*{text}*"
+    if isinstance(node, docutil_nodes.strong):
+        return f"**{text}**"
+    if isinstance(node, docutil_nodes.reference) and node.get("refuri"):
+        if not node.get("internal"):
+            return f"[{text}]({node['refuri']})"
+    return text
+
+
+def _code_cell(source: str) -> dict:
+    return {
+        "cell_type": "code",
+        "execution_count": None,
+        "metadata": {},
+        "outputs": [],
+        "source": source.splitlines(keepends=True),
+    }
+
+
+def _markdown_cell(source: str) -> dict:
+    return {
+        "cell_type": "markdown",
+        "metadata": {},
+        "source": source.splitlines(keepends=True),
+    }
+
+
+class CellWriter:
+    """Converts the body of exercises and solutions into notebook cells"""
+
+    def __init__(self):
+        self.cells: List[dict] = []
+        self.lines: List[str] = []
+
+    def flush(self) -> None:
+        while self.lines and not self.lines[-1].strip():
+            self.lines.pop()
+        if self.lines:
+            self.cells.append(_markdown_cell("\n".join(self.lines)))
+        self.lines = []
+
+    def markdown(self, text: str) -> None:
+        self.lines.extend(text.splitlines())
+        self.lines.append("")
+
+    def block(self, node: Node, prefix: str = "") -> None:
+        if isinstance(node, docutil_nodes.container):
+            if node.get("nb_element") == "cell_code":
+                for source in findall(node, docutil_nodes.literal_block):
+                    if "cell_input" in source.parent.get("classes", ()):
+                        self.flush()
+                        self.cells.append(_code_cell(source.astext()))
+                return
+        if isinstance(node, (docutil_nodes.paragraph, docutil_nodes.rubric)):
+            self.markdown(prefix + inline_markdown(node))
+        elif isinstance(node, docutil_nodes.math_block):
+            self.markdown(f"{prefix}$$\n{node.astext()}\n$$")
+        elif isinstance(node, docutil_nodes.literal_block):
+            language = node.get("language", "")
+            self.markdown(f"```{language}\n{node.astext()}\n```")
+        elif isinstance(node, docutil_nodes.image):
+            self.markdown(f"![{node.get('alt', '')}]({node['uri']})")
+        elif isinstance(
+            node, (docutil_nodes.bullet_list, docutil_nodes.enumerated_list)
+        ):
+            enumerated = isinstance(node, docutil_nodes.enumerated_list)
+            for number, item in enumerate(node.children, 1):
+                marker = f"{number}. " if enumerated else "- "
+                for index, child in enumerate(item.children):
+                    self.block(child, marker if index == 0 else "  ")
+                if self.lines and not self.lines[-1]:
+                    self.lines.pop()
+            self.lines.append("")
+        elif isinstance(node, (docutil_nodes.comment, docutil_nodes.target)):
+            return
+        elif isinstance(node, docutil_nodes.TextElement):
+            self.markdown(prefix + inline_markdown(node))
+        else:
+            for child in node.children:
+                self.block(child, prefix)
+
+
+# Notebooks
+
+
+def _body(node: Node) -> List[Node]:
+    return [
+        child for child in node.children if not isinstance(child, docutil_nodes.title)
+    ]
+
+
+def exercise_heading(app: Sphinx, node: Node, number: str) -> str:
+    """Markdown title of an exercise, e.g. ``Exercise 1.2 ($n!$)``"""
+    title = node.children[0]
+    if number:
+        text = app.config.numfig_format["exercise"] % number
+    else:
+        text = title.children[0].astext()
+    if len(title.children) > 1 and isinstance(title.children[1], exercise_subtitle):
+        text += f" ({inline_markdown(title.children[1])})"
+    return text
+
+
+def chapter_cells(
+    app: Sphinx, docnames: List[str], solutions: bool
+) -> Optional[List[dict]]:
+    """Cells of the notebook of a chapter (None if it has no exercises)"""
+
+    env = app.env
+    cache = get_title_cache(env)
+    exercises = CellWriter()
+    headings = {}
+    for docname in docnames:
+        for node in findall(env.get_doctree(docname), is_exercise_node):
+            if node.get("hidden"):
+                continue
+            entry = cache.get(node["label"])
+            number = entry.number if entry is not None else ""
+            headings[node["label"]] = exercise_heading(app, node, number)
+            exercises.markdown(f"## {headings[node['label']]}")
+            for child in _body(node):
+                exercises.block(child)
+            exercises.flush()
+    if not headings:
+        return None
+    cells = exercises.cells
+    if not solutions:
+        return cells
+
+    # solutions of these exercises, wherever they are defined
+    index = getattr(env, "sphinx_exercise_solutions_index", {})
+    registry = env.sphinx_exercise_registry
+    wanted = {label for exercise in headings for label in index.get(exercise, ())}
+    titles = default_titles()
+    answers = CellWriter()
+    for docname in sorted({registry.docname(label) for label in wanted}):
+        for node in findall(env.get_doctree(docname), solution_node):
+            if node.get("label") not in wanted or node.get("hidden"):
+                continue
+            if app.config.exercise_style == "solution_follow_exercise":
+                title = titles.solution
+            else:
+                heading = headings[node.get("target_label")]
+                title = f"{titles.solution_to} {heading}"
+            answers.markdown(f"### {title}")
+            for child in _body(node):
+                answers.block(child)
+            answers.flush()
+    if answers.cells:
+        cells.append(_markdown_cell(f"## {titles.solution}"))
+        cells.extend(answers.cells)
+    return cells
+
+
+def notebook(app: Sphinx, chapter: str, cells: List[dict]) -> dict:
+    title = app.env.titles.get(chapter)
+    title = title.astext() if title is not None else chapter
+    metadata = {}
+    kernelspec = app.env.metadata.get(chapter, {}).get("kernelspec")
+    if isinstance(kernelspec, dict):
+        metadata["kernelspec"] = kernelspec
+    return {
+        "cells": [_markdown_cell(f"# {title}")] + cells,
+        "metadata": metadata,
+        "nbformat": 4,
+        "nbformat_minor": 4,
+    }
+
+
+def _write(path: Path, data: dict) -> None:
+    content = json.dumps(data, indent=1, ensure_ascii=False) + "\n"
+    try:
+        if path.read_text("utf8") == content:
+            return
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, "utf8")
+
+
+def write_notebooks(app: Sphinx, exc) -> None:
+    """Write one notebook of exercises per chapter (if ``exercise_notebooks``)"""
+
+    if exc is not None or not app.config.exercise_notebooks:
+        return
+    if app.builder.name not in NOTEBOOK_BUILDERS:
+        return
+    outdir = Path(app.outdir, NOTEBOOKS_DIRNAME)
+    solutions = app.config.exercise_notebooks_solutions
+    node_order: Dict = getattr(app.env, "sphinx_exercise_node_order", {})
+    # loaded here, as the SQLite connection may only be used by this thread
+    get_title_cache(app.env).entries()
+
+    def write_chapter(chapter: str, docnames: List[str]) -> None:
+        cells = chapter_cells(app, docnames, solutions)
+        if cells is not None:
+            _write(outdir / f"{chapter}.ipynb", notebook(app, chapter, cells))
+
+    with ThreadPoolExecutor() as pool:
+        futures = []
+        for chapter, docnames in toctree_chapters(app.env).items():
+            docnames = [docname for docname in docnames if docname in node_order]
+            if docnames:
+                futures.append(pool.submit(write_chapter, chapter, docnames))
+        for future in futures:
+            future.result()
@@ -0,0 +1,80 @@
+"""
+sphinx_exercise.partial
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Exercises-only builds (``exercise_only_pages``)
+
+All documents are still read, so numbers, titles and cross-references resolve
+exactly as in a full build, but only the documents that contain exercises or
+solutions, their direct dependencies (documents they include and the
+documents of the exercises their solutions refer to), the pages collecting
+them (``solutions-list`` and ``exercise-list``) and the root document are
+written.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+from typing import Set
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+from .registry import SOLUTION_TYPES, frozen_registry
+
+logger = logging.getLogger(__name__)
+
+
+def exercise_docnames(env: BuildEnvironment) -> Set[str]:
+    """Documents written by an exercises-only build"""
+
+    docnames = set(getattr(env, "sphinx_exercise_node_order", {}))
+    registry = frozen_registry(env)
+    for record in registry.records():
+        if record.type in SOLUTION_TYPES and record.target_label in registry:
+            docnames.add(registry[record.target_label].docname)
+    for docname in list(docnames):
+        for path in env.dependencies.get(docname, ()):
+            dependency = env.path2doc(path)
+            if dependency is not None:
+                docnames.add(dependency)
+    docnames.update(getattr(env, "sphinx_exercise_solutions_lists", {}))
+    docnames.update(getattr(env, "sphinx_exercise_exercise_lists", {}))
+    docnames.add(getattr(env.config, "root_doc", env.config.master_doc))
+    return docnames & env.found_docs
+
+
+def restrict_writing(app: Sphinx) -> None:
+    """
+    Limit the documents written by the builder to those of an exercises-only
+    build (if ``exercise_only_pages`` is set)
+
+    ``env-get-updated`` can only add documents to those Sphinx writes, so the
+    set is filtered in ``Builder.write_documents``, the hook Sphinx provides
+    for builders that choose which documents produce output (Sphinx >= 7.3).
+    """
+
+    if not app.config.exercise_only_pages:
+        return
+    builder = app.builder
+    if not hasattr(builder, "write_documents"):
+        logger.warning(
+            "[sphinx-exercise] exercise_only_pages requires Sphinx 7.3 or later; "
+            "writing all documents",
+            color="red",
+        )
+        return
+    write_documents = builder.write_documents
+
+    def filtered(docnames: Set[str]) -> None:
+        keep = exercise_docnames(app.env)
+        selected = {docname for docname in docnames if docname in keep}
+        if len(selected) < len(docnames):
+            logger.info(
+                "[sphinx-exercise] exercises-only build: writing "
+                f"{len(selected)} of {len(docnames)} documents"
+            )
+        write_documents(selected)
+
+    builder.write_documents = filtered
@@ -17,27 +17,71 @@ from .nodes import (
     is_exercise_node,
     exercise_latex_number_reference,
 )
+from .cache import exercise_number
+from .profiling import traced
+from .registry import frozen_registry
+from .titles import default_titles
 
 logger = logging.getLogger(__name__)
 
 
-def build_reference_node(app, target_node):
+class ReferenceCache:
+    """
+    Attributes of references from the document being written, by target
+
+    The relative URI of each target document is computed once per document
+    written (and builder), so pages with many solutions of exercises on the
+    same page only look up prebuilt attributes. It is cleared when the build
+    finishes so that it does not keep the builder (and through it the
+    application and environment) alive.
+    """
+
+    def __init__(self):
+        self._builder = None
+        self._docname = None
+        self._uris = {}
+        self._attributes = {}
+
+    def get(self, app, docname: str, label: str) -> dict:
+        fromdoc = app.env.docname
+        if app.builder is not self._builder or fromdoc != self._docname:
+            self._builder, self._docname = app.builder, fromdoc
+            self._uris.clear()
+            self._attributes.clear()
+        attributes = self._attributes.get((docname, label))
+        if attributes is None:
+            uri = self._uris.get(docname)
+            if uri is None:
+                uri = self._uris[docname] = app.builder.get_relative_uri(
+                    fromdoc, docname
+                )
+            attributes = self._attributes[(docname, label)] = {
+                "internal": True,
+                "refuri": f"{uri}#{label}",
+                "anchorname": "",
+            }
+        return attributes
+
+    def clear(self) -> None:
+        self._builder = self._docname = None
+        self._uris.clear()
+        self._attributes.clear()
+
+
+_reference_cache = ReferenceCache()
+
+
+def clear_reference_cache(app, exc) -> None:
+    _reference_cache.clear()
+
+
+def build_reference_node(app, target):
     """
     Builds a docutil.nodes.reference object
-    to a given target_node.
+    to a given target (a record of the frozen registry).
     """
-    refuri = app.builder.get_relative_uri(
-        app.env.docname, target_node.get("docname", "")
-    )
-    refuri += "#" + target_node.get("label")
-    reference = docutil_nodes.reference(
-        "",
-        "",
-        internal=True,
-        refuri=refuri,
-        anchorname="",
-    )
-    return reference
+    attributes = _reference_cache.get(app, target.docname, target.label)
+    return docutil_nodes.reference("", "", **attributes)
 
 
 class UpdateReferencesToEnumerated(SphinxPostTransform):
@@ -48,17 +92,17 @@ class UpdateReferencesToEnumerated(SphinxPostTransform):
 
     default_priority = 5
 
+    @traced("post-transform")
     def run(self):
         if not hasattr(self.env, "sphinx_exercise_registry"):
             return
 
+        registry = frozen_registry(self.env)
         for node in findall(self.document, sphinx_nodes.pending_xref):
             if node.get("reftype") != "numref":
-                target_label = node.get("reftarget")
-                if target_label in self.env.sphinx_exercise_registry:
-                    target = self.env.sphinx_exercise_registry[target_label]
-                    target_node = target.get("node")
-                    if isinstance(target_node, exercise_enumerable_node):
+                target = registry.get(node.get("reftarget"))
+                if target is not None:
+                    if target.enumerable:
                         # Don't Modify Custom Text
                         if node.get("refexplicit"):
                             continue
@@ -114,6 +158,7 @@ class ResolveTitlesInExercises(SphinxPostTransform):
         node.resolved_title = True
         return node
 
+    @traced("post-transform")
     def run(self):
         if not hasattr(self.env, "sphinx_exercise_registry"):
             return
@@ -122,10 +167,48 @@ class ResolveTitlesInExercises(SphinxPostTransform):
             node = self.resolve_title(node)
 
 
+class AddSolutionBacklinks(SphinxPostTransform):
+    """
+    Add links from each exercise to its solutions (if
+    exercise_solution_backlinks is set), numbered in toctree and document
+    order (see ``order_solutions_index``)
+    """
+
+    default_priority = 19
+
+    @traced("post-transform")
+    def run(self):
+        if not self.config.exercise_solution_backlinks:
+            return
+        index = getattr(self.env, "sphinx_exercise_solutions_index", {})
+        if not index:
+            return
+
+        registry = frozen_registry(self.env)
+        text = default_titles().solution
+        for node in findall(self.document, is_exercise_node):
+            solutions = [
+                record
+                for record in map(registry.get, index.get(node.get("label"), ()))
+                if record is not None and not record.hidden
+            ]
+            if not solutions:
+                continue
+            backlinks = docutil_nodes.paragraph(classes=["exercise-solutions"])
+            for number, record in enumerate(solutions, 1):
+                if number > 1:
+                    backlinks += docutil_nodes.Text(" ")
+                reference = build_reference_node(self.app, record)
+                title = text if len(solutions) == 1 else f"{text} {number}"
+                reference += docutil_nodes.Text(title)
+                backlinks += reference
+            node += backlinks
+
+
 # Solution Nodes
 
 
-def resolve_solution_title(app, node, exercise_node):
+def resolve_solution_title(app, node, exercise):
     """
     Resolve Titles for Solution Nodes for:
 
@@ -134,12 +217,13 @@ def resolve_solution_title(app, node, exercise_node):
         3. Ensure mathjax is triggered for pages that include path
            in titles inherited from Exercise Node
 
+    ``exercise`` is the record of the target exercise in the frozen registry.
+
     Note: Setup as a resolver function in case we need to resolve titles
     in references to solution nodes.
     """
 
     title = node.children[0]
-    exercise_title = exercise_node.children[0]
     if isinstance(title, solution_title):
         entry_title_text = node.get("title")
 
@@ -153,18 +237,18 @@ def resolve_solution_title(app, node, exercise_node):
             node["title"] = entry_title_text
         else:
             # Build full title with exercise reference
-            updated_title_text = " " + exercise_title.children[0].astext()
-            if isinstance(exercise_node, exercise_enumerable_node):
-                node_number = get_node_number(app, exercise_node, "exercise")
+            updated_title_text = " " + exercise.title
+            if exercise.enumerable:
+                node_number = exercise_number(app.env, exercise.docname, exercise.label)
                 updated_title_text += f" {node_number}"
 
             # Create hyperlink (original behavior)
-            wrap_reference = build_reference_node(app, exercise_node)
+            wrap_reference = build_reference_node(app, exercise)
             wrap_reference += docutil_nodes.Text(updated_title_text)
 
             # Parse Custom Titles from Exercise
-            if len(exercise_title.children) > 1:
-                subtitle = exercise_title.children[1]
+            subtitle = frozen_registry(app.env).subtitle(exercise.label)
+            if subtitle is not None:
                 if isinstance(subtitle, exercise_subtitle):
                     wrap_reference += docutil_nodes.Text(" (")
                     for child in subtitle.children:
@@ -190,20 +274,19 @@ def resolve_solution_title(app, node, exercise_node):
 class ResolveTitlesInSolutions(SphinxPostTransform):
     default_priority = 21
 
+    @traced("post-transform")
     def run(self):
         if not hasattr(self.env, "sphinx_exercise_registry"):
             return
 
-        # Update Solution Directives
+        # Update Solution Directives (the registry is frozen while writing, so
+        # titles are resolved again where solutions are referenced)
+        registry = frozen_registry(self.env)
         for node in findall(self.document, solution_node):
-            label = node.get("label")
             target_label = node.get("target_label")
             try:
-                target = self.env.sphinx_exercise_registry[target_label]
-                target_node = target.get("node")
-                node = resolve_solution_title(self.app, node, target_node)
-                # Update Registry
-                self.env.sphinx_exercise_registry[label]["node"] = node
+                target = registry[target_label]
+                node = resolve_solution_title(self.app, node, target)
             except Exception:
                 if isinstance(self.app.builder, LaTeXBuilder):
                     docname = find_parent(self.app.builder.env, node, "section")
@@ -227,37 +310,50 @@ class ResolveLinkTextToSolutions(SphinxPostTransform):
 
     default_priority = 22
 
+    @traced("post-transform")
     def run(self):
         if not hasattr(self.env, "sphinx_exercise_registry"):
             return
 
         # Update Solution References
+        registry = frozen_registry(self.env)
         for node in findall(self.document, docutil_nodes.reference):
-            refid = node.get("refid")
-            if refid in self.env.sphinx_exercise_registry:
-                target = self.env.sphinx_exercise_registry[refid]
-                target_node = target.get("node")
-                if self.app.builder.format == "latex":
-                    if isinstance(target_node, exercise_enumerable_node):
-                        new_node = exercise_latex_number_reference()
-                        new_node.parent = node.parent
-                        new_node.attributes = node.attributes
-                        for child in node.children:
-                            new_node += child
-                        node.replace_self(new_node)
-                if isinstance(target_node, solution_node):
-                    # TODO: Check if this condition is required?
-                    if not target_node.resolved_title:
-                        exercise_label = target_node.get("target_label")
-                        exercise_target = self.env.sphinx_exercise_registry[
-                            exercise_label
-                        ]  # noqa: E501
-                        exercise_node = exercise_target.get("node")
-                        target_node = resolve_solution_title(
-                            self.app, target_node, exercise_node
-                        )  # noqa: E501
-                    title_text = target_node.children[0].astext()
-                    inline = node.children[0]
-                    inline.children = []
-                    inline += docutil_nodes.Text(title_text)
-                    node.children[0] = inline
+            target = registry.get(node.get("refid"))
+            if target is None:
+                continue
+            if self.app.builder.format == "latex":
+                if target.enumerable:
+                    new_node = exercise_latex_number_reference()
+                    new_node.parent = node.parent
+                    new_node.attributes = node.attributes
+                    for child in node.children:
+                        new_node += child
+                    node.replace_self(new_node)
+            if target.type == "solution":
+                title_text = solution_link_text(self.app, registry, target)
+                inline = node.children[0]
+                inline.children = []
+                inline += docutil_nodes.Text(title_text)
+                node.children[0] = inline
+
+
+def solution_link_text(app, registry, solution) -> str:
+    """
+    The text of the resolved title of a solution (see
+    ``resolve_solution_title``) from its record in the frozen registry
+    """
+
+    exercise = registry.get(solution.target_label)
+    if (
+        solution.imported
+        or exercise is None
+        or app.config.exercise_style == "solution_follow_exercise"
+    ):
+        return solution.title
+    text = f"{solution.title} {exercise.title}"
+    if exercise.enumerable:
+        text += f" {exercise_number(app.env, exercise.docname, exercise.label)}"
+    subtitle = registry.subtitle(exercise.label)
+    if subtitle is not None:
+        text += f" ({subtitle.astext()})"
+    return text
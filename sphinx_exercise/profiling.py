@@ -0,0 +1,157 @@
+"""
+sphinx_exercise.profiling
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Optional profiling of sphinx-exercise work in Chrome trace-event format
+
+When ``exercise_profile = True`` every directive invocation, transform and
+post-transform records one complete ("X") event. Each process (including
+``-j`` workers) appends its events to its own file and the main process
+collects them into ``trace.json`` in the output directory at the end of
+the build. The file can be loaded in Perfetto or ``chrome://tracing``.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import json
+import os
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from docutils.nodes import Element
+from sphinx.application import Sphinx
+
+TRACE_FILENAME = "trace.json"
+
+# Directory holding per-process event files (None when profiling is disabled)
+_trace_dir: Optional[Path] = None
+# Open event file for the current process as (pid, file)
+_trace_file = None
+
+
+def _event_file():
+    """Return the event file of the current process (reopened after a fork)"""
+    global _trace_file
+
+    pid = os.getpid()
+    if _trace_file is None or _trace_file[0] != pid:
+        path = _trace_dir.joinpath(f"{pid}.jsonl")
+        # line buffered so events survive workers that exit without cleanup
+        _trace_file = (pid, path.open("a", encoding="utf8", buffering=1))
+    return _trace_file[1]
+
+
+def record_event(
+    name: str, cat: str, start: int, end: int, args: Dict[str, Any]
+) -> None:
+    """Record a complete event given start/end times in nanoseconds"""
+
+    pid = os.getpid()
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": start // 1000,
+        "dur": max((end - start) // 1000, 1),
+        "pid": pid,
+        "tid": pid,
+        "args": args,
+    }
+    _event_file().write(json.dumps(event) + "\n")
+
+
+def _result_label(result) -> str:
+    """Find the label of the sphinx-exercise node returned by a directive"""
+    if isinstance(result, list):
+        for node in result:
+            if isinstance(node, Element) and node.get("label"):
+                return node["label"]
+    return ""
+
+
+def traced(cat: str):
+    """
+    Decorate the ``run`` (or ``apply``) method of a directive or transform
+    so that each call is recorded as a span when profiling is enabled
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if _trace_dir is None:
+                return func(self, *args, **kwargs)
+            result = None
+            start = time.perf_counter_ns()
+            try:
+                result = func(self, *args, **kwargs)
+                return result
+            finally:
+                end = time.perf_counter_ns()
+                record_event(
+                    type(self).__name__,
+                    cat,
+                    start,
+                    end,
+                    {"docname": self.env.docname, "label": _result_label(result)},
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def start_profiling(app: Sphinx) -> None:
+    """Enable (or disable) profiling according to ``exercise_profile``"""
+    global _trace_dir, _trace_file
+
+    if _trace_file is not None:
+        _trace_file[1].close()
+    _trace_dir, _trace_file = None, None
+
+    if not app.config.exercise_profile:
+        return
+
+    trace_dir = Path(app.doctreedir).joinpath("sphinx_exercise", "trace")
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    for path in trace_dir.glob("*.jsonl"):
+        path.unlink()
+    _trace_dir = trace_dir
+
+
+def write_trace(app: Sphinx, exc: Union[bool, Exception]) -> None:
+    """Collect the events of all processes into ``trace.json``"""
+    global _trace_dir, _trace_file
+
+    if _trace_dir is None:
+        return
+    if _trace_file is not None:
+        _trace_file[1].close()
+        _trace_file = None
+
+    main_pid = os.getpid()
+    events = []
+    for path in sorted(_trace_dir.glob("*.jsonl")):
+        pid = int(path.stem)
+        process_name = "sphinx" if pid == main_pid else f"sphinx worker {pid}"
+        events.append(
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": pid,
+                "args": {"name": process_name},
+            }
+        )
+        with path.open(encoding="utf8") as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+        path.unlink()
+
+    if exc is None:
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        Path(app.outdir).joinpath(TRACE_FILENAME).write_text(
+            json.dumps(trace), encoding="utf8"
+        )
+    _trace_dir = None
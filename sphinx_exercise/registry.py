@@ -0,0 +1,897 @@
+"""
+sphinx_exercise.registry
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Compact data structures for the sphinx-exercise environment data
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import gc
+import os
+import pickle
+import sys
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from weakref import WeakKeyDictionary
+
+from docutils.nodes import Node
+
+# Version of the records sphinx-exercise keeps on the environment. Bump it
+# whenever their layout changes in a release and register a migration from
+# the previous version in MIGRATIONS. Environments that cannot be migrated
+# only have the documents containing sphinx-exercise records re-read.
+# (No ``env_version`` is declared in ``setup()``: Sphinx would discard
+# environments written by releases that did not declare one.)
+#   1 - sphinx-exercise <= 1.2.1, node order stored as lists of dicts
+#   2 - node order stored as NodeOrder, registry records include the
+#       directive header "hash" and the "content_hash" of the parsed node and
+#       are stored per document outside the environment (ShardedRegistry),
+#       reverse index of solutions by exercise
+#       (sphinx_exercise_solutions_index), labels of the records imported
+#       from manifests (sphinx_exercise_imported_labels)
+SCHEMA_VERSION = 2
+
+# Environment attributes holding sphinx-exercise records keyed by docname
+# (or by label for the registry)
+ENV_ATTRIBUTES = (
+    "sphinx_exercise_registry",
+    "sphinx_exercise_node_order",
+    "sphinx_exercise_gated_registry",
+    "sphinx_exercise_order_cache",
+    "sphinx_exercise_bank_deps",
+    "sphinx_exercise_solutions_lists",
+    "sphinx_exercise_exercise_lists",
+    "sphinx_exercise_solutions_index",
+    "sphinx_exercise_backlinks",
+    "sphinx_exercise_imported_labels",
+)
+
+SOLUTION_TYPES = ("solution", "solution-start")
+
+NODE_TYPES = ("exercise", "solution", "unknown")
+_NODE_TYPE_CODES = {name: code for code, name in enumerate(NODE_TYPES)}
+
+
+class NodeOrderEntry(NamedTuple):
+    """A read-only view of one exercise or solution node in a document"""
+
+    type: str
+    label: str
+    target_label: Optional[str]
+    line: Optional[int]
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+class NodeOrder:
+    """
+    The exercise and solution nodes of a document in document order
+
+    Stored as interned label strings, one type code per node and an
+    ``array('i')`` of line numbers (-1 when unknown). Iterating yields
+    ``NodeOrderEntry`` tuples.
+    """
+
+    __slots__ = ("_types", "_labels", "_targets", "_lines")
+
+    def __init__(self, types: bytes, labels, targets, lines: array):
+        self._types = types
+        self._labels = labels
+        self._targets = targets
+        self._lines = lines
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[NodeOrderEntry]) -> "NodeOrder":
+        types, labels, targets, lines = bytearray(), [], [], array("i")
+        for entry in entries:
+            types.append(_NODE_TYPE_CODES.get(entry.type, _NODE_TYPE_CODES["unknown"]))
+            labels.append(sys.intern(entry.label))
+            targets.append(_intern(entry.target_label))
+            lines.append(-1 if entry.line is None else entry.line)
+        return cls(bytes(types), tuple(labels), tuple(targets), lines)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __getitem__(self, index: int) -> NodeOrderEntry:
+        line = self._lines[index]
+        return NodeOrderEntry(
+            NODE_TYPES[self._types[index]],
+            self._labels[index],
+            self._targets[index],
+            None if line < 0 else line,
+        )
+
+    def __iter__(self) -> Iterator[NodeOrderEntry]:
+        for index in range(len(self._labels)):
+            yield self[index]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, NodeOrder):
+            return NotImplemented
+        return self.signature() == other.signature()
+
+    def __repr__(self) -> str:
+        return f"NodeOrder({list(self)!r})"
+
+    def labels(self, node_type: str) -> Iterator[str]:
+        """Labels of all nodes of the given type"""
+        code = _NODE_TYPE_CODES[node_type]
+        for index, label in enumerate(self._labels):
+            if self._types[index] == code:
+                yield label
+
+    def signature(self) -> tuple:
+        """A hashable value that changes whenever the node order changes"""
+        return self._types, self._labels, self._targets, self._lines.tobytes()
+
+    def __reduce__(self):
+        return _restore_node_order, (
+            self._types,
+            self._labels,
+            self._targets,
+            self._lines.tobytes(),
+        )
+
+
+def _restore_node_order(types, labels, targets, lines) -> NodeOrder:
+    restored = array("i")
+    restored.frombytes(lines)
+    return NodeOrder(
+        types,
+        tuple(sys.intern(label) for label in labels),
+        tuple(_intern(target) for target in targets),
+        restored,
+    )
+
+
+# Sharded Registry
+
+REGISTRY_DIRNAME = "registry"
+
+
+def registry_path(env) -> Optional[Path]:
+    """Directory of the registry shards of ``env`` (in the doctree directory)"""
+    doctreedir = getattr(env, "doctreedir", None)
+    if doctreedir is None:
+        return None
+    return Path(doctreedir, "sphinx_exercise", REGISTRY_DIRNAME)
+
+
+def _detached(node):
+    """A copy of ``node`` without references to its document (for pickling)"""
+    copy = node.deepcopy()
+    for child in copy.findall():
+        child.document = None
+    return copy
+
+
+class RecordSummary(NamedTuple):
+    """
+    The fields of a registry record used once documents were read (to
+    freeze the registry, number titles and export manifests), without its
+    node
+    """
+
+    label: str
+    type: str
+    docname: str
+    target_label: Optional[str]
+    default_title: str
+    # text of the title of exercises (the default title of solutions)
+    title: str
+    subtitle: Optional[str]
+    # the subtitle node of exercises, pickled
+    subtitle_node: Optional[bytes]
+    classes: Tuple[str, ...]
+    hidden: bool
+    enumerable: bool
+    imported: bool
+    number: str
+    hash: Optional[str]
+    content_hash: Optional[str]
+
+
+def summarize(label: str, record: dict) -> RecordSummary:
+    """The summary of the registry record of ``label``"""
+    node = record["node"]
+    title = node.children[0] if node.children else None
+    default_title = node.get("title", "")
+    text, subtitle, subtitle_node = default_title, None, None
+    enumerable = False
+    if record["type"] not in SOLUTION_TYPES:
+        enumerable = node.tagname == "exercise_enumerable_node"
+        if title is not None and title.children:
+            text = title.children[0].astext()
+        if (
+            title is not None
+            and len(title.children) > 1
+            and title.children[1].tagname == "exercise_subtitle"
+        ):
+            subtitle = title.children[1].astext()
+            subtitle_node = pickle.dumps(_detached(title.children[1]))
+    return RecordSummary(
+        label,
+        record["type"],
+        record["docname"],
+        node.get("target_label"),
+        default_title,
+        text,
+        subtitle,
+        subtitle_node,
+        tuple(node.get("classes", ())),
+        bool(node.get("hidden")),
+        enumerable,
+        bool(record.get("imported")),
+        record.get("number", ""),
+        record.get("hash"),
+        record.get("content_hash"),
+    )
+
+
+class ShardedRegistry(MutableMapping):
+    """
+    Label -> record mapping of the exercises and solutions (the registry)
+
+    Only the label -> docname index is kept in memory and pickled with the
+    environment (together with the labels of each document, derived from
+    it). The records of each document (a shard) are pickled to
+    ``<path>/<docname>.pickle`` and loaded on demand through a LRU of at most
+    ``maxsize`` shards; changed shards are written when they are evicted,
+    by ``flush`` and when the environment is pickled. Without a ``path`` all
+    shards stay in memory (and are pickled with the index).
+
+    Nodes are stored as copies detached from the document they were parsed
+    in, so a shard never holds (or pickles) a whole doctree.
+
+    Each write of a shard gets a new random token. The summaries of the
+    records (``summaries``) are kept per document with the token of the
+    shard they were made from in ``<path>.summary.pickle``, so only the
+    shards written since they were last summarized are loaded again.
+    """
+
+    def __init__(self, path: Optional[Path] = None, maxsize: int = 64):
+        self.path = path
+        self.maxsize = maxsize
+        self._index: Dict[str, str] = {}
+        self._labels: Dict[str, Dict[str, None]] = {}
+        self._shards: "OrderedDict[str, Dict[str, dict]]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._tokens: Dict[str, int] = {}
+        self._summaries: Optional[Dict[str, Tuple[int, Dict[str, RecordSummary]]]] = (
+            None
+        )
+        self._summaries_changed = False
+
+    @classmethod
+    def for_env(cls, env) -> "ShardedRegistry":
+        config = getattr(env, "config", None)
+        maxsize = getattr(config, "exercise_registry_cache", 64)
+        return cls(registry_path(env), maxsize)
+
+    # Index
+
+    def _add_label(self, label: str, docname: str) -> None:
+        self._index[label] = docname
+        self._labels.setdefault(docname, {})[label] = None
+
+    def _remove_label(self, label: str) -> str:
+        docname = self._index.pop(label)
+        labels = self._labels[docname]
+        del labels[label]
+        if not labels:
+            del self._labels[docname]
+        return docname
+
+    # Shards
+
+    def _file(self, docname: str) -> Path:
+        return self.path / f"{docname}.pickle"
+
+    def _shard(self, docname: str) -> Dict[str, dict]:
+        shard = self._shards.get(docname)
+        if shard is not None:
+            self._shards.move_to_end(docname)
+            return shard
+        shard = {} if self.path is None else self._load(docname)
+        self._shards[docname] = shard
+        self._evict()
+        return shard
+
+    def _load(self, docname: str) -> Dict[str, dict]:
+        try:
+            with open(self._file(docname), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+
+    def _evict(self) -> None:
+        if self.path is None:
+            return
+        while len(self._shards) > self.maxsize:
+            docname, shard = self._shards.popitem(last=False)
+            if docname in self._dirty:
+                self._write(docname, shard)
+
+    def _write(self, docname: str, shard: Dict[str, dict]) -> None:
+        self._dirty.discard(docname)
+        path = self._file(docname)
+        if not shard:
+            self._tokens.pop(docname, None)
+            path.unlink(missing_ok=True)
+            return
+        self._tokens[docname] = int.from_bytes(os.urandom(8), "little")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temporary, "wb") as f:
+            pickle.dump(shard, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def flush(self) -> None:
+        """Write the changed shards"""
+        if self.path is None:
+            return
+        for docname in sorted(self._dirty):
+            self._write(docname, self._shards.get(docname, {}))
+
+    def docname(self, label: str) -> Optional[str]:
+        """The document of ``label`` (without loading its record)"""
+        return self._index.get(label)
+
+    def docnames(self) -> Set[str]:
+        return set(self._labels)
+
+    def discard_missing(self) -> Set[str]:
+        """
+        Forget the labels of documents whose shard file is missing (e.g. a
+        removed directory) and return those documents
+        """
+        if self.path is None:
+            return set()
+        missing = {
+            docname
+            for docname in self._labels
+            if docname not in self._shards and not self._file(docname).exists()
+        }
+        for docname in missing:
+            self._tokens.pop(docname, None)
+            for label in self._labels.pop(docname):
+                del self._index[label]
+        return missing
+
+    def purge(self, docname: str) -> List[Tuple[str, dict]]:
+        """Remove and return the records of a document"""
+        labels = self._labels.pop(docname, None)
+        if labels is None:
+            return []
+        shard = self._shard(docname)
+        for label in labels:
+            del self._index[label]
+        self._shards.pop(docname, None)
+        if self.path is not None:
+            self._write(docname, {})
+        return list(shard.items())
+
+    def merge(self, other, docnames: Set[str]) -> None:
+        """Take the records of ``docnames`` from the registry of another
+        process (whose shards were written when it was pickled)"""
+        if not isinstance(other, ShardedRegistry) or other.path != self.path:
+            for label, record in other.items():
+                if record["docname"] in docnames:
+                    self[label] = record
+            return
+        for docname in docnames:
+            self._shards.pop(docname, None)
+            self._dirty.discard(docname)
+            if docname in other._tokens:
+                self._tokens[docname] = other._tokens[docname]
+            else:
+                self._tokens.pop(docname, None)
+        for docname in docnames:
+            for label in other._labels.get(docname, ()):
+                previous = self._index.get(label)
+                if previous is not None and previous != docname:
+                    self._remove_label(label)
+                self._add_label(label, docname)
+
+    # Summaries
+
+    def _summary_file(self) -> Path:
+        return self.path.with_name(f"{self.path.name}.summary.pickle")
+
+    def _document_summaries(self, docname: str) -> Dict[str, RecordSummary]:
+        if self.path is None:
+            shard = self._shard(docname)
+            return {label: summarize(label, shard[label]) for label in shard}
+        if self._summaries is None:
+            try:
+                with open(self._summary_file(), "rb") as f:
+                    self._summaries = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+                self._summaries = {}
+        if docname in self._dirty:
+            self._write(docname, self._shards[docname])
+        token = self._tokens.get(docname)
+        cached = self._summaries.get(docname)
+        if cached is not None and token is not None and cached[0] == token:
+            return cached[1]
+        shard = self._shard(docname)
+        summaries = {label: summarize(label, shard[label]) for label in shard}
+        if token is not None:
+            self._summaries[docname] = (token, summaries)
+            self._summaries_changed = True
+        return summaries
+
+    def summary(self, label: str) -> Optional[RecordSummary]:
+        """The summary of the record of ``label`` (or None)"""
+        docname = self._index.get(label)
+        if docname is None:
+            return None
+        return self._document_summaries(docname).get(label)
+
+    def summaries(self) -> Iterator[RecordSummary]:
+        """
+        The summaries of all records, loading only the shards written since
+        they were last summarized
+        """
+        for docname, labels in list(self._labels.items()):
+            summaries = self._document_summaries(docname)
+            for label in labels:
+                if label in summaries:
+                    yield summaries[label]
+        self.save_summaries()
+
+    def save_summaries(self) -> None:
+        """Write the summaries if some were made (or belong to no document)"""
+        if self.path is None or self._summaries is None:
+            return
+        for docname in set(self._summaries) - set(self._labels):
+            del self._summaries[docname]
+            self._summaries_changed = True
+        if not self._summaries_changed:
+            return
+        self._summaries_changed = False
+        path = self._summary_file()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temporary, "wb") as f:
+            pickle.dump(self._summaries, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    # Mapping interface
+
+    def __getitem__(self, label: str) -> dict:
+        return self._shard(self._index[label])[label]
+
+    def __setitem__(self, label: str, record: dict) -> None:
+        docname = record["docname"]
+        previous = self._index.get(label)
+        if previous is not None and previous != docname:
+            del self[label]
+        node = record.get("node")
+        if isinstance(node, Node) and (
+            node.parent is not None or node.document is not None
+        ):
+            record = dict(record, node=_detached(node))
+        self._add_label(label, docname)
+        self._shard(docname)[label] = record
+        self._dirty.add(docname)
+
+    def __delitem__(self, label: str) -> None:
+        docname = self._remove_label(label)
+        shard = self._shard(docname)
+        shard.pop(label, None)
+        if shard:
+            self._dirty.add(docname)
+        else:
+            self._shards.pop(docname, None)
+            if self.path is not None:
+                self._write(docname, {})
+
+    def __contains__(self, label) -> bool:
+        return label in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._index))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        """All records, loading each shard once"""
+        for docname, labels in list(self._labels.items()):
+            shard = self._shard(docname)
+            for label in list(labels):
+                if label in shard:
+                    yield label, shard[label]
+
+    def values(self) -> Iterator[dict]:
+        for _, record in self.items():
+            yield record
+
+    def __getstate__(self):
+        if self.path is None:
+            return self.__dict__.copy()
+        self.flush()
+        return {
+            "path": self.path,
+            "maxsize": self.maxsize,
+            "_index": self._index,
+            "_tokens": self._tokens,
+        }
+
+    def __setstate__(self, state) -> None:
+        self.path = state["path"]
+        self.maxsize = state["maxsize"]
+        self._index = state["_index"]
+        self._labels = {}
+        for label, docname in self._index.items():
+            self._labels.setdefault(docname, {})[label] = None
+        self._shards = state.get("_shards", OrderedDict())
+        self._dirty = set()
+        self._tokens = state.get("_tokens", {})
+        self._summaries = None
+        self._summaries_changed = False
+
+    def __repr__(self) -> str:
+        return f"ShardedRegistry({len(self)} records, {self.path})"
+
+
+def registry_summaries(registry) -> Iterator[RecordSummary]:
+    """The summaries of the records of a registry (or of a plain dict)"""
+    if isinstance(registry, ShardedRegistry):
+        return registry.summaries()
+    return (summarize(label, record) for label, record in registry.items())
+
+
+# Frozen Registry
+
+
+class FrozenRecord(NamedTuple):
+    """A read-only view of one registry record"""
+
+    label: str
+    type: str
+    docname: str
+    target_label: Optional[str]
+    title: str
+    classes: Tuple[str, ...]
+    hidden: bool
+    enumerable: bool
+    imported: bool
+
+
+_HIDDEN, _ENUMERABLE, _IMPORTED = 1, 2, 4
+# label, type, docname, target label, title, classes, flags, subtitle
+_FIELDS = 8
+
+
+class FrozenRegistry:
+    """
+    An immutable copy of ``env.sphinx_exercise_registry`` used while writing
+
+    All strings are packed into one ``str`` addressed by an ``array('I')`` of
+    offsets, the fields of each record are indices in an ``array('i')`` and
+    the subtitles of exercises are pickled into one ``bytes`` object. Records
+    are sorted by label and found by binary search. Reading a record only
+    creates new objects and never touches shared ones, so ``-j`` write
+    workers forked after the registry was frozen keep sharing its memory
+    pages with the main process instead of each copying them.
+    """
+
+    __slots__ = ("_text", "_offsets", "_records", "_blob", "_blob_offsets")
+
+    def __init__(self, text, offsets, records, blob, blob_offsets):
+        self._text = text
+        self._offsets = offsets
+        self._records = records
+        self._blob = blob
+        self._blob_offsets = blob_offsets
+
+    @classmethod
+    def freeze(cls, registry: dict) -> "FrozenRegistry":
+        strings: dict = {}
+        offsets = array("I", [0])
+        length = 0
+        parts: List[str] = []
+
+        def string(value: Optional[str]) -> int:
+            nonlocal length
+            if value is None:
+                return -1
+            if value not in strings:
+                strings[value] = len(strings)
+                parts.append(value)
+                length += len(value)
+                offsets.append(length)
+            return strings[value]
+
+        # records are summarized in storage order (loading only the shards
+        # written since they were last summarized) and sorted by label
+        rows = []
+        blob = bytearray()
+        blob_offsets = array("I", [0])
+        for summary in registry_summaries(registry):
+            flags = _HIDDEN if summary.hidden else 0
+            if summary.enumerable:
+                flags |= _ENUMERABLE
+            if summary.imported:
+                flags |= _IMPORTED
+            subtitle = -1
+            if summary.subtitle_node is not None:
+                blob += summary.subtitle_node
+                blob_offsets.append(len(blob))
+                subtitle = len(blob_offsets) - 2
+            rows.append(
+                (
+                    summary.label,
+                    string(summary.label),
+                    string(summary.type),
+                    string(summary.docname),
+                    string(summary.target_label),
+                    string(summary.title),
+                    string(" ".join(summary.classes)),
+                    flags,
+                    subtitle,
+                )
+            )
+        rows.sort()
+        records = array("i")
+        for row in rows:
+            records.extend(row[1:])
+        return cls("".join(parts), offsets, records, bytes(blob), blob_offsets)
+
+    def _string(self, index: int) -> Optional[str]:
+        if index < 0:
+            return None
+        return self._text[self._offsets[index] : self._offsets[index + 1]]
+
+    def _find(self, label: str) -> int:
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._string(self._records[middle * _FIELDS]) < label:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._string(self._records[low * _FIELDS]) == label:
+            return low
+        return -1
+
+    def _record(self, index: int) -> FrozenRecord:
+        fields = self._records[index * _FIELDS : (index + 1) * _FIELDS]
+        flags = fields[6]
+        return FrozenRecord(
+            self._string(fields[0]),
+            self._string(fields[1]),
+            self._string(fields[2]),
+            self._string(fields[3]),
+            self._string(fields[4]),
+            tuple(self._string(fields[5]).split()),
+            bool(flags & _HIDDEN),
+            bool(flags & _ENUMERABLE),
+            bool(flags & _IMPORTED),
+        )
+
+    def __len__(self) -> int:
+        return len(self._records) // _FIELDS
+
+    def __contains__(self, label) -> bool:
+        return isinstance(label, str) and self._find(label) >= 0
+
+    def get(self, label: Optional[str]) -> Optional[FrozenRecord]:
+        if not isinstance(label, str):
+            return None
+        index = self._find(label)
+        return None if index < 0 else self._record(index)
+
+    def __getitem__(self, label: str) -> FrozenRecord:
+        record = self.get(label)
+        if record is None:
+            raise KeyError(label)
+        return record
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self._string(self._records[index * _FIELDS])
+
+    def records(self) -> Iterator[FrozenRecord]:
+        """All records, sorted by label"""
+        for index in range(len(self)):
+            yield self._record(index)
+
+    def subtitle(self, label: str):
+        """A new copy of the subtitle node of an exercise (or None)"""
+        index = self._find(label)
+        if index < 0:
+            return None
+        subtitle = self._records[index * _FIELDS + 7]
+        if subtitle < 0:
+            return None
+        start, end = self._blob_offsets[subtitle], self._blob_offsets[subtitle + 1]
+        return pickle.loads(self._blob[start:end])
+
+
+# Frozen registries by environment. They are kept out of the environment so
+# they are never pickled with it, and are inherited by forked write workers.
+_frozen: "WeakKeyDictionary[Any, FrozenRegistry]" = WeakKeyDictionary()
+
+
+def frozen_registry(env) -> FrozenRegistry:
+    """The frozen registry of ``env`` (frozen now when called before writing)"""
+    frozen = _frozen.get(env)
+    if frozen is None:
+        frozen = FrozenRegistry.freeze(getattr(env, "sphinx_exercise_registry", {}))
+        _frozen[env] = frozen
+    return frozen
+
+
+def freeze_registry(app, *args) -> None:
+    """
+    Freeze the registry before documents are written (``write-started``)
+
+    When writing in parallel, the objects allocated so far are also moved to
+    the permanent generation of the garbage collector (``gc.freeze``) so that
+    collections in forked workers do not write to their pages.
+    """
+    _frozen[app.env] = FrozenRegistry.freeze(
+        getattr(app.env, "sphinx_exercise_registry", {})
+    )
+    if app.parallel > 1:
+        gc.freeze()
+
+
+def thaw_registry(app, exc) -> None:
+    """Drop the frozen registry once the build finished"""
+    _frozen.pop(app.env, None)
+    if app.parallel > 1:
+        gc.unfreeze()
+
+
+# Reverse Index of Solutions
+
+
+def build_solutions_index(registry) -> dict:
+    """Map each exercise label to the labels of its solutions"""
+    index = {}
+    for label, record in registry.items():
+        if record["type"] in SOLUTION_TYPES:
+            target_label = record["node"].get("target_label")
+            index.setdefault(target_label, []).append(label)
+    return index
+
+
+def sort_solutions_index(
+    index: dict, registry, node_order: dict, ranks: Dict[str, int]
+) -> None:
+    """
+    Order the solutions of each exercise by the toctree rank of their
+    documents and their position in them (independently of the order
+    documents were read and merged in)
+    """
+    positions: Dict[str, Dict[str, int]] = {}
+
+    def key(label: str) -> tuple:
+        docname = registry.docname(label) or ""
+        if docname not in positions:
+            order = node_order.get(docname)
+            labels = order.labels("solution") if order is not None else ()
+            positions[docname] = {name: number for number, name in enumerate(labels)}
+        position = positions[docname].get(label, len(positions[docname]))
+        return ranks.get(docname, len(ranks)), docname, position, label
+
+    for solutions in index.values():
+        if len(solutions) > 1:
+            solutions.sort(key=key)
+
+
+def remove_solution(index: dict, target_label: str, label: str) -> None:
+    """Remove a solution from the reverse index"""
+    solutions = index.get(target_label)
+    if solutions is None or label not in solutions:
+        return
+    solutions.remove(label)
+    if not solutions:
+        del index[target_label]
+
+
+# Schema Migrations
+
+
+def _migrate_1_to_2(env) -> None:
+    """
+    Convert the records of sphinx-exercise <= 1.2.1: node order lists of
+    dicts to NodeOrder, registry records (with unknown hashes) to
+    per-document shards, and build the reverse index of solutions
+    """
+    node_order = getattr(env, "sphinx_exercise_node_order", {})
+    for docname, nodes in list(node_order.items()):
+        if not nodes:
+            del node_order[docname]
+            continue
+        node_order[docname] = NodeOrder.from_entries(
+            NodeOrderEntry(
+                node.get("type", "unknown"),
+                node.get("label", ""),
+                node.get("target_label"),
+                node.get("line"),
+            )
+            for node in nodes
+        )
+
+    records = getattr(env, "sphinx_exercise_registry", {})
+    registry = ShardedRegistry.for_env(env)
+    for label, record in records.items():
+        record.setdefault("hash", None)
+        record.setdefault("content_hash", None)
+        registry[label] = record
+    registry.flush()
+    env.sphinx_exercise_registry = registry
+    env.sphinx_exercise_solutions_index = build_solutions_index(records)
+
+
+MIGRATIONS = {
+    1: _migrate_1_to_2,
+}
+
+
+def _record_docnames(env) -> Set[str]:
+    """All docnames with sphinx-exercise records in the environment"""
+    docnames = set()
+    for record in getattr(env, "sphinx_exercise_registry", {}).values():
+        docnames.add(record["docname"])
+    docnames.update(getattr(env, "sphinx_exercise_node_order", {}))
+    docnames.update(getattr(env, "sphinx_exercise_gated_registry", {}))
+    docnames.update(getattr(env, "sphinx_exercise_bank_deps", {}))
+    docnames.update(getattr(env, "sphinx_exercise_solutions_lists", {}))
+    docnames.update(getattr(env, "sphinx_exercise_exercise_lists", {}))
+    return docnames
+
+
+def migrate_env_data(env) -> Set[str]:
+    """
+    Bring the sphinx-exercise records of a (possibly cached) environment to
+    the current SCHEMA_VERSION
+
+    Records are migrated in place when a migration path exists. Otherwise
+    they are dropped and the docnames that held them are returned so that
+    only those documents are read again.
+    """
+
+    has_data = any(hasattr(env, name) for name in ENV_ATTRIBUTES)
+    version = getattr(env, "sphinx_exercise_schema", 1 if has_data else None)
+    if version == SCHEMA_VERSION or not has_data:
+        env.sphinx_exercise_schema = SCHEMA_VERSION
+        return set()
+
+    while version in MIGRATIONS:
+        MIGRATIONS[version](env)
+        version += 1
+    if version == SCHEMA_VERSION:
+        env.sphinx_exercise_schema = SCHEMA_VERSION
+        return set()
+
+    # No migration path (e.g. a cache written by a newer release)
+    docnames = _record_docnames(env)
+    for name in ENV_ATTRIBUTES:
+        if hasattr(env, name):
+            delattr(env, name)
+    env.sphinx_exercise_schema = SCHEMA_VERSION
+    return docnames
@@ -0,0 +1,421 @@
+"""
+sphinx_exercise.server
+~~~~~~~~~~~~~~~~~~~~~~
+
+A local label index for editors
+
+``python -m sphinx_exercise.server <srcdir>`` scans the reStructuredText and
+MyST sources of a book once for exercise and solution directives and answers
+JSON-RPC 2.0 requests on stdin/stdout (framed with ``Content-Length`` headers
+as in the Language Server Protocol):
+
+``labels`` ``{"prefix": "lim", "type": "exercise"}``
+    Completion candidates: labels starting with ``prefix``
+``diagnostics`` ``{"path": "chapter-1.md"}``
+    Duplicate labels and solutions to unknown exercises (in one file, or in
+    all files when ``path`` is omitted)
+``update`` ``{"path": "chapter-1.md", "text": "..."}``
+    Re-index one file, from ``text`` (e.g. an unsaved buffer) or from disk
+``shutdown``
+    Stop the server
+
+Malformed messages, unknown methods, invalid parameters and unexpected
+failures are answered with the standard JSON-RPC error codes (-32700,
+-32600, -32601, -32602 and -32603) and the server keeps running.
+
+Sources are polled for changes and only files that changed are parsed again.
+No Sphinx application is created, so the index is available in milliseconds;
+it only knows about labels given explicitly with ``:label:`` (or the ids of
+``exercise-include``).
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+SOURCE_SUFFIXES = (".rst", ".md")
+EXCLUDE_PATTERNS = ("_build/*", ".*")
+DIRECTIVES = (
+    "exercise",
+    "exercise-start",
+    "exercise-include",
+    "solution",
+    "solution-start",
+)
+
+_RST_DIRECTIVE = re.compile(r"^(\s*)\.\.\s+([\w-]+)::\s*(.*?)\s*$")
+_MYST_DIRECTIVE = re.compile(r"^(\s*)(`{3,}|:{3,})\{([\w-]+)\}\s*(.*?)\s*$")
+_OPTION = re.compile(r"^\s*:([\w-]+):\s*(.*?)\s*$")
+_YAML_OPTION = re.compile(r"^\s*([\w-]+)\s*:\s*(.*?)\s*$")
+
+
+class Entry(NamedTuple):
+    """An exercise or solution directive found in a source file"""
+
+    type: str
+    label: str
+    target: Optional[str]
+    line: int
+
+
+def _entry(name: str, argument: str, options: Dict[str, str], line: int):
+    label = options.get("label", "")
+    if name == "exercise-include" and not label:
+        label = argument
+    if not label:
+        return None
+    kind = "solution" if name.startswith("solution") else "exercise"
+    target = (argument or None) if kind == "solution" else None
+    return Entry(kind, label, target, line)
+
+
+def parse_source(text: str) -> List[Entry]:
+    """Exercise and solution directives with labels in ``text``"""
+
+    lines = text.splitlines()
+    entries = []
+    for number, line in enumerate(lines):
+        match = _RST_DIRECTIVE.match(line)
+        myst = None
+        if match is None:
+            myst = _MYST_DIRECTIVE.match(line)
+            if myst is None:
+                continue
+            name, argument = myst.group(3), myst.group(4)
+        else:
+            name, argument = match.group(2), match.group(3)
+        if name not in DIRECTIVES:
+            continue
+
+        options = {}
+        following = iter(lines[number + 1 :])
+        if myst is not None:
+            first = next(following, "")
+            if first.strip() == "---":
+                for option in following:
+                    if option.strip() == "---":
+                        break
+                    yaml = _YAML_OPTION.match(option)
+                    if yaml is not None:
+                        options[yaml.group(1)] = yaml.group(2).strip("'\"")
+            else:
+                following = iter([first, *following])
+        for option in following:
+            found = _OPTION.match(option)
+            if found is None:
+                break
+            options[found.group(1)] = found.group(2)
+
+        entry = _entry(name, argument, options, number + 1)
+        if entry is not None:
+            entries.append(entry)
+    return entries
+
+
+class Diagnostic(NamedTuple):
+    path: str
+    line: int
+    message: str
+
+
+class LabelIndex:
+    """
+    Index of the labelled exercises and solutions of a source directory
+
+    Files are parsed once and then again only when their modification time
+    or size changes (see ``refresh``) or when they are updated explicitly.
+    """
+
+    def __init__(self, srcdir: Path, exclude: Sequence[str] = EXCLUDE_PATTERNS):
+        self.srcdir = Path(srcdir)
+        self.exclude = tuple(exclude)
+        self.files: Dict[str, List[Entry]] = {}
+        self.stamps: Dict[str, Tuple[int, int]] = {}
+        self.labels: Dict[str, List[Tuple[str, Entry]]] = {}
+        self.lock = threading.Lock()
+
+    def _sources(self) -> Dict[str, Tuple[int, int]]:
+        sources = {}
+        for root, dirnames, filenames in os.walk(self.srcdir):
+            relroot = os.path.relpath(root, self.srcdir)
+            relroot = "" if relroot == "." else relroot + "/"
+            dirnames[:] = [
+                name for name in dirnames if not self._excluded(relroot + name)
+            ]
+            for filename in filenames:
+                path = relroot + filename
+                if filename.endswith(SOURCE_SUFFIXES) and not self._excluded(path):
+                    stat = os.stat(os.path.join(root, filename))
+                    sources[path] = (stat.st_mtime_ns, stat.st_size)
+        return sources
+
+    def _excluded(self, path: str) -> bool:
+        return any(
+            fnmatchcase(path, pattern) or fnmatchcase(path + "/*", pattern)
+            for pattern in self.exclude
+        )
+
+    def refresh(self) -> List[str]:
+        """Parse the files that changed on disk and return their paths"""
+        sources = self._sources()
+        with self.lock:
+            changed = [
+                path
+                for path, stamp in sources.items()
+                if self.stamps.get(path) != stamp
+            ]
+            # files only known from unsaved buffers (no stamp) are kept
+            removed = [
+                path
+                for path in self.files
+                if path not in sources and self.stamps.get(path) is not None
+            ]
+            for path in removed:
+                self._set(path, [])
+                del self.files[path]
+                self.stamps.pop(path, None)
+            for path in changed:
+                try:
+                    text = (self.srcdir / path).read_text("utf8")
+                except (OSError, UnicodeDecodeError):
+                    continue
+                self._set(path, parse_source(text))
+                self.stamps[path] = sources[path]
+        return sorted(changed + removed)
+
+    def update(self, path: str, text: Optional[str] = None) -> None:
+        """
+        Parse one file again, from ``text`` (e.g. an unsaved buffer, kept
+        until the file changes on disk) or from disk
+        """
+        try:
+            stat = (self.srcdir / path).stat()
+            if text is None:
+                text = (self.srcdir / path).read_text("utf8")
+        except OSError:
+            stamp = None
+            text = text or ""
+        else:
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            self._set(path, parse_source(text))
+            self.stamps[path] = stamp
+
+    def _set(self, path: str, entries: List[Entry]) -> None:
+        for entry in self.files.get(path, ()):
+            instances = self.labels.get(entry.label)
+            if instances is None:
+                continue
+            instances[:] = [item for item in instances if item[0] != path]
+            if not instances:
+                del self.labels[entry.label]
+        self.files[path] = entries
+        for entry in entries:
+            self.labels.setdefault(entry.label, []).append((path, entry))
+            self.labels[entry.label].sort(key=lambda item: (item[0], item[1].line))
+
+    def complete(self, prefix: str = "", kind: Optional[str] = None) -> List[dict]:
+        """Labels starting with ``prefix`` (of exercises or solutions)"""
+        with self.lock:
+            items = []
+            for label, instances in self.labels.items():
+                path, entry = instances[0]
+                if not label.startswith(prefix) or kind not in (None, entry.type):
+                    continue
+                items.append(
+                    {
+                        "label": label,
+                        "type": entry.type,
+                        "path": path,
+                        "line": entry.line,
+                    }
+                )
+        return sorted(items, key=lambda item: item["label"])
+
+    def diagnostics(self, path: Optional[str] = None) -> List[Diagnostic]:
+        """Duplicate labels and solutions to unknown exercises"""
+        with self.lock:
+            paths = [path] if path is not None else sorted(self.files)
+            found = []
+            for name in paths:
+                for entry in self.files.get(name, ()):
+                    instances = self.labels[entry.label]
+                    first = instances[0]
+                    if first[0] != name or first[1] != entry:
+                        message = (
+                            f"duplicate label: {entry.label}; "
+                            f"other instance in {first[0]}"
+                        )
+                        found.append(Diagnostic(name, entry.line, message))
+                    if entry.target is not None:
+                        targets = self.labels.get(entry.target, ())
+                        if not any(item[1].type == "exercise" for item in targets):
+                            message = f"undefined label: {entry.target}"
+                            found.append(Diagnostic(name, entry.line, message))
+        return found
+
+
+# JSON-RPC over stdio
+
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class RPCError(Exception):
+    """An error reported to the client with a JSON-RPC error ``code``"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def read_message(stream: BinaryIO):
+    """
+    Read one ``Content-Length`` framed message (None at end of input)
+
+    Raises ``ValueError`` if the header or the JSON body cannot be parsed.
+    """
+    headers = {}
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip()
+    if b"content-length" not in headers:
+        raise ValueError("missing Content-Length header")
+    length = int(headers[b"content-length"])
+    if length < 0:
+        raise ValueError(f"invalid Content-Length: {length}")
+    return json.loads(stream.read(length))
+
+
+def write_message(stream: BinaryIO, message: dict) -> None:
+    body = json.dumps(message).encode("utf8")
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+    stream.flush()
+
+
+class Server:
+    """Answers JSON-RPC requests from a LabelIndex"""
+
+    def __init__(self, index: LabelIndex, interval: float = 1.0):
+        self.index = index
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def watch(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.index.refresh()
+
+    def handle(self, method: str, params: dict):
+        if method == "labels":
+            prefix = _param(params, "prefix", str, "")
+            return self.index.complete(prefix, _param(params, "type", str))
+        if method == "diagnostics":
+            return [
+                diagnostic._asdict()
+                for diagnostic in self.index.diagnostics(_param(params, "path", str))
+            ]
+        if method == "update":
+            path = _param(params, "path", str, required=True)
+            self.index.update(path, _param(params, "text", str))
+            return None
+        if method == "shutdown":
+            self.stopped.set()
+            return None
+        raise RPCError(METHOD_NOT_FOUND, f"unknown method: {method}")
+
+    def serve(self, stdin: BinaryIO, stdout: BinaryIO) -> None:
+        self.index.refresh()
+        if self.interval:
+            threading.Thread(target=self.watch, daemon=True).start()
+        while not self.stopped.is_set():
+            try:
+                message = read_message(stdin)
+            except ValueError as error:
+                write_message(
+                    stdout, _error(None, PARSE_ERROR, f"parse error: {error}")
+                )
+                continue
+            if message is None:
+                break
+            if not isinstance(message, dict):
+                write_message(stdout, _error(None, INVALID_REQUEST, "invalid request"))
+                continue
+            response = {"jsonrpc": "2.0", "id": message.get("id")}
+            try:
+                params = message.get("params", {})
+                if params is None:
+                    params = {}
+                if not isinstance(params, dict):
+                    raise RPCError(INVALID_PARAMS, "invalid params: expected an object")
+                response["result"] = self.handle(message.get("method"), params)
+            except RPCError as error:
+                response = _error(message.get("id"), error.code, str(error))
+            except Exception as error:
+                response = _error(
+                    message.get("id"), INTERNAL_ERROR, f"internal error: {error!r}"
+                )
+            if "id" in message:
+                write_message(stdout, response)
+        self.stopped.set()
+
+
+def _param(params: dict, name: str, kind: type, default=None, required=False):
+    """Parameter ``name`` of a request, checked to be a ``kind``"""
+    if name not in params or params[name] is None:
+        if required:
+            raise RPCError(INVALID_PARAMS, f"invalid params: missing {name!r}")
+        return default
+    if not isinstance(params[name], kind):
+        raise RPCError(
+            INVALID_PARAMS, f"invalid params: {name!r} must be a {kind.__name__}"
+        )
+    return params[name]
+
+
+def _error(id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": id, "error": {"code": code, "message": message}}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve the exercise and solution labels of a book"
+    )
+    parser.add_argument("srcdir", help="source directory of the book")
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=list(EXCLUDE_PATTERNS),
+        help="glob pattern of files to ignore (repeatable)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="seconds between checks for changed files (0 to disable)",
+    )
+    args = parser.parse_args(argv)
+    index = LabelIndex(Path(args.srcdir), args.exclude)
+    Server(index, args.interval).serve(sys.stdin.buffer, sys.stdout.buffer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+sphinx_exercise.sheets
+~~~~~~~~~~~~~~~~~~~~~~
+
+Exercise sheets (``-b exercise-sheets``)
+
+A LaTeX builder writing one small standalone ``.tex`` document per chapter
+(each document in the toctree of the root document) with only the exercises
+of that chapter, and optionally their solutions
+(``exercise_sheets_solutions``). Exercises are rendered by the LaTeX visitors
+of the extension and numbered from the same table as the HTML output, so a
+sheet shows the numbers of the book. Chapters are written in parallel with
+``-j``.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import copy
+import os
+import warnings
+from typing import Any, Dict, List, Set
+
+from docutils import nodes as docutil_nodes
+from docutils.frontend import OptionParser
+from docutils.utils import new_document
+from sphinx import addnodes
+from sphinx.builders.latex import LaTeXBuilder
+from sphinx.util import logging
+from sphinx.util.docutils import SphinxFileOutput
+from sphinx.util.parallel import ParallelTasks, parallel_available
+from sphinx.writers.latex import LaTeXWriter
+
+from ._compat import findall
+from .nodes import is_exercise_node, solution_node
+from .registry import frozen_registry
+from .titles import default_titles
+from .utils import toctree_chapters
+
+logger = logging.getLogger(__name__)
+
+
+class ExerciseSheetBuilder(LaTeXBuilder):
+    """Standalone LaTeX exercise sheets, one per chapter"""
+
+    name = "exercise-sheets"
+    epilog = "The exercise sheets are in %(outdir)s."
+
+    def init_document_data(self) -> None:
+        self.titles = []
+        self.chapters: Dict[str, List[str]] = {}
+        env = self.env
+        node_order = getattr(env, "sphinx_exercise_node_order", {})
+        for chapter, docnames in toctree_chapters(env).items():
+            docnames = [
+                docname
+                for docname in docnames
+                if docname in node_order and any(node_order[docname].labels("exercise"))
+            ]
+            if not docnames:
+                continue
+            title = self.chapter_title(chapter)
+            targetname = chapter.replace("/", "-") + "-exercises.tex"
+            self.chapters[chapter] = docnames
+            self.document_data.append(
+                (chapter, targetname, title, self.config.author, "howto", False)
+            )
+
+    def solutions_of(self, labels: List[str]) -> List[str]:
+        """Labels of the (visible) solutions of the exercises with ``labels``"""
+        index = getattr(self.env, "sphinx_exercise_solutions_index", {})
+        registry = frozen_registry(self.env)
+        return [
+            solution
+            for label in labels
+            for solution in index.get(label, ())
+            if not registry[solution].hidden
+        ]
+
+    def assemble_doctree(
+        self, indexfile: str, toctree_only: bool, appendices: List[str]
+    ) -> docutil_nodes.document:
+        """A document with the exercises (and solutions) of a chapter"""
+
+        env = self.env
+        registry = frozen_registry(env)
+        tree = new_document("<exercise sheet>")
+        tree["docname"] = indexfile
+        section = docutil_nodes.section(ids=[f"{indexfile}-exercises"])
+        section += docutil_nodes.title("", self.chapter_title(indexfile))
+        tree += section
+
+        labels = []
+        for docname in self.chapters[indexfile]:
+            for node in findall(env.get_doctree(docname), is_exercise_node):
+                if node.get("hidden"):
+                    continue
+                labels.append(node["label"])
+                section += node.deepcopy()
+
+        self.docnames = set(self.chapters[indexfile])
+        if self.config.exercise_sheets_solutions:
+            solutions = self.solutions_of(labels)
+            if solutions:
+                subsection = docutil_nodes.section(ids=[f"{indexfile}-solutions"])
+                subsection += docutil_nodes.title("", default_titles().solution)
+                section += subsection
+                for docname in {registry[label].docname for label in solutions}:
+                    self.docnames.add(docname)
+                    for node in findall(env.get_doctree(docname), solution_node):
+                        if node.get("label") in solutions:
+                            subsection += node.deepcopy()
+
+        env.resolve_references(tree, indexfile, self)
+        # references to documents that are not part of the sheet
+        for pending in list(findall(tree, addnodes.pending_xref)):
+            text = pending.get("refsectname") or pending.astext()
+            pending.replace_self(docutil_nodes.emphasis(text, text))
+        return tree
+
+    def chapter_title(self, chapter: str) -> str:
+        title = self.env.titles.get(chapter)
+        return title.astext() if title is not None else chapter
+
+    def write_documents(self, _docnames: Set[str]) -> None:
+        docwriter = LaTeXWriter(self)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=DeprecationWarning)
+            docsettings: Any = OptionParser(
+                defaults=self.env.settings,
+                components=(docwriter,),
+                read_config_files=True,
+            ).get_default_values()
+
+        parallel = parallel_available and self.app.parallel > 1
+        tasks = ParallelTasks(self.app.parallel) if parallel else None
+        for chapter, targetname, title, author, themename, _ in self.document_data:
+            theme = self.themes.get(themename)
+            logger.info(f"[sphinx-exercise] exercise sheet {targetname}")
+            doctree = self.assemble_doctree(chapter, False, [])
+            doctree["docclass"] = theme.docclass
+            doctree["contentsname"] = self.get_contentsname(chapter)
+            doctree["tocdepth"] = None
+            self.post_process_images(doctree)
+            self.update_doc_context(title, author, theme)
+            self.update_context()
+            # sheets are short enough not to need a table of contents
+            self.context["tableofcontents"] = ""
+
+            settings = copy.copy(docsettings)
+            settings._author = author
+            settings._title = title
+            settings._contentsname = doctree["contentsname"]
+            settings._docname = chapter
+            settings._docclass = theme.name
+            doctree.settings = settings
+            # everything the writer needs is passed along, as parallel tasks
+            # may start after the context was updated for the next chapter
+            arg = (doctree, targetname, theme, dict(self.context))
+            if tasks is None:
+                self._write_sheet(arg)
+            else:
+                tasks.add_task(self._write_sheet, arg)
+        if tasks is not None:
+            tasks.join()
+
+    # Sphinx < 8.1 calls write() instead of write_documents()
+    if not hasattr(LaTeXBuilder, "write_documents"):
+
+        def write(self, *ignored) -> None:
+            self.write_documents(set())
+
+    def _write_sheet(self, arg) -> None:
+        doctree, targetname, theme, context = arg
+        self.context = context
+        docwriter = LaTeXWriter(self)
+        docwriter.theme = theme
+        destination = SphinxFileOutput(
+            destination_path=os.path.join(self.outdir, targetname),
+            encoding="utf-8",
+            overwrite_if_changed=True,
+        )
+        docwriter.write(doctree, destination)
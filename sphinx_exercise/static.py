@@ -0,0 +1,87 @@
+"""
+sphinx_exercise.static
+~~~~~~~~~~~~~~~~~~~~~~
+
+Fingerprinted static assets
+
+``exercise.css`` is published as ``exercise.<hash>.css`` so that it can be
+cached indefinitely, and is only copied when the file in ``_static`` is
+missing or differs. It is also published as ``exercise.css`` for pages and
+themes that link the stylesheet directly.
+
+The names of the fingerprinted files are recorded in the environment
+(``env.sphinx_exercise_static_files``) so that the files of previous
+versions of the stylesheet are removed, and no other file is.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+import gzip
+import hashlib
+from pathlib import Path
+from typing import Set, Union
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+
+CSS_SOURCE = Path(__file__).parent.joinpath("assets", "html", "exercise.css")
+
+
+def fingerprinted_name(path: Path) -> str:
+    """``name.ext`` -> ``name.<first 12 hex digits of sha256>.ext``"""
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+CSS_FILENAME = fingerprinted_name(CSS_SOURCE)
+
+
+def _write_if_changed(path: Path, content: bytes) -> bool:
+    if path.exists() and path.read_bytes() == content:
+        return False
+    path.write_bytes(content)
+    return True
+
+
+def fingerprinted_files(app: Sphinx) -> Set[str]:
+    """Names of the fingerprinted files written to ``_static``"""
+    names = {CSS_FILENAME}
+    if app.config.exercise_precompress_assets:
+        names.add(f"{CSS_FILENAME}.gz")
+    return names
+
+
+def note_asset_files(app: Sphinx, env: BuildEnvironment) -> None:
+    """Record the fingerprinted files of this build (before the environment
+    is pickled)"""
+    if not hasattr(env, "sphinx_exercise_static_files"):
+        env.sphinx_exercise_static_files = set()
+    env.sphinx_exercise_static_files |= fingerprinted_files(app)
+
+
+def copy_asset_files(app: Sphinx, exc: Union[bool, Exception]):
+    """Copies required assets for formating in HTML"""
+
+    if exc is not None:
+        return
+
+    static_dir = Path(app.outdir).joinpath("_static")
+    static_dir.mkdir(parents=True, exist_ok=True)
+    content = CSS_SOURCE.read_bytes()
+    _write_if_changed(static_dir / CSS_FILENAME, content)
+    _write_if_changed(static_dir / CSS_SOURCE.name, content)
+
+    gz_path = static_dir / f"{CSS_FILENAME}.gz"
+    if app.config.exercise_precompress_assets and not gz_path.exists():
+        # mtime=0 keeps the archive identical between builds
+        gz_path.write_bytes(gzip.compress(content, mtime=0))
+
+    # remove the files written for previous versions of the stylesheet
+    keep = fingerprinted_files(app)
+    written = getattr(app.env, "sphinx_exercise_static_files", set())
+    for name in sorted(written - keep):
+        path = static_dir / name
+        if path.exists():
+            path.unlink()
+    app.env.sphinx_exercise_static_files = written & keep
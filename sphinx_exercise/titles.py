@@ -0,0 +1,55 @@
+"""
+sphinx_exercise.titles
+~~~~~~~~~~~~~~~~~~~~~~
+
+Translated default titles
+
+The default titles are translated once per build and language and reused by
+the directives, the title nodes and the title cache instead of calling the
+translator for every exercise and solution.
+
+:copyright: Copyright 2020-2021 by the Executable Books team, see AUTHORS
+:licences: see LICENSE for details
+"""
+
+from typing import Dict, NamedTuple, Optional
+
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.locale import get_translation
+
+MESSAGE_CATALOG_NAME = "exercise"
+translate = get_translation(MESSAGE_CATALOG_NAME)
+
+
+class DefaultTitles(NamedTuple):
+    exercise: str  # Exercise
+    numfig_format: str  # Exercise %s
+    solution: str  # Solution
+    solution_to: str  # Solution to
+
+
+_default_titles: Dict[Optional[str], DefaultTitles] = {}
+_language: Optional[str] = None
+
+
+def reset_default_titles(app: Sphinx, config: Config) -> None:
+    """Forget the titles translated by a previous build"""
+    global _language
+    _default_titles.clear()
+    _language = config.language
+
+
+def default_titles() -> DefaultTitles:
+    """The default titles translated for the language of the current build"""
+    titles = _default_titles.get(_language)
+    if titles is None:
+        exercise = f"{translate('Exercise')}"
+        titles = DefaultTitles(
+            exercise=exercise,
+            numfig_format=f"{exercise} %s",
+            solution=f"{translate('Solution')}",
+            solution_to=f"{translate('Solution to')}",
+        )
+        _default_titles[_language] = titles
+    return titles
@@ -8,6 +8,7 @@ from sphinx.errors import ExtensionError
 # from sphinx.errors import ExtensionError
 
 from ._compat import findall
+from .directive import stable_label
 from .nodes import (
     exercise_node,
     exercise_enumerable_node,
@@ -16,10 +17,47 @@ from .nodes import (
     solution_start_node,
     solution_end_node,
 )
+from .profiling import traced
 
 logger = logging.getLogger(__name__)
 
 
+def relabel_gated(env, document, node, kind, body):
+    """
+    Label an unlabelled gated directive (with ``exercise_stable_labels``)
+    with a hash of its header and of the ``body`` collected up to its end
+    directive, instead of its header only
+    """
+    source = node.attributes.pop("stable_label", None)
+    if source is None:
+        return
+    old = node["label"]
+    registry = env.sphinx_exercise_registry
+    record = registry[old]
+    del registry[old]
+    label = stable_label(env, kind, "\n".join([source, body.astext()]))
+    old_name = docutils.nodes.fully_normalize_name(old)
+    name = docutils.nodes.fully_normalize_name(label)
+    for labelled in (node, record["node"]):
+        labelled["ids"] = [label if item == old else item for item in labelled["ids"]]
+        labelled["names"] = [
+            name if item == old_name else item for item in labelled["names"]
+        ]
+        labelled["label"] = label
+    registry[label] = record
+
+    document.ids.pop(old, None)
+    document.ids[label] = node
+    document.nameids.pop(old_name, None)
+    document.nameids[name] = label
+    document.nametypes[name] = document.nametypes.pop(old_name, True)
+
+    target_label = node.get("target_label")
+    solutions = getattr(env, "sphinx_exercise_solutions_index", {}).get(target_label)
+    if solutions is not None:
+        solutions[:] = [label if item == old else item for item in solutions]
+
+
 class CheckGatedDirectives(SphinxTransform):
     """
     This transform checks the structure of the gated solutions
@@ -56,6 +94,7 @@ class CheckGatedDirectives(SphinxTransform):
             msg = "[sphinx-exercise] An error has occured when parsing gated directives.\nPlease check warning messages above"  # noqa: E501
             raise ExtensionError(message=msg)
 
+    @traced("transform")
     def apply(self):
         # Check structure of all -start and -end nodes
         if hasattr(self.env, "sphinx_exercise_gated_registry"):
@@ -87,6 +126,7 @@ class MergeGatedSolutions(SphinxTransform):
                 break
         return parent_start, parent_end
 
+    @traced("transform")
     def apply(self):
         # Process all matching solution-start and solution-end nodes
         for node in findall(self.document, solution_start_node):
@@ -117,6 +157,7 @@ class MergeGatedSolutions(SphinxTransform):
             for child in parent.children[parent_start + 1 : parent_end]:
                 content += child
             new_node += content
+            relabel_gated(self.env, self.document, new_node, "solution", content)
             # Replace :solution-start: with new solution node
             node.replace_self(new_node)
             # Clean up Parent Node including :solution-end:
@@ -170,7 +211,9 @@ class MergeGatedExercises(SphinxTransform):
         # Clean up Parent Node including :exercise-end:
         for child in parent.children[parent_start + 1 : parent_end + 1]:
             parent.remove(child)
+        relabel_gated(self.env, self.document, node, "exercise", content)
 
+    @traced("transform")
     def apply(self):
         # Process all matching exercise and exercise-enumerable (gated=True)
         # and exercise-end nodes
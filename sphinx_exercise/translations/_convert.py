@@ -1,64 +1,121 @@
 import json
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import subprocess
 
 MESSAGE_CATALOG_NAME = "exercise"
 
+METADATA = (
+    "Project-Id-Version: Sphinx-Exercise\n"
+    "MIME-Version: 1.0\n"
+    "Content-Type: text/plain; charset=UTF-8\n"
+    "Content-Transfer-Encoding: 8bit\n"
+    "Language: {language}\n"
+    "Plural-Forms: nplurals=2; plural=(n != 1);\n"
+)
 
-def convert_json(folder=None):
-    folder = folder or Path(__file__).parent
 
-    # remove exising
-    for path in (folder / "locales").glob(f"**/{MESSAGE_CATALOG_NAME}.po"):
-        path.unlink()
-
-    # compile po
-    for path in (folder / "jsons").glob("*.json"):
+def read_catalogs(folder):
+    """Return {language: {english: translation}} from the JSON sources"""
+    catalogs = {}
+    for path in sorted((folder / "jsons").glob("*.json")):
         data = json.loads(path.read_text("utf8"))
         assert data[0]["symbol"] == "en"
         english = data[0]["text"]
         for item in data[1:]:
-            language = item["symbol"]
-            out_path = (
-                folder
-                / "locales"
-                / language
-                / "LC_MESSAGES"
-                / f"{MESSAGE_CATALOG_NAME}.po"
-            )
-            if not out_path.parent.exists():
-                out_path.parent.mkdir(parents=True)
-            if not out_path.exists():
-                header = f"""
-msgid ""
-msgstr ""
-"Project-Id-Version: Sphinx-Exercise\\n"
-"MIME-Version: 1.0\\n"
-"Content-Type: text/plain; charset=UTF-8\\n"
-"Content-Transfer-Encoding: 8bit\\n"
-"Language: {language}\\n"
-"Plural-Forms: nplurals=2; plural=(n != 1);\\n"
-"""
-                out_path.write_text(header)
-
-            with out_path.open("a", encoding="utf8") as f:
-                f.write("\n")
-                f.write(f'msgid "{english}"\n')
-                text = item["text"].replace('"', '\\"')
-                f.write(f'msgstr "{text}"\n')
+            catalogs.setdefault(item["symbol"], {})[english] = item["text"]
+    return catalogs
+
+
+def render_po(language, messages):
+    """The content of the ``.po`` file for ``language``"""
+    metadata = METADATA.format(language=language)
+    lines = ['\nmsgid ""\nmsgstr ""\n']
+    lines += [f'"{line}\\n"\n' for line in metadata.splitlines()]
+    for english, text in messages.items():
+        text = text.replace('"', '\\"')
+        lines.append(f'\nmsgid "{english}"\nmsgstr "{text}"\n')
+    return "".join(lines)
+
+
+def write_mo(path, language, messages):
+    """
+    Write a GNU gettext ``.mo`` file (without the optional hash table)
+
+    See https://www.gnu.org/software/gettext/manual/html_node/MO-Files.html
+    """
+
+    catalog = {"": METADATA.format(language=language), **messages}
+    keys = sorted(key.encode("utf8") for key in catalog)
+    values = [catalog[key.decode("utf8")].encode("utf8") for key in keys]
+
+    count = len(keys)
+    originals_offset = 7 * 4
+    translations_offset = originals_offset + count * 8
+    strings_offset = translations_offset + count * 8
+
+    originals, translations, strings = [], [], b""
+    for table, items in ((originals, keys), (translations, values)):
+        for item in items:
+            table += [len(item), strings_offset + len(strings)]
+            strings += item + b"\0"
+
+    header = struct.pack(
+        "<7I", 0x950412DE, 0, count, originals_offset, translations_offset, 0, 0
+    )
+    tables = struct.pack(f"<{4 * count}I", *originals, *translations)
+    path.write_bytes(header + tables + strings)
+    return path
+
+
+def _compile(args):
+    return write_mo(*args)
+
+
+def convert_json(folder=None, force=False, max_workers=None):
+    """
+    Generate ``.po`` files from ``jsons/*.json`` and compile them to ``.mo``
+
+    Only locales whose generated ``.po`` content differs from the file on
+    disk (or that have no ``.mo`` file) are written and compiled, in a
+    process pool. Returns the compiled languages.
+    """
+
+    folder = Path(folder or Path(__file__).parent)
+    catalogs = read_catalogs(folder)
+
+    # remove locales that are no longer in the JSON sources
+    for path in (folder / "locales").glob(f"**/{MESSAGE_CATALOG_NAME}.[pm]o"):
+        if path.parent.parent.name not in catalogs:
+            path.unlink()
+
+    jobs = []
+    for language, messages in sorted(catalogs.items()):
+        out_dir = folder / "locales" / language / "LC_MESSAGES"
+        po_path = out_dir / f"{MESSAGE_CATALOG_NAME}.po"
+        mo_path = out_dir / f"{MESSAGE_CATALOG_NAME}.mo"
+        content = render_po(language, messages).encode("utf8")
+        if (
+            not force
+            and mo_path.exists()
+            and po_path.exists()
+            and po_path.read_bytes() == content
+        ):
+            continue
+        out_dir.mkdir(parents=True, exist_ok=True)
+        po_path.write_bytes(content)
+        jobs.append((mo_path, language, messages))
+
+    if not jobs:
+        return []
 
     # compile mo
-    for path in (folder / "locales").glob(f"**/{MESSAGE_CATALOG_NAME}.po"):
-        print(path)
-        subprocess.check_call(
-            [
-                "msgfmt",
-                str(path.resolve()),
-                "-o",
-                str((path.parent / f"{MESSAGE_CATALOG_NAME}.mo").resolve()),
-            ]
-        )
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for path in executor.map(_compile, jobs):
+            print(path)
+    return [language for _, language, _ in jobs]
 
 
 if __name__ == "__main__":
-    convert_json()
+    convert_json(force="--force" in sys.argv[1:])
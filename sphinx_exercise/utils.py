@@ -31,3 +31,50 @@ def get_node_number(self, node, typ) -> str:
     fignumbers = self.builder.env.toc_fignumbers.get(docname, {})
     number = fignumbers.get(typ, {}).get(ids, ())
     return ".".join(map(str, number))
+
+
+def toctree_order(env):
+    """
+    Return a dict mapping docnames to their rank in toctree order
+
+    Documents are ranked depth-first from the root document following
+    ``env.toctree_includes``. Documents outside the toctree (orphans)
+    are ranked afterwards in alphabetical order.
+    """
+
+    root = getattr(env.config, "root_doc", env.config.master_doc)
+    order = {}
+    stack = [root]
+    while stack:
+        docname = stack.pop()
+        if docname in order:
+            continue
+        order[docname] = len(order)
+        stack.extend(reversed(env.toctree_includes.get(docname, [])))
+    for docname in sorted(env.all_docs):
+        if docname not in order:
+            order[docname] = len(order)
+    return order
+
+
+def toctree_chapters(env):
+    """
+    Return a dict mapping each chapter (the root document and each document
+    in its toctree) to the documents it contains, in toctree order
+
+    The root document only contains itself.
+    """
+
+    root = getattr(env.config, "root_doc", env.config.master_doc)
+    chapters = {root: [root]}
+    for chapter in env.toctree_includes.get(root, []):
+        docnames = []
+        stack = [chapter]
+        while stack:
+            docname = stack.pop()
+            if docname in docnames:
+                continue
+            docnames.append(docname)
+            stack.extend(reversed(env.toctree_includes.get(docname, [])))
+        chapters.setdefault(chapter, docnames)
+    return chapters
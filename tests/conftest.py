@@ -1,3 +1,4 @@
+import json
 import shutil
 import pytest
 import packaging.version
@@ -9,6 +10,54 @@ from pathlib import Path
 pytest_plugins = "sphinx.testing.fixtures"
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="run the synthetic large-book benchmarks",
+    )
+    parser.addoption(
+        "--benchmark-json",
+        default=None,
+        help="write the benchmark results to this JSON file",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks need --benchmark to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+_benchmark_results = []
+
+
+@pytest.fixture
+def benchmark_results():
+    """Collect benchmark measurements reported at the end of the session"""
+    return _benchmark_results
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not _benchmark_results:
+        return
+    terminalreporter.section("sphinx-exercise benchmarks")
+    for result in _benchmark_results:
+        terminalreporter.write_line(
+            "{case:<24} {exercises:>6} exercises {seconds:8.2f}s "
+            "{throughput:9.1f} exercises/s peak RSS {peak_rss_kb:>8} KB".format(
+                **result
+            )
+        )
+    path = config.getoption("--benchmark-json")
+    if path:
+        Path(path).write_text(json.dumps(_benchmark_results, indent=2))
+
+
 if packaging.version.Version(sphinx.__version__) < packaging.version.Version("7.2.0"):
 
     @pytest.fixture
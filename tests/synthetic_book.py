@@ -0,0 +1,185 @@
+"""
+Generate synthetic sphinx-exercise projects of arbitrary size
+
+The generated book is plain reStructuredText (no extra extensions) laid out as
+
+    index.rst
+    chapter-000/index.rst
+    chapter-000/section-0000.rst
+    ...
+
+so that it can be used for scaling benchmarks and memory regression tests.
+"""
+
+import json
+import random
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+CONF = """\
+project = "sphinx-exercise synthetic book"
+extensions = ["sphinx_exercise"]
+exclude_patterns = ["_build"]
+"""
+
+
+def exercise_label(doc, index):
+    return f"ex-{doc}-{index}"
+
+
+def solution_label(doc, index):
+    return f"sol-{doc}-{index}"
+
+
+def _directive(name, argument, label, body, gated):
+    if gated:
+        return (
+            f".. {name}-start:: {argument}\n"
+            f"   :label: {label}\n\n"
+            f"{body}\n\n"
+            f".. {name}-end::\n"
+        )
+    return f".. {name}:: {argument}\n   :label: {label}\n\n" + textwrap.indent(
+        body, "   "
+    )
+
+
+def generate_book(
+    path,
+    docs=10,
+    exercises_per_doc=10,
+    docs_per_chapter=10,
+    same_doc_solutions=0.5,
+    cross_doc_solutions=0.1,
+    gated=0.1,
+    math_subtitles=0.2,
+    references=2,
+    seed=0,
+):
+    """
+    Write a synthetic book to ``path`` and return a summary of its contents
+
+    docs : number of section documents
+    exercises_per_doc : number of exercises in every section document
+    docs_per_chapter : number of section documents in each chapter toctree
+    same_doc_solutions : fraction of exercises followed by a solution
+    cross_doc_solutions : fraction of exercises solved in the next document
+    gated : fraction of exercises and solutions using gated syntax
+    math_subtitles : fraction of exercises with math in the subtitle
+    references : number of ref/numref roles per document
+    """
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    path.joinpath("conf.py").write_text(CONF)
+
+    chapters = {}
+    for doc in range(docs):
+        chapters.setdefault(doc // docs_per_chapter, []).append(doc)
+
+    summary = {"docs": docs, "exercises": 0, "solutions": 0, "gated": 0}
+    deferred = {}  # cross document solutions written in the next document
+    for chapter, chapter_docs in chapters.items():
+        chapter_dir = path.joinpath(f"chapter-{chapter:03d}")
+        chapter_dir.mkdir(exist_ok=True)
+        title = f"Chapter {chapter}"
+        toctree = "\n".join(f"   section-{doc:04d}" for doc in chapter_docs)
+        chapter_dir.joinpath("index.rst").write_text(
+            f"{title}\n{'=' * len(title)}\n\n.. toctree::\n\n{toctree}\n"
+        )
+        for doc in chapter_docs:
+            title = f"Section {doc}"
+            blocks = [f"{title}\n{'=' * len(title)}\n"]
+            for _, text in deferred.pop(doc, []):
+                blocks.append(text)
+                summary["solutions"] += 1
+            for index in range(exercises_per_doc):
+                label = exercise_label(doc, index)
+                is_gated = rng.random() < gated
+                summary["gated"] += is_gated
+                if rng.random() < math_subtitles:
+                    subtitle = f"Bound :math:`x_{{{index}}} \\leq {doc}`"
+                else:
+                    subtitle = f"Exercise {index} of section {doc}"
+                body = (
+                    f"Compute the value of item {index} in section {doc}.\n\n"
+                    f".. math::\n\n   y = x^{{{index}}}\n"
+                )
+                blocks.append(_directive("exercise", subtitle, label, body, is_gated))
+                summary["exercises"] += 1
+                draw = rng.random()
+                text = _directive(
+                    "solution",
+                    label,
+                    solution_label(doc, index),
+                    f"The answer to {label} is {index * doc}.\n",
+                    is_gated,
+                )
+                if draw < same_doc_solutions:
+                    blocks.append(text)
+                    summary["solutions"] += 1
+                elif draw < same_doc_solutions + cross_doc_solutions:
+                    if doc + 1 < docs:
+                        deferred.setdefault(doc + 1, []).append((label, text))
+            if references and doc * exercises_per_doc:
+                lines = []
+                for _ in range(references):
+                    other = rng.randrange(doc + 1)
+                    index = rng.randrange(exercises_per_doc)
+                    role = rng.choice(["ref", "numref"])
+                    lines.append(f"See :{role}:`{exercise_label(other, index)}`.")
+                blocks.append("\n\n".join(lines) + "\n")
+            chapter_dir.joinpath(f"section-{doc:04d}.rst").write_text("\n".join(blocks))
+
+    toctree = "\n".join(f"   chapter-{chapter:03d}/index" for chapter in chapters)
+    path.joinpath("index.rst").write_text(
+        f"Synthetic Book\n==============\n\n.. toctree::\n\n{toctree}\n"
+    )
+    return summary
+
+
+def section_path(path, doc, docs_per_chapter=10):
+    """Path of the section document ``doc`` in a generated book"""
+    return Path(path).joinpath(
+        f"chapter-{doc // docs_per_chapter:03d}", f"section-{doc:04d}.rst"
+    )
+
+
+_BUILD = """\
+import json, resource, sys, time
+from sphinx.cmd.build import build_main
+start = time.perf_counter()
+status = build_main(sys.argv[1:])
+seconds = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+print(json.dumps({
+    "status": status,
+    "seconds": seconds,
+    "peak_rss_kb": peak,
+    "peak_worker_rss_kb": workers,
+}))
+"""
+
+
+def run_build(srcdir, outdir, builder="html", doctreedir=None, parallel=1):
+    """
+    Build ``srcdir`` in a fresh interpreter and return the wall time,
+    exit status and peak resident set size of that interpreter (and of
+    its largest ``-j`` worker)
+    """
+
+    args = [sys.executable, "-c", _BUILD, "-b", builder, "-q", "-j", str(parallel)]
+    if doctreedir is not None:
+        args += ["-d", str(doctreedir)]
+    args += [str(srcdir), str(outdir)]
+    start = time.perf_counter()
+    proc = subprocess.run(args, capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_seconds"] = time.perf_counter() - start
+    result["warnings"] = proc.stderr.count("WARNING")
+    return result
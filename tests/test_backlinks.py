@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+from bs4 import BeautifulSoup
+
+from sphinx_exercise.registry import migrate_env_data
+
+
+def backlinks(app):
+    html = (app.outdir / "exercise.html").read_text(encoding="utf8")
+    soup = BeautifulSoup(html, "html.parser")
+    return {
+        exercise["id"]: [
+            (link.get_text(), link["href"])
+            for link in exercise.select("p.exercise-solutions a")
+        ]
+        for exercise in soup.select("div.exercise")
+    }
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="solution_backlinks",
+    confoverrides={"exercise_solution_backlinks": True},
+)
+def test_solution_backlinks(app):
+    app.build()
+    index = app.env.sphinx_exercise_solutions_index
+    assert index["exercise-1"] == ["solution-1"]
+    assert backlinks(app)["exercise-1"] == [("Solution", "solution.html#solution-1")]
+
+    # a second solution in another document
+    (app.srcdir / "more.rst").write_text(
+        ":orphan:\n\nMore\n====\n\n"
+        ".. solution:: exercise-1\n   :label: solution-1b\n\n   Another solution\n"
+    )
+    app.build()
+    assert index["exercise-1"] == ["solution-1", "solution-1b"]
+    assert backlinks(app)["exercise-1"] == [
+        ("Solution 1", "solution.html#solution-1"),
+        ("Solution 2", "more.html#solution-1b"),
+    ]
+
+    # purged with its document
+    (app.srcdir / "more.rst").unlink()
+    app.build()
+    assert index["exercise-1"] == ["solution-1"]
+
+    # solutions are numbered in toctree and document order, not in the order
+    # their documents were read
+    path = app.srcdir / "index.rst"
+    path.write_text(
+        path.read_text(encoding="utf8")
+        + "\n.. solution:: exercise-1\n   :label: solution-1a\n\n   First\n",
+        encoding="utf8",
+    )
+    app.build()
+    assert index["exercise-1"] == ["solution-1a", "solution-1"]
+    assert backlinks(app)["exercise-1"] == [
+        ("Solution 1", "index.html#solution-1a"),
+        ("Solution 2", "solution.html#solution-1"),
+    ]
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="solution_backlinks_off")
+def test_solution_backlinks_disabled(app):
+    app.build()
+    assert not any(backlinks(app).values())
+
+
+def test_migrate_solutions_index():
+    env = SimpleNamespace(
+        sphinx_exercise_schema=1,
+        sphinx_exercise_registry={
+            "ex-1": {"type": "exercise", "docname": "a", "node": {}},
+            "sol-1": {
+                "type": "solution",
+                "docname": "b",
+                "node": {"target_label": "ex-1"},
+            },
+        },
+    )
+    assert migrate_env_data(env) == set()
+    assert env.sphinx_exercise_solutions_index == {"ex-1": ["sol-1"]}
@@ -0,0 +1,155 @@
+import json
+
+import pytest
+from bs4 import BeautifulSoup
+
+from sphinx_exercise.bank import get_exercise_bank
+
+BANK = [
+    {"id": "bank-1", "title": "Limits", "body": "Compute the limit."},
+    {"id": "bank-2", "body": "Prove the theorem.", "class": "hard"},
+    {"id": "bank-3", "body": "Never included."},
+]
+
+PAGE = """\
+:orphan:
+
+Bank
+====
+
+.. exercise-include:: bank-1
+
+.. exercise-include:: bank-2
+   :label: proof
+
+.. exercise-include:: missing
+"""
+
+
+def write_bank(path, entries):
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+
+
+def exercises(app):
+    html = (app.outdir / "bank.html").read_text(encoding="utf8")
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.select("div.exercise")
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="exercise_bank",
+    confoverrides={"exercise_bank": "bank.jsonl"},
+)
+def test_exercise_include(app, warning):
+    entries = [dict(entry) for entry in BANK]
+    write_bank(app.srcdir / "bank.jsonl", entries)
+    (app.srcdir / "bank.rst").write_text(PAGE)
+    read = []
+    app.connect(
+        "env-before-read-docs", lambda app, env, docnames: read.append(set(docnames))
+    )
+    app.build()
+    assert "bank" in read[-1]
+
+    found = exercises(app)
+    assert [node["id"] for node in found] == ["bank-1", "proof"]
+    assert "Limits" in found[0].select_one("p.admonition-title").get_text()
+    assert "Compute the limit." in found[0].get_text()
+    assert "hard" in found[1]["class"]
+    assert "unknown exercise bank entry: missing" in warning.getvalue()
+    assert app.env.sphinx_exercise_registry["proof"]["docname"] == "bank"
+
+    bank = get_exercise_bank(app.env)
+    assert bank.index_path.exists()
+    # only the included entries were parsed
+    assert sorted(bank._entries) == ["bank-1", "bank-2"]
+
+    # changing an entry that is not included does not re-read the page
+    entries[2]["body"] = "Still never included."
+    write_bank(app.srcdir / "bank.jsonl", entries)
+    app.build()
+    assert "bank" not in read[-1]
+    assert app.env.sphinx_exercise_bank_deps["bank"]["bank-1"] == bank.entry_hash(
+        "bank-1"
+    )
+
+    # changing an included entry does
+    entries[0]["body"] = "Compute the derivative."
+    write_bank(app.srcdir / "bank.jsonl", entries)
+    app.build()
+    assert read[-1] == {"bank"}
+    assert "Compute the derivative." in exercises(app)[0].get_text()
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="exercise_bank_yaml",
+    confoverrides={"exercise_bank": "bank.yml"},
+)
+def test_exercise_include_yaml(app):
+    yaml = pytest.importorskip("yaml")
+    entries = {entry["id"]: dict(entry) for entry in BANK}
+    for entry in entries.values():
+        del entry["id"]
+    (app.srcdir / "bank.yml").write_text(yaml.safe_dump(entries))
+    (app.srcdir / "bank.rst").write_text(PAGE)
+    read = []
+    app.connect(
+        "env-before-read-docs", lambda app, env, docnames: read.append(set(docnames))
+    )
+    app.build()
+    found = exercises(app)
+    assert [node["id"] for node in found] == ["bank-1", "proof"]
+    assert "Compute the limit." in found[0].get_text()
+    # the entries are read from their JSON Lines conversion
+    bank = get_exercise_bank(app.env)
+    assert bank.lines_path.parent == bank.index_path.parent
+    assert sorted(bank._entries) == ["bank-1", "bank-2"]
+
+    entries["bank-3"]["body"] = "Still never included."
+    (app.srcdir / "bank.yml").write_text(yaml.safe_dump(entries))
+    app.build()
+    assert "bank" not in read[-1]
+
+    entries["bank-1"]["body"] = "Compute the derivative."
+    (app.srcdir / "bank.yml").write_text(yaml.safe_dump(entries))
+    app.build()
+    assert read[-1] == {"bank"}
+    assert "Compute the derivative." in exercises(app)[0].get_text()
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="exercise_bank_parallel",
+    confoverrides={"exercise_bank": "bank.json"},
+    parallel=2,
+)
+def test_exercise_include_parallel(app, warning):
+    entries = [dict(entry) for entry in BANK]
+    entries[1]["class"] = ["hard", "proof"]
+    (app.srcdir / "bank.json").write_text(json.dumps(entries))
+    for number in range(8):
+        (app.srcdir / f"bank-{number}.rst").write_text(
+            f":orphan:\n\nBank {number}\n=======\n\n"
+            f".. exercise-include:: bank-2\n   :label: proof-{number}\n"
+        )
+    indexed = []
+    app.connect(
+        "env-before-read-docs",
+        lambda app, env, docnames: indexed.append(
+            get_exercise_bank(env)._index is not None
+        ),
+    )
+    app.build()
+    # the index was built before the documents were read in parallel
+    assert indexed == [True]
+    assert not list(get_exercise_bank(app.env).index_path.parent.glob("*.tmp"))
+    assert "invalid exercise bank" not in warning.getvalue()
+    html = (app.outdir / "bank-7.html").read_text(encoding="utf8")
+    exercise = BeautifulSoup(html, "html.parser").select_one("div.exercise")
+    assert {"hard", "proof"} <= set(exercise["class"])
+    assert "Prove the theorem." in exercise.get_text()
@@ -0,0 +1,66 @@
+"""
+Scaling benchmarks on synthetic books (run with ``pytest --benchmark``)
+
+Each case builds in a fresh interpreter so that the reported peak RSS
+belongs to that build alone.
+"""
+
+import pytest
+
+from synthetic_book import generate_book, run_build, section_path
+
+SIZES = [10, 100, 1000, 10000]
+EXERCISES_PER_DOC = 10
+
+
+@pytest.fixture
+def book(tmp_path, request):
+    exercises = request.param
+    docs = max(exercises // EXERCISES_PER_DOC, 1)
+    srcdir = tmp_path / "src"
+    summary = generate_book(
+        srcdir, docs=docs, exercises_per_doc=min(exercises, EXERCISES_PER_DOC)
+    )
+    return srcdir, summary
+
+
+def record(results, case, summary, result):
+    assert result["status"] == 0
+    results.append(
+        {
+            "case": case,
+            "exercises": summary["exercises"],
+            "solutions": summary["solutions"],
+            "seconds": result["seconds"],
+            "throughput": summary["exercises"] / result["seconds"],
+            "peak_rss_kb": max(result["peak_rss_kb"], result["peak_worker_rss_kb"]),
+            "warnings": result["warnings"],
+        }
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("book", SIZES, indirect=True)
+def test_full_and_incremental_build(book, tmp_path, benchmark_results):
+    srcdir, summary = book
+    outdir, doctreedir = tmp_path / "html", tmp_path / "doctrees"
+    result = run_build(srcdir, outdir, doctreedir=doctreedir)
+    record(benchmark_results, "html full", summary, result)
+
+    # edit a single exercise and rebuild
+    path = section_path(srcdir, 0)
+    path.write_text(path.read_text().replace("Compute", "Calculate", 1))
+    result = run_build(srcdir, outdir, doctreedir=doctreedir)
+    record(benchmark_results, "html incremental", summary, result)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("book", SIZES, indirect=True)
+@pytest.mark.parametrize("builder", ["html", "singlehtml", "latex"])
+def test_write(book, builder, tmp_path, benchmark_results):
+    srcdir, summary = book
+    doctreedir = tmp_path / "doctrees"
+    # read once so that the measured build is dominated by writing
+    run_build(srcdir, tmp_path / "warmup", builder, doctreedir=doctreedir)
+    result = run_build(srcdir, tmp_path / builder, builder, doctreedir=doctreedir)
+    record(benchmark_results, f"{builder} write", summary, result)
@@ -0,0 +1,72 @@
+from bs4 import BeautifulSoup
+import pytest
+
+from sphinx_exercise.cache import get_title_cache, update_title_cache
+from sphinx_exercise.titles import default_titles
+
+
+def solution_titles(app):
+    html = (app.outdir / "solution.html").read_text(encoding="utf8")
+    soup = BeautifulSoup(html, "html.parser")
+    return [
+        title.get_text() for title in soup.select("div.solution p.admonition-title")
+    ]
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="title_cache")
+def test_title_cache(app):
+    app.build()
+    cache = get_title_cache(app.env)
+    assert cache.path.exists()
+    assert cache.get("exercise-1").number == "1"
+    assert cache.get("exercise-1").title == "Exercise 1 (n! factorial)"
+    assert cache.get("exercise-2").title == "Exercise (n! factorial)"
+    assert cache.get("exercise-3").title == "Exercise 2"
+    assert cache.get("solution-3").title == "Solution to Exercise 2"
+    assert cache.get("solution-3").docname == "solution"
+    assert "Solution to Exercise 2" in solution_titles(app)
+
+    # a new exercise at the top renumbers exercises, and solutions in other
+    # documents are rewritten even though their sources did not change
+    path = app.srcdir / "exercise.rst"
+    content = path.read_text(encoding="utf8")
+    path.write_text(
+        content.replace(
+            "A collection of exercise directives\n",
+            "A collection of exercise directives\n\n"
+            ".. exercise::\n    :label: exercise-0\n\n    New exercise\n",
+        ),
+        encoding="utf8",
+    )
+    app.build()
+    assert cache.get("exercise-3").number == "3"
+    assert cache.get("solution-3").title == "Solution to Exercise 3"
+    assert "Solution to Exercise 3" in solution_titles(app)
+
+    # entries are persisted across processes
+    cache.reload()
+    assert cache.get("exercise-0").title == "Exercise 1"
+
+    # titles resolved with another numfig_format (or language) are discarded
+    app.config.numfig_format["exercise"] = "Problem %s"
+    update_title_cache(app, app.env)
+    assert cache.get("exercise-3").title == "Problem 3"
+    assert cache.get("solution-3").title == "Solution to Problem 3"
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="title_cache_fr",
+    confoverrides={"language": "fr"},
+)
+def test_translated_default_titles(app):
+    app.build()
+    titles = default_titles()
+    assert titles == ("Exercice", "Exercice %s", "Solution", "Solution de")
+    assert default_titles() is titles
+    assert app.config.numfig_format["exercise"] == "Exercice %s"
+    cache = get_title_cache(app.env)
+    assert cache.get("exercise-3").title == "Exercice 2"
+    assert cache.get("solution-3").title == "Solution de Exercice 2"
+    assert "Solution de Exercice 2" in solution_titles(app)
@@ -0,0 +1,98 @@
+import pytest
+from bs4 import BeautifulSoup
+
+APPENDIX = """\
+:orphan:
+
+Appendix
+========
+
+.. solutions-list::
+   :docnames: sol*
+"""
+
+
+def appendix_solutions(app):
+    html = (app.outdir / "appendix.html").read_text(encoding="utf8")
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.select("div.solution")
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="solutions_list")
+def test_solutions_list(app):
+    (app.srcdir / "appendix.rst").write_text(APPENDIX)
+    written = []
+    app.connect(
+        "html-page-context", lambda app, pagename, *args: written.append(pagename)
+    )
+    app.build()
+
+    solutions = appendix_solutions(app)
+    assert len(solutions) == 4
+    links = [solution.select_one("p.admonition-title a") for solution in solutions]
+    assert [link["href"] for link in links] == [
+        f"exercise.html#exercise-{number}" for number in (1, 2, 3, 4)
+    ]
+    assert links[2].get_text() == " Exercise 2"
+    assert "This is a solution to exercise 1" in solutions[0].get_text()
+    # anchors stay in the document defining the solution
+    assert all(not solution.get("id") for solution in solutions)
+
+    # unrelated changes do not rewrite the appendix
+    path = app.srcdir / "exercise.rst"
+    path.write_text(path.read_text(encoding="utf8") + "\nMore text.\n")
+    written.clear()
+    app.build()
+    assert "exercise" in written and "appendix" not in written
+
+    # changed solutions do
+    path = app.srcdir / "solution.rst"
+    content = path.read_text(encoding="utf8")
+    path.write_text(content.replace("to exercise 1", "to the first exercise"))
+    written.clear()
+    app.build()
+    assert "appendix" in written
+    assert "to the first exercise" in appendix_solutions(app)[0].get_text()
+
+    # and so do changed exercise titles
+    path = app.srcdir / "exercise.rst"
+    content = path.read_text(encoding="utf8")
+    path.write_text(content.replace(":math:`n!` factorial\n", "Factorials\n", 1))
+    written.clear()
+    app.build()
+    assert "appendix" in written
+    assert "Factorials" in appendix_solutions(app)[0].get_text()
+
+    # ids within copied solutions are unique to the page collecting them
+    path = app.srcdir / "solution.rst"
+    content = path.read_text(encoding="utf8")
+    path.write_text(
+        content.replace(
+            "to the first exercise",
+            "to the first exercise [#note]_\n\n    .. [#note] A footnote",
+        )
+    )
+    app.build()
+    solution = appendix_solutions(app)[0]
+    footnote = solution.select_one(".footnote")
+    reference = solution.select_one("a.footnote-reference")
+    assert footnote["id"] != "note"
+    assert reference["href"] == f"#{footnote['id']}"
+    assert footnote.select_one(f"a[href='#{reference['id']}']") is not None
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="solutions_list_class")
+def test_solutions_list_filters(app):
+    path = app.srcdir / "solution.rst"
+    content = path.read_text(encoding="utf8")
+    path.write_text(
+        content.replace(":label: solution-2", ":label: solution-2\n    :class: hard")
+    )
+    (app.srcdir / "appendix.rst").write_text(
+        APPENDIX + "\n.. solutions-list::\n   :class: hard\n"
+        "\n.. solutions-list::\n   :docnames: exercise\n"
+    )
+    app.build()
+    solutions = appendix_solutions(app)
+    assert len(solutions) == 4 + 1
+    assert "This is a solution to exercise 2" in solutions[-1].get_text()
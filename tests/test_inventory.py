@@ -0,0 +1,105 @@
+import json
+import shutil
+import zlib
+
+import pytest
+from bs4 import BeautifulSoup
+
+REMOTE = """\
+:orphan:
+
+Remote
+======
+
+Prefixed :numref:`course:exercise-1` and :ref:`course:exercise-2`.
+
+Explicit :numref:`Problem {number} <course:exercise-3>`.
+
+Unprefixed :ref:`remote-only` and solution :ref:`course:solution-1`.
+"""
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="inventory_source")
+def test_inventory(app, tmp_path):
+    path = app.srcdir / "exercise.rst"
+    content = path.read_text(encoding="utf8")
+    path.write_text(
+        content.replace(
+            "A collection of exercise directives\n",
+            "A collection of exercise directives\n\n"
+            ".. exercise:: Remote\n    :label: remote-only\n\n    Only here\n",
+        ),
+        encoding="utf8",
+    )
+    app.build()
+    inventory = json.loads((app.outdir / "exercises.inv.json").read_text("utf8"))
+    items = inventory["items"]
+    assert items["exercise-1"] == {
+        "type": "exercise",
+        "docname": "exercise",
+        "uri": "exercise.html#exercise-1",
+        "number": "2",
+        "title": "Exercise 2 (n! factorial)",
+    }
+    assert items["solution-1"]["type"] == "solution"
+    # exercises and solutions are listed in objects.inv as well
+    header, body = (app.outdir / "objects.inv").read_bytes().split(b"zlib.\n", 1)
+    objects = zlib.decompress(body).decode("utf8").splitlines()
+    assert (
+        "exercise-1 exercise:exercise -1 exercise.html#$ Exercise 2 (n! factorial)"
+        in objects
+    )
+    assert any(line.startswith("solution-1 exercise:solution ") for line in objects)
+    # the inventory is only written when it changes
+    cached = tmp_path / "course.json"
+    shutil.copy(app.outdir / "exercises.inv.json", cached)
+    mtime = (app.outdir / "exercises.inv.json").stat().st_mtime_ns
+    app.build()
+    assert (app.outdir / "exercises.inv.json").stat().st_mtime_ns == mtime
+
+    # a consuming project resolves references from the cached inventory
+    consumer = app.srcdir.parent / "inventory_consumer"
+    shutil.copytree(app.srcdir, consumer)
+    shutil.rmtree(consumer / "_build", ignore_errors=True)
+    (consumer / "exercise.rst").write_text(content, encoding="utf8")
+    (consumer / "remote.rst").write_text(REMOTE, encoding="utf8")
+    (consumer / "conf.py").write_text(
+        (consumer / "conf.py").read_text(encoding="utf8")
+        + "\nexercise_inventories = {\n"
+        f'    "course": ("https://example.org/course", r"{cached}"),\n'
+        "}\n",
+        encoding="utf8",
+    )
+    from sphinx.application import Sphinx
+
+    other = Sphinx(
+        str(consumer),
+        str(consumer),
+        str(consumer / "_build" / "html"),
+        str(consumer / "_build" / "doctrees"),
+        "html",
+        status=None,
+        warning=None,
+        freshenv=True,
+    )
+    other.build()
+    soup = BeautifulSoup(
+        (consumer / "_build" / "html" / "remote.html").read_text("utf8"),
+        "html.parser",
+    )
+    links = [
+        (link.get_text(), link["href"]) for link in soup.select("a.reference.external")
+    ]
+    assert links == [
+        ("Exercise 2", "https://example.org/course/exercise.html#exercise-1"),
+        (
+            "Exercise (n! factorial)",
+            "https://example.org/course/exercise.html#exercise-2",
+        ),
+        ("Problem 3", "https://example.org/course/exercise.html#exercise-3"),
+        ("Exercise 1 (Remote)", "https://example.org/course/exercise.html#remote-only"),
+        (
+            "Solution to Exercise 2 (n! factorial)",
+            "https://example.org/course/solution.html#solution-1",
+        ),
+    ]
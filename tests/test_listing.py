@@ -0,0 +1,80 @@
+import pytest
+from bs4 import BeautifulSoup
+
+LISTING = """\
+:orphan:
+
+Exercises
+=========
+
+.. exercise-list::
+"""
+
+
+def links(path):
+    soup = BeautifulSoup(path.read_text(encoding="utf8"), "html.parser")
+    return [
+        (link.get_text(), link["href"]) for link in soup.select("ul.exercise-list a")
+    ]
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="exercise_list",
+    confoverrides={"exercise_list_page_size": 3, "exercise_index": True},
+)
+def test_exercise_list(app):
+    (app.srcdir / "exercises.rst").write_text(LISTING)
+    written = []
+    app.connect(
+        "html-page-context", lambda app, pagename, *args: written.append(pagename)
+    )
+    app.build()
+
+    assert links(app.outdir / "exercises.html") == [
+        ("Exercise 1 (n! factorial)", "exercise.html#exercise-1"),
+        ("Exercise (n! factorial)", "exercise.html#exercise-2"),
+        ("Exercise 2", "exercise.html#exercise-3"),
+    ]
+    page = app.outdir / "exercises-exercise-list-0-2.html"
+    assert links(page) == [("Exercise", "exercise.html#exercise-4")]
+    assert (
+        "exercise.html#exercise-1" in (app.outdir / "exercise-index.html").read_text()
+    )
+
+    # unrelated changes do not rewrite the list or its pages
+    path = app.srcdir / "solution.rst"
+    path.write_text(path.read_text(encoding="utf8") + "\nMore text.\n")
+    written.clear()
+    app.build()
+    assert "solution" in written
+    assert "exercises" not in written
+    assert "exercises-exercise-list-0-2" not in written
+
+    # a new exercise renumbers and moves entries between pages
+    path = app.srcdir / "exercise.rst"
+    content = path.read_text(encoding="utf8")
+    path.write_text(
+        content.replace(
+            "A collection of exercise directives\n",
+            "A collection of exercise directives\n\n"
+            ".. exercise::\n    :label: exercise-0\n\n    New exercise\n",
+        ),
+        encoding="utf8",
+    )
+    written.clear()
+    app.build()
+    assert "exercises" in written and "exercises-exercise-list-0-2" in written
+    assert links(page) == [
+        ("Exercise 3", "exercise.html#exercise-3"),
+        ("Exercise", "exercise.html#exercise-4"),
+    ]
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="exercise_list_default")
+def test_exercise_list_unpaginated(app):
+    (app.srcdir / "exercises.rst").write_text(LISTING)
+    app.build()
+    assert len(links(app.outdir / "exercises.html")) == 4
+    assert not (app.outdir / "exercise-index.html").exists()
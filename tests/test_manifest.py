@@ -0,0 +1,111 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from bs4 import BeautifulSoup
+
+from sphinx_exercise.manifest import MANIFEST_VERSION, import_manifests
+from sphinx_exercise.registry import ShardedRegistry
+
+SHARD_CONF = """
+exclude_patterns = {exclude!r}
+exercise_manifest_export = "manifest.json"
+exercise_manifest_import = {imports!r}
+"""
+
+
+def make_shard(srcdir, path, exclude, imports):
+    shutil.copytree(srcdir, path)
+    conf = path / "conf.py"
+    conf.write_text(
+        conf.read_text(encoding="utf8")
+        + SHARD_CONF.format(exclude=exclude, imports=imports),
+        encoding="utf8",
+    )
+
+
+def build(path, builder):
+    command = [sys.executable, "-m", "sphinx", "-b", builder, "-q"]
+    command += [str(path), str(path / "_build" / builder)]
+    return subprocess.Popen(command)
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="manifest")
+def test_manifest_shards(app):
+    root = app.srcdir.parent
+    book = root / "manifest-book"
+    exercises = root / "shard-exercises"
+    solutions = root / "shard-solutions"
+    manifest_path = str(book / "_build" / "dummy" / "manifest.json")
+    make_shard(app.srcdir, book, ["_build"], [])
+    make_shard(app.srcdir, exercises, ["_build", "solution.rst"], [manifest_path])
+    make_shard(app.srcdir, solutions, ["_build", "exercise.rst"], [manifest_path])
+
+    # export the manifest of the whole book from a read-only build
+    assert build(book, "dummy").wait() == 0
+    manifest = json.loads(Path(manifest_path).read_text("utf8"))
+    assert manifest["items"]["exercise-1"] == {
+        "type": "exercise",
+        "docname": "exercise",
+        "number": "1",
+        "title": "Exercise 1 (n! factorial)",
+        "hidden": False,
+        "classes": ["exercise"],
+        "enumerated": True,
+        "default_title": "Exercise",
+        "subtitle": "n! factorial",
+    }
+
+    path = solutions / "solution.rst"
+    path.write_text(
+        path.read_text(encoding="utf8")
+        + "\nSee :numref:`exercise-3` and :ref:`exercise-2`.\n",
+        encoding="utf8",
+    )
+
+    # build the shards in parallel processes
+    processes = [build(exercises, "html"), build(solutions, "html")]
+    assert [process.wait() for process in processes] == [0, 0]
+
+    soup = BeautifulSoup(
+        (solutions / "_build" / "html" / "solution.html").read_text("utf8"),
+        "html.parser",
+    )
+    title = soup.select_one("#solution-1 .admonition-title")
+    assert " ".join(title.get_text().split()) == "Solution to Exercise 1 (n! factorial)"
+    assert title.select_one("a")["href"] == "exercise.html#exercise-1"
+    links = {
+        (link.get_text(), link["href"]) for link in soup.select("a.reference.internal")
+    }
+    assert ("Exercise 2", "exercise.html#exercise-3") in links
+    assert ("Exercise (n! factorial)", "exercise.html#exercise-2") in links
+    assert not (solutions / "_build" / "html" / "exercise.html").exists()
+
+
+def test_import_manifests_replaces_imported_labels(tmp_path):
+    item = {"type": "exercise", "docname": "b", "number": "2", "title": "Ex"}
+    data = {"version": MANIFEST_VERSION, "items": {"ex-b": item}}
+    (tmp_path / "manifest.json").write_text(json.dumps(data), "utf8")
+    config = SimpleNamespace(exercise_manifest_import=["manifest.json"])
+    app = SimpleNamespace(confdir=tmp_path, config=config)
+    env = SimpleNamespace(found_docs={"a"}, sphinx_exercise_registry=ShardedRegistry())
+    env.sphinx_exercise_registry["ex-a"] = {"type": "exercise", "docname": "a"}
+
+    import_manifests(app, env, set(), set(), set())
+    assert env.sphinx_exercise_imported_labels == {"ex-b"}
+    assert env.sphinx_exercise_registry["ex-b"]["imported"]
+
+    # only the previously imported labels are removed
+    config.exercise_manifest_import = []
+    import_manifests(app, env, set(), set(), set())
+    assert env.sphinx_exercise_imported_labels == set()
+    assert list(env.sphinx_exercise_registry) == ["ex-a"]
+
+    # nothing to import and nothing imported before
+    env = SimpleNamespace(found_docs={"a"})
+    assert import_manifests(app, env, set(), set(), set()) == []
+    assert not hasattr(env, "sphinx_exercise_registry")
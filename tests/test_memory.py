@@ -0,0 +1,131 @@
+"""
+Memory regression tests for the sphinx-exercise environment data
+
+A synthetic book is built with tracemalloc enabled and the memory used by
+the extension is checked against a per-exercise budget.
+"""
+
+import pickle
+import tracemalloc
+
+import pytest
+import sphinx
+from sphinx.transforms.post_transforms import SphinxPostTransform
+
+from synthetic_book import generate_book
+
+DOCS = 20
+EXERCISES_PER_DOC = 10
+
+# Budgets in bytes per exercise (roughly 1.5x to 2x the measured values)
+# label -> docname index of the registry (pickled with the environment)
+REGISTRY_INDEX_BUDGET = 350
+# registry records, once their shards are loaded, and the shard files
+REGISTRY_RECORDS_BUDGET = 40_000
+REGISTRY_SHARDS_BUDGET = 4_000
+NODE_ORDER_BUDGET = 150
+GATED_REGISTRY_BUDGET = 200
+ENV_PICKLE_BUDGET = 6_000
+DOCTREE_READ_PEAK_BUDGET = 2_000
+POST_TRANSFORM_PEAK_BUDGET = 60_000
+
+
+def traced_size(obj):
+    """Bytes allocated to rebuild ``obj`` from its pickle"""
+    data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        restored = pickle.loads(data)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del restored
+    return after - before
+
+
+class PeakMonitor:
+    """Track the largest tracemalloc peak seen between start() and stop()"""
+
+    def __init__(self):
+        self.largest = 0
+        self._start = 0
+
+    def start(self):
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        peak = tracemalloc.get_traced_memory()[1] - self._start
+        self.largest = max(self.largest, peak)
+
+
+def make_post_transform(callback, priority):
+    class Monitor(SphinxPostTransform):
+        default_priority = priority
+
+        def run(self):
+            callback()
+
+    return Monitor
+
+
+@pytest.fixture(scope="module")
+def large_book(tmp_path_factory):
+    from sphinx.testing.util import SphinxTestApp
+
+    srcdir = tmp_path_factory.mktemp("memory") / "src"
+    summary = generate_book(srcdir, docs=DOCS, exercises_per_doc=EXERCISES_PER_DOC)
+    if sphinx.version_info < (7, 2):
+        from sphinx.testing.path import path
+
+        srcdir = path(str(srcdir))
+
+    app = SphinxTestApp("html", srcdir=srcdir)
+    read_peak, transform_peak = PeakMonitor(), PeakMonitor()
+    app.connect("doctree-read", lambda app, doctree: read_peak.start(), priority=1)
+    app.connect("doctree-read", lambda app, doctree: read_peak.stop(), priority=999)
+    # sphinx-exercise post transforms run with priorities 4 to 22
+    app.add_post_transform(make_post_transform(transform_peak.start, 3))
+    app.add_post_transform(make_post_transform(transform_peak.stop, 23))
+
+    tracemalloc.start()
+    try:
+        app.build()
+    finally:
+        tracemalloc.stop()
+    yield app, summary, read_peak.largest, transform_peak.largest
+    app.cleanup()
+
+
+def test_registry_size(large_book):
+    app, summary, _, _ = large_book
+    env = app.env
+    exercises = summary["exercises"]
+    assert len(env.sphinx_exercise_registry) == exercises + summary["solutions"]
+    registry = env.sphinx_exercise_registry
+    assert traced_size(registry) < REGISTRY_INDEX_BUDGET * exercises
+    assert traced_size(dict(registry.items())) < REGISTRY_RECORDS_BUDGET * exercises
+    shards = sum(path.stat().st_size for path in registry.path.rglob("*.pickle"))
+    assert 0 < shards < REGISTRY_SHARDS_BUDGET * exercises
+    assert traced_size(env.sphinx_exercise_node_order) < NODE_ORDER_BUDGET * exercises
+    assert (
+        traced_size(env.sphinx_exercise_gated_registry)
+        < GATED_REGISTRY_BUDGET * exercises
+    )
+
+
+def test_environment_pickle_size(large_book):
+    app, summary, _, _ = large_book
+    size = (app.doctreedir / "environment.pickle").stat().st_size
+    assert size < ENV_PICKLE_BUDGET * summary["exercises"]
+
+
+def test_doctree_read_peak(large_book):
+    _, _, read_peak, _ = large_book
+    assert 0 < read_peak < DOCTREE_READ_PEAK_BUDGET * EXERCISES_PER_DOC
+
+
+def test_post_transform_peak(large_book):
+    _, _, _, transform_peak = large_book
+    assert 0 < transform_peak < POST_TRANSFORM_PEAK_BUDGET * EXERCISES_PER_DOC
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+EXERCISE_1 = "Exercise 1 about $n!$ factorial"
+EXERCISE_2 = "Exercise 2 about $n!$ factorial"
+
+
+def cells(path):
+    notebook = json.loads(path.read_text(encoding="utf8"))
+    assert notebook["nbformat"] == 4
+    return [(cell["cell_type"], "".join(cell["source"])) for cell in notebook["cells"]]
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="notebooks",
+    confoverrides={"exercise_notebooks": True, "exercise_notebooks_solutions": True},
+)
+def test_notebooks(app):
+    app.build()
+    outdir = app.outdir / "_exercises"
+    assert sorted(path.name for path in outdir.iterdir()) == ["exercise.ipynb"]
+    content = cells(outdir / "exercise.ipynb")
+    assert content[:3] == [
+        ("markdown", "# Exercise"),
+        ("markdown", "## Exercise 1 ($n!$ factorial)\n\n" + EXERCISE_1),
+        ("markdown", "## Exercise ($n!$ factorial)\n\n" + EXERCISE_2),
+    ]
+    assert ("markdown", "## Solution") in content
+    # math in subtitles of solution headings is kept
+    assert content[-4][1].startswith("### Solution to Exercise 1 ($n!$ factorial)")
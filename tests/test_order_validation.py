@@ -1,4 +1,5 @@
 """Test exercise-solution order validation when exercise_style='solution_follow_exercise'"""
+
 from pathlib import Path
 import pytest
 
@@ -97,3 +98,106 @@ No Validation Test
 
     # Clean up
     test_file.unlink()
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="mybook",
+    srcdir="order_validation_cache",
+    confoverrides={"exercise_style": "solution_follow_exercise"},
+)
+def test_cached_validation_results(app, warning):
+    """Test that unchanged documents replay cached warnings on rebuild"""
+    srcdir = Path(app.srcdir)
+    test_file = srcdir / "test_cached_order.rst"
+    test_file.write_text(
+        """
+Cached Order Test
+=================
+
+.. solution:: cached-exercise
+   :label: sol-cached
+
+   Solution before exercise
+
+.. exercise:: Cached
+   :label: cached-exercise
+
+   Exercise content
+"""
+    )
+    app.build()
+    assert "sol-cached" in warning.getvalue()
+    cache = app.env.sphinx_exercise_order_cache
+    cached = {docname: result for docname, result in cache.items()}
+
+    # Rebuild without changes: results are reused and warnings replayed
+    warning.truncate(0)
+    warning.seek(0)
+    app.build()
+    assert "sol-cached" in warning.getvalue()
+    for docname, result in cache.items():
+        assert result is cached[docname]
+
+    # Edit the document: only the edited document is re-checked
+    test_file.write_text(test_file.read_text().replace("sol-cached", "sol-fixed"))
+    warning.truncate(0)
+    warning.seek(0)
+    app.build()
+    assert "sol-fixed" in warning.getvalue()
+    assert "sol-cached" not in warning.getvalue()
+    assert cache["test_cached_order"] is not cached["test_cached_order"]
+    assert cache["solution/_linked_enum"] is cached["solution/_linked_enum"]
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="mybook",
+    srcdir="order_validation_crossdoc",
+    confoverrides={"exercise_style": "solution_follow_exercise"},
+)
+def test_cross_document_order(app, warning):
+    """Test cross-document solutions are checked against toctree order"""
+    srcdir = Path(app.srcdir)
+    exercise = """
+{name}
+==========
+
+.. exercise:: Cross Document
+   :label: {label}
+
+   Exercise content
+"""
+    solution = """
+{name}
+==========
+
+.. solution:: {label}
+   :label: sol-{label}
+
+   Solution content
+"""
+    # orphan documents are ordered alphabetically after the toctree
+    (srcdir / "zz_late_exercise.rst").write_text(
+        exercise.format(name="Late Exer", label="late-ex")
+    )
+    (srcdir / "aa_early_solution.rst").write_text(
+        solution.format(name="Early Sol", label="late-ex")
+    )
+    (srcdir / "aa_early_exercise.rst").write_text(
+        exercise.format(name="Early Exe", label="early-ex")
+    )
+    (srcdir / "zz_late_solution.rst").write_text(
+        solution.format(name="Late Solu", label="early-ex")
+    )
+    app.build()
+    warnings_text = warning.getvalue().replace("\n", " ")
+
+    assert "Solution 'sol-late-ex' does not follow exercise 'late-ex'" in warnings_text
+    assert "Solution 'sol-early-ex' does not follow" not in warnings_text
+    assert (
+        "Solution 'sol-early-ex' references exercise 'early-ex' "
+        "which is not in the same document" in warnings_text
+    )
+    index = app.env.sphinx_exercise_label_index
+    assert index["early-ex"][1] < index["late-ex"][1]
@@ -0,0 +1,46 @@
+import pytest
+
+OTHER = """\
+Other
+=====
+
+No exercises here, but a link to :ref:`exercise-1`.
+"""
+
+SHARED = """\
+:orphan:
+
+Shared
+======
+
+Included by a page with exercises.
+"""
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="exercise_only_pages",
+    confoverrides={"exercise_only_pages": True},
+)
+def test_exercise_only_pages(app):
+    (app.srcdir / "other.rst").write_text(OTHER, encoding="utf8")
+    (app.srcdir / "shared.rst").write_text(SHARED, encoding="utf8")
+    path = app.srcdir / "exercise.rst"
+    path.write_text(
+        path.read_text(encoding="utf8")
+        + "\nSee :doc:`other`.\n\n.. include:: shared.rst\n",
+        encoding="utf8",
+    )
+    path = app.srcdir / "index.rst"
+    path.write_text(path.read_text(encoding="utf8") + "   other\n", encoding="utf8")
+    app.build()
+
+    assert (app.outdir / "index.html").exists()
+    assert (app.outdir / "exercise.html").exists()
+    assert (app.outdir / "solution.html").exists()
+    assert not (app.outdir / "other.html").exists()
+    # documents included by pages with exercises are written too
+    assert (app.outdir / "shared.html").exists()
+    # references to pages that are not written still resolve
+    assert 'href="other.html"' in (app.outdir / "exercise.html").read_text("utf8")
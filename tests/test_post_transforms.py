@@ -0,0 +1,50 @@
+import weakref
+from types import SimpleNamespace
+
+from sphinx_exercise.post_transforms import (
+    build_reference_node,
+    clear_reference_cache,
+)
+
+
+class CountingBuilder:
+    def __init__(self):
+        self.calls = []
+
+    def get_relative_uri(self, fromdoc, todoc):
+        self.calls.append((fromdoc, todoc))
+        return f"{todoc}.html"
+
+
+def test_build_reference_node_memoizes_uris():
+    app = SimpleNamespace(builder=CountingBuilder(), env=SimpleNamespace())
+    app.env.docname = "solutions"
+    targets = [
+        SimpleNamespace(docname="exercises", label=f"exercise-{number}")
+        for number in range(200)
+    ]
+    references = [build_reference_node(app, target) for target in targets * 2]
+    assert app.builder.calls == [("solutions", "exercises")]
+    assert references[1]["refuri"] == "exercises.html#exercise-1"
+    assert references[1]["internal"] is True
+    # references do not share their attributes
+    references[1]["classes"].append("changed")
+    assert references[201]["classes"] == []
+
+    # URIs are computed again for the next document written
+    app.env.docname = "other"
+    build_reference_node(app, targets[0])
+    assert app.builder.calls[-1] == ("other", "exercises")
+    app.builder = CountingBuilder()
+    build_reference_node(app, targets[0])
+    assert app.builder.calls == [("other", "exercises")]
+
+
+def test_reference_cache_released_after_build():
+    app = SimpleNamespace(builder=CountingBuilder(), env=SimpleNamespace())
+    app.env.docname = "solutions"
+    build_reference_node(app, SimpleNamespace(docname="exercises", label="ex"))
+    builder = weakref.ref(app.builder)
+    clear_reference_cache(app, None)
+    app.builder = None
+    assert builder() is None
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="mybook",
+    srcdir="profile_serial",
+    confoverrides={"exercise_profile": True},
+)
+def test_trace(app):
+    app.build()
+    path = app.outdir / "trace.json"
+    assert path.exists()
+    trace = json.loads(path.read_text(encoding="utf8"))
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert {span["cat"] for span in spans} == {
+        "directive",
+        "transform",
+        "post-transform",
+    }
+    for span in spans:
+        assert span["dur"] >= 1
+        assert span["pid"] == span["tid"]
+        assert "docname" in span["args"]
+    labels = {
+        span["args"]["label"] for span in spans if span["name"] == "ExerciseDirective"
+    }
+    assert "ex-number" in labels
+    # per-process event files are removed once collected
+    assert not list((app.doctreedir / "sphinx_exercise" / "trace").iterdir())
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="mybook",
+    srcdir="profile_parallel",
+    parallel=2,
+    confoverrides={"exercise_profile": True},
+)
+def test_trace_parallel(app):
+    app.build()
+    trace = json.loads((app.outdir / "trace.json").read_text(encoding="utf8"))
+    processes = [e for e in trace["traceEvents"] if e["name"] == "process_name"]
+    spans = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert {e["pid"] for e in spans} <= {e["pid"] for e in processes}
+    docnames = {e["args"]["docname"] for e in spans if e["cat"] == "directive"}
+    assert "solution/_linked_enum" in docnames
+
+
+@pytest.mark.sphinx("html", testroot="mybook", srcdir="profile_disabled")
+def test_trace_disabled(app):
+    app.build()
+    assert not (app.outdir / "trace.json").exists()
@@ -0,0 +1,226 @@
+import pickle
+from types import SimpleNamespace
+
+import pytest
+from docutils import nodes
+
+from sphinx_exercise.registry import (
+    SCHEMA_VERSION,
+    FrozenRegistry,
+    NodeOrder,
+    NodeOrderEntry,
+    ShardedRegistry,
+    migrate_env_data,
+)
+
+
+def test_node_order():
+    entries = [
+        NodeOrderEntry("exercise", "ex-1", None, 4),
+        NodeOrderEntry("solution", "sol-1", "ex-1", None),
+        NodeOrderEntry("exercise-include", "ex-2", None, 12),
+    ]
+    order = NodeOrder.from_entries(entries)
+    assert len(order) == 3
+    assert order[0] == entries[0]
+    assert order[1] == entries[1]
+    assert order[2].type == "unknown"
+    assert list(order.labels("exercise")) == ["ex-1"]
+
+    restored = pickle.loads(pickle.dumps(order))
+    assert list(restored) == list(order)
+    assert restored.signature() == order.signature()
+    # labels are interned so they share memory with the registry keys
+    assert restored[1].target_label is restored[0].label
+
+
+def test_migrate_legacy_node_order():
+    env = SimpleNamespace(
+        sphinx_exercise_registry={"ex-1": {"type": "exercise", "docname": "a"}},
+        sphinx_exercise_node_order={
+            "a": [
+                {"type": "exercise", "label": "ex-1", "target_label": None, "line": 3}
+            ],
+            "b": [],
+        },
+    )
+    assert migrate_env_data(env) == set()
+    assert env.sphinx_exercise_schema == SCHEMA_VERSION
+    assert list(env.sphinx_exercise_node_order) == ["a"]
+    assert list(env.sphinx_exercise_node_order["a"]) == [
+        NodeOrderEntry("exercise", "ex-1", None, 3)
+    ]
+    record = env.sphinx_exercise_registry["ex-1"]
+    assert record["hash"] is None and record["content_hash"] is None
+
+
+def test_migrate_unknown_schema():
+    env = SimpleNamespace(
+        sphinx_exercise_schema=SCHEMA_VERSION + 1,
+        sphinx_exercise_registry={"ex-1": {"type": "exercise", "docname": "a"}},
+        sphinx_exercise_node_order={"b": object()},
+        sphinx_exercise_gated_registry={"c": {}},
+    )
+    assert migrate_env_data(env) == {"a", "b", "c"}
+    assert env.sphinx_exercise_schema == SCHEMA_VERSION
+    assert not hasattr(env, "sphinx_exercise_registry")
+    assert not hasattr(env, "sphinx_exercise_node_order")
+
+
+def test_migrate_fresh_environment():
+    env = SimpleNamespace()
+    assert migrate_env_data(env) == set()
+    assert env.sphinx_exercise_schema == SCHEMA_VERSION
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="registry_schema")
+def test_rebuild_records_with_unknown_schema(app):
+    app.build()
+    # no env_version is declared, so environments of older releases are kept
+    assert "sphinx_exercise" not in app.registry.get_envversion(app)
+    registry = dict(app.env.sphinx_exercise_registry)
+    # pretend the cached records were written by a future release
+    app.env.sphinx_exercise_schema = SCHEMA_VERSION + 1
+    app.env.sphinx_exercise_registry = {}
+    app.build()
+    assert app.env.sphinx_exercise_schema == SCHEMA_VERSION
+    assert set(app.env.sphinx_exercise_registry) == set(registry)
+
+
+def test_sharded_registry(tmp_path):
+    registry = ShardedRegistry(tmp_path / "registry", maxsize=1)
+    tmp_path = tmp_path / "registry"
+    registry["ex-1"] = {"type": "exercise", "docname": "a/b", "node": {}}
+    registry["ex-2"] = {"type": "exercise", "docname": "c", "node": {}}
+    # the shard of a/b was written when it was evicted
+    assert (tmp_path / "a" / "b.pickle").exists()
+    assert registry["ex-1"]["docname"] == "a/b"
+    assert list(registry) == ["ex-1", "ex-2"]
+    assert registry.docname("ex-2") == "c"
+
+    # only the index is pickled, changed shards are written
+    restored = pickle.loads(pickle.dumps(registry))
+    assert restored._shards == {}
+    assert dict(restored.items()) == dict(registry.items())
+
+    assert registry.purge("c") == [
+        ("ex-2", {"type": "exercise", "docname": "c", "node": {}})
+    ]
+    assert not (tmp_path / "c.pickle").exists()
+    (tmp_path / "a" / "b.pickle").unlink()
+    assert restored.discard_missing() == {"a/b"}
+    assert "ex-1" not in restored and len(restored) == 1
+
+
+def test_sharded_registry_freeze_loads_changed_shards(tmp_path, monkeypatch):
+    registry = ShardedRegistry(tmp_path / "registry", maxsize=1)
+    for number in range(3):
+        for docname in ("a", "b"):
+            label = f"{docname}-{number}"
+            node = nodes.container()
+            registry[label] = {"type": "exercise", "docname": docname, "node": node}
+    registry.flush()
+    registry._shards.clear()
+    loads = []
+    load = ShardedRegistry._load
+    monkeypatch.setattr(
+        ShardedRegistry,
+        "_load",
+        lambda self, docname: loads.append(docname) or load(self, docname),
+    )
+    frozen = FrozenRegistry.freeze(registry)
+    assert sorted(loads) == ["a", "b"]
+    assert list(frozen) == sorted(registry)
+    assert (tmp_path / "registry.summary.pickle").exists()
+
+    # only changed shards are summarized again
+    registry._shards.clear()
+    loads.clear()
+    registry["a-3"] = {"type": "exercise", "docname": "a", "node": nodes.container()}
+    frozen = FrozenRegistry.freeze(registry)
+    assert loads == ["a"] and "a-3" in frozen
+    restored = pickle.loads(pickle.dumps(registry))
+    loads.clear()
+    labels = sorted(summary.label for summary in restored.summaries())
+    assert labels == sorted(registry)
+    assert loads == []
+    assert registry.docnames() == {"a", "b"}
+    registry.purge("a")
+    assert registry.docnames() == {"b"}
+    assert sorted(registry) == ["b-0", "b-1", "b-2"]
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="registry_shards")
+def test_registry_shards(app):
+    app.build()
+    shards = app.doctreedir / "sphinx_exercise" / "registry"
+    assert sorted(path.name for path in shards.iterdir()) == [
+        "exercise.pickle",
+        "solution.pickle",
+    ]
+    registry = app.env.sphinx_exercise_registry
+    assert registry["solution-1"]["node"].document is None
+    assert set(registry.__getstate__()) == {"path", "maxsize", "_index", "_tokens"}
+
+    # records are read again when their shards are lost (as in a new process
+    # loading the pickled environment)
+    labels = set(registry)
+    for path in shards.iterdir():
+        path.unlink()
+    registry._shards.clear()
+    app.build()
+    assert set(app.env.sphinx_exercise_registry) == labels
+    assert (shards / "solution.pickle").exists()
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="registry_frozen", parallel=2)
+def test_frozen_registry(app):
+    app.build()
+    registry = app.env.sphinx_exercise_registry
+    # the post transforms only read the frozen copy
+    assert not registry["solution-1"]["node"].resolved_title
+
+    frozen = FrozenRegistry.freeze(registry)
+    assert len(frozen) == len(registry)
+    assert list(frozen) == sorted(registry)
+    assert "exercise-1" in frozen and "missing" not in frozen and None not in frozen
+    assert frozen.get("missing") is None
+    exercise = frozen["exercise-1"]
+    assert exercise.docname == "exercise"
+    assert exercise.title == "Exercise"
+    assert exercise.enumerable and not exercise.hidden and not exercise.imported
+    assert frozen.subtitle("exercise-1").astext() == "n! factorial"
+    # every call returns a new copy
+    assert frozen.subtitle("exercise-1") is not frozen.subtitle("exercise-1")
+    solution = frozen["solution-1"]
+    assert (solution.type, solution.target_label) == ("solution", "exercise-1")
+    assert frozen.subtitle("solution-1") is None
+
+    html = (app.outdir / "solution.html").read_text(encoding="utf8")
+    assert "Solution to Exercise 1 (" in html
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="registry_noop")
+def test_rebuild_loads_changed_shards(app, make_app, monkeypatch):
+    app.build()
+    loads = []
+    load = ShardedRegistry._load
+
+    def counted(self, docname):
+        loads.append(docname)
+        return load(self, docname)
+
+    monkeypatch.setattr(ShardedRegistry, "_load", counted)
+
+    # a new process loading the pickled environment: nothing changed
+    make_app("html", srcdir=app.srcdir).build()
+    assert loads == []
+
+    # only the shard of the changed document is loaded
+    path = app.srcdir / "solution.rst"
+    path.write_text(path.read_text(encoding="utf8") + "\nMore.\n", encoding="utf8")
+    rebuilt = make_app("html", srcdir=app.srcdir)
+    rebuilt.build()
+    assert set(loads) == {"solution"}
+    html = (app.outdir / "solution.html").read_text(encoding="utf8")
+    assert "Solution to Exercise 1 (" in html
@@ -0,0 +1,139 @@
+import io
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from sphinx_exercise.server import (
+    LabelIndex,
+    Server,
+    parse_source,
+    read_message,
+    write_message,
+)
+
+BOOKS = Path(__file__).parent / "books"
+
+MYST = """\
+```{exercise} Limits
+:label: limits-1
+:class: hard
+
+Compute the limit.
+```
+
+:::{solution} limits-1
+---
+label: limits-1-solution
+---
+Zero.
+:::
+"""
+
+
+def test_parse_source():
+    entries = parse_source(MYST)
+    assert [(entry.type, entry.label, entry.target) for entry in entries] == [
+        ("exercise", "limits-1", None),
+        ("solution", "limits-1-solution", "limits-1"),
+    ]
+    assert entries[1].line == 8
+
+
+def test_label_index(tmp_path):
+    srcdir = tmp_path / "book"
+    shutil.copytree(BOOKS / "test-simplebook", srcdir)
+    index = LabelIndex(srcdir)
+    assert index.refresh() == ["exercise.rst", "index.rst", "solution.rst"]
+    labels = [item["label"] for item in index.complete("exercise-", "exercise")]
+    assert labels == ["exercise-1", "exercise-2", "exercise-3", "exercise-4"]
+    assert index.diagnostics() == []
+
+    # only changed files are parsed again
+    (srcdir / "chapter.md").write_text(MYST.replace("limits-1-", "exercise-1-"))
+    assert index.refresh() == ["chapter.md"]
+    assert index.refresh() == []
+
+    # unsaved buffers are indexed without touching the file
+    index.update("chapter.md", MYST.replace("label: limits-1\n", "label: exercise-1\n"))
+    assert index.diagnostics() == [
+        ("chapter.md", 8, "undefined label: limits-1"),
+        (
+            "exercise.rst",
+            6,
+            "duplicate label: exercise-1; other instance in chapter.md",
+        ),
+    ]
+    assert index.diagnostics("solution.rst") == []
+    assert index.refresh() == []
+
+
+def test_server_stdio(tmp_path):
+    srcdir = tmp_path / "book"
+    shutil.copytree(BOOKS / "test-simplebook", srcdir)
+    requests = io.BytesIO()
+    write_message(
+        requests,
+        {"jsonrpc": "2.0", "id": 1, "method": "labels", "params": {"prefix": "sol"}},
+    )
+    write_message(requests, {"jsonrpc": "2.0", "id": 2, "method": "diagnostics"})
+    write_message(requests, {"jsonrpc": "2.0", "id": 3, "method": "unknown"})
+    write_message(requests, {"jsonrpc": "2.0", "id": 4, "method": "shutdown"})
+    process = subprocess.run(
+        [sys.executable, "-m", "sphinx_exercise.server", str(srcdir)],
+        input=requests.getvalue(),
+        capture_output=True,
+        check=True,
+    )
+    stdout = io.BytesIO(process.stdout)
+    responses = [read_message(stdout) for _ in range(4)]
+    assert [item["label"] for item in responses[0]["result"]][:2] == [
+        "solution-1",
+        "solution-2",
+    ]
+    assert responses[1]["result"] == []
+    assert responses[2]["error"]["code"] == -32601
+    assert responses[3] == {"jsonrpc": "2.0", "id": 4, "result": None}
+
+
+def test_server_errors(tmp_path, monkeypatch):
+    srcdir = tmp_path / "book"
+    shutil.copytree(BOOKS / "test-simplebook", srcdir)
+    server = Server(LabelIndex(srcdir), interval=0)
+    requests = io.BytesIO()
+    requests.write(b"Content-Length: 5\r\n\r\n{oops")
+    requests.write(b"Content-Length: many\r\n\r\n")
+    write_message(requests, [1, 2])
+    write_message(
+        requests, {"jsonrpc": "2.0", "id": 1, "method": "labels", "params": [1]}
+    )
+    write_message(requests, {"jsonrpc": "2.0", "id": 2, "method": "update"})
+    write_message(
+        requests,
+        {"jsonrpc": "2.0", "id": 3, "method": "labels", "params": {"prefix": 1}},
+    )
+    write_message(requests, {"jsonrpc": "2.0", "id": 4, "method": "diagnostics"})
+    write_message(requests, {"jsonrpc": "2.0", "id": 5, "method": "shutdown"})
+    requests.seek(0)
+
+    def fail(path=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server.index, "diagnostics", fail)
+    stdout = io.BytesIO()
+    server.serve(requests, stdout)
+    stdout.seek(0)
+    responses = [read_message(stdout) for _ in range(8)]
+    assert [response["id"] for response in responses] == [
+        None,
+        None,
+        None,
+        1,
+        2,
+        3,
+        4,
+        5,
+    ]
+    codes = [response.get("error", {}).get("code") for response in responses]
+    assert codes == [-32700, -32700, -32600, -32602, -32602, -32602, -32603, None]
+    assert "boom" in responses[6]["error"]["message"]
@@ -0,0 +1,30 @@
+import pytest
+
+
+@pytest.mark.sphinx("exercise-sheets", testroot="simplebook", srcdir="sheets")
+def test_exercise_sheets(app):
+    app.build()
+    assert sorted(path.name for path in app.outdir.glob("*.tex")) == [
+        "exercise-exercises.tex"
+    ]
+    sheet = (app.outdir / "exercise-exercises.tex").read_text(encoding="utf8")
+    assert sheet.count(r"\begin{sphinxadmonition}") == 4
+    assert "Exercise 1 (" in sheet and "Exercise 2" in sheet
+    assert "Exercise 3 Content with Number" in sheet
+    assert "Solution to" not in sheet
+    # only the exercises, not the rest of the page
+    assert "References" not in sheet
+
+
+@pytest.mark.sphinx(
+    "exercise-sheets",
+    testroot="simplebook",
+    srcdir="sheets_solutions",
+    confoverrides={"exercise_sheets_solutions": True},
+    parallel=2,
+)
+def test_exercise_sheets_solutions(app):
+    app.build()
+    sheet = (app.outdir / "exercise-exercises.tex").read_text(encoding="utf8")
+    assert sheet.count(r"\begin{sphinxadmonition}") == 8
+    assert "Solution to" in sheet
@@ -0,0 +1,139 @@
+import pytest
+
+EXERCISES = """\
+:orphan:
+
+Stable
+======
+
+.. exercise:: Limits
+
+   Compute the limit.
+
+.. exercise::
+
+   Same content.
+
+.. exercise::
+
+   Same content.
+
+.. solution:: exercise-1
+
+   A solution.
+"""
+
+INSERTED = """\
+.. exercise:: Inserted
+
+   A new exercise.
+
+"""
+
+GATED = """\
+:orphan:
+
+Gated
+=====
+
+.. exercise-start::
+
+First gated exercise.
+
+.. exercise-end::
+
+.. exercise-start::
+
+Second gated exercise.
+
+.. exercise-end::
+
+.. solution-start:: exercise-1
+
+First gated solution.
+
+.. solution-end::
+"""
+
+GATED_INSERTED = """\
+.. exercise-start::
+
+Inserted gated exercise.
+
+.. exercise-end::
+
+"""
+
+
+def auto_labels(app, kind, docname="stable"):
+    return [
+        label
+        for label in app.env.sphinx_exercise_node_order[docname].labels(kind)
+        if label.startswith(f"{docname}-")
+    ]
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="stable_labels",
+    confoverrides={"exercise_stable_labels": True},
+)
+def test_stable_labels(app):
+    (app.srcdir / "stable.rst").write_text(EXERCISES)
+    app.build()
+    exercises = auto_labels(app, "exercise")
+    assert len(exercises) == 3
+    assert all(label.startswith("stable-exercise-") for label in exercises)
+    # identical exercises are told apart by their order
+    assert exercises[2] == f"{exercises[1]}-2"
+    solutions = auto_labels(app, "solution")
+    assert len(solutions) == 1
+
+    # inserting an exercise does not change the labels of the others
+    text = EXERCISES.replace(".. exercise:: Limits", INSERTED + ".. exercise:: Limits")
+    (app.srcdir / "stable.rst").write_text(text)
+    app.build()
+    updated = auto_labels(app, "exercise")
+    assert len(updated) == 4
+    assert updated[1:] == exercises
+    assert auto_labels(app, "solution") == solutions
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="stable_gated_labels",
+    confoverrides={"exercise_stable_labels": True},
+)
+def test_stable_gated_labels(app):
+    (app.srcdir / "gated.rst").write_text(GATED)
+    app.build()
+    # gated directives are labelled with a hash of their body
+    exercises = auto_labels(app, "exercise", "gated")
+    assert len(exercises) == 2
+    assert not exercises[1].startswith(exercises[0])
+    solutions = auto_labels(app, "solution", "gated")
+    registry = app.env.sphinx_exercise_registry
+    assert registry.docname(solutions[0]) == "gated"
+    assert app.env.sphinx_exercise_solutions_index["exercise-1"][-1] == solutions[0]
+    html = (app.outdir / "gated.html").read_text(encoding="utf8")
+    assert f'id="{exercises[1]}"' in html and f'id="{solutions[0]}"' in html
+
+    text = GATED.replace(
+        ".. exercise-start::", GATED_INSERTED + ".. exercise-start::", 1
+    )
+    (app.srcdir / "gated.rst").write_text(text)
+    app.build()
+    updated = auto_labels(app, "exercise", "gated")
+    assert len(updated) == 3
+    assert updated[1:] == exercises
+    assert auto_labels(app, "solution", "gated") == solutions
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="serial_labels")
+def test_serial_labels(app):
+    (app.srcdir / "stable.rst").write_text(EXERCISES)
+    app.build()
+    serial = auto_labels(app, "exercise")
+    assert all(label[len("stable-exercise-") :].isdigit() for label in serial)
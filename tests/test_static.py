@@ -0,0 +1,45 @@
+import gzip
+
+import pytest
+
+from sphinx_exercise.static import CSS_FILENAME, CSS_SOURCE
+
+
+@pytest.mark.sphinx("html", testroot="simplebook", srcdir="static_assets")
+def test_fingerprinted_css(app):
+    app.build()
+    static = app.outdir / "_static"
+    css = static / CSS_FILENAME
+    assert CSS_FILENAME.startswith("exercise.") and CSS_FILENAME != "exercise.css"
+    assert css.read_bytes() == CSS_SOURCE.read_bytes()
+    assert f"_static/{CSS_FILENAME}" in (app.outdir / "index.html").read_text()
+    assert not (static / f"{CSS_FILENAME}.gz").exists()
+
+    # the stylesheet is also published under its own name
+    assert (static / "exercise.css").read_bytes() == CSS_SOURCE.read_bytes()
+
+    # unchanged assets are not copied again and stale fingerprints written
+    # by a previous build are removed (other files are kept)
+    mtime = css.stat().st_mtime_ns
+    stale = static / "exercise.0123456789ab.css"
+    stale.write_text("")
+    app.env.sphinx_exercise_static_files.add(stale.name)
+    other = static / "exercise.ba9876543210.css"
+    other.write_text("")
+    app.build()
+    assert css.stat().st_mtime_ns == mtime
+    assert not stale.exists()
+    assert other.exists()
+    assert app.env.sphinx_exercise_static_files == {CSS_FILENAME}
+
+
+@pytest.mark.sphinx(
+    "html",
+    testroot="simplebook",
+    srcdir="static_assets_gz",
+    confoverrides={"exercise_precompress_assets": True},
+)
+def test_precompressed_css(app):
+    app.build()
+    path = app.outdir / "_static" / f"{CSS_FILENAME}.gz"
+    assert gzip.decompress(path.read_bytes()) == CSS_SOURCE.read_bytes()
@@ -0,0 +1,55 @@
+import gettext
+import importlib
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+TRANSLATIONS = Path(__file__).parent.parent / "sphinx_exercise" / "translations"
+
+
+@pytest.fixture
+def convert(tmp_path, monkeypatch):
+    # importable by name so that process pool workers can unpickle jobs
+    monkeypatch.syspath_prepend(str(TRANSLATIONS))
+    module = importlib.import_module("_convert")
+    shutil.copytree(TRANSLATIONS / "jsons", tmp_path / "jsons")
+    yield module, tmp_path
+    sys.modules.pop("_convert", None)
+
+
+def load(folder, language):
+    path = folder / "locales" / language / "LC_MESSAGES" / "exercise.mo"
+    with path.open("rb") as f:
+        return gettext.GNUTranslations(f)
+
+
+def test_convert_json(convert):
+    module, folder = convert
+    languages = module.convert_json(folder, max_workers=2)
+    shipped = sorted(path.name for path in (TRANSLATIONS / "locales").iterdir())
+    assert languages == shipped
+    for language in languages:
+        po_path = Path("locales", language, "LC_MESSAGES", "exercise.po")
+        assert (folder / po_path).read_text("utf8") == (
+            TRANSLATIONS / po_path
+        ).read_text("utf8")
+        compiled, reference = load(folder, language), load(TRANSLATIONS, language)
+        assert compiled.info() == reference.info()
+        for message in ("Exercise", "Solution to"):
+            assert compiled.gettext(message) == reference.gettext(message)
+
+
+def test_convert_json_incremental(convert):
+    module, folder = convert
+    module.convert_json(folder, max_workers=2)
+    assert module.convert_json(folder) == []
+
+    path = folder / "jsons" / "Exercise.json"
+    path.write_text(path.read_text("utf8").replace("Exercice", "Exo"), "utf8")
+    assert module.convert_json(folder) == ["fr"]
+    assert load(folder, "fr").gettext("Exercise") == "Exo"
+    assert module.convert_json(folder, force=True) == module.convert_json(
+        folder, force=True
+    )